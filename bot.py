@@ -12,12 +12,17 @@ from aiogram.types import BotCommand
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.exceptions import TelegramForbiddenError
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import select, and_, func
 from database import AsyncSessionLocal, init_db, User, RaffleParticipant, Raffle, Quiz, QuizParticipant, QuizResult
-from config import TG_TOKEN, DAILY_HOUR, DAILY_MINUTE, logger, ZODIAC_NAMES, ADMIN_ID, ADMIN_IDS
-from scheduler import start_scheduler, stop_scheduler, get_day_number, get_today_prediction, load_predictions
+from config import TG_TOKEN, TG_API_SERVER, DAILY_HOUR, DAILY_MINUTE, logger, ZODIAC_NAMES, ADMIN_ID, ADMIN_IDS, ADMIN_IDS_SET
+from scheduler import (
+    start_scheduler, stop_scheduler, get_day_number, get_today_prediction, load_predictions,
+    invalidate_subscribed_users_cache
+)
 from resilience import safe_send_message, safe_send_message_with_result, safe_send_photo, safe_edit_message_text, RATE_LIMIT_DELAY
 from raffle import (
     send_raffle_announcement, send_raffle_reminder, handle_raffle_participation,
@@ -43,7 +48,11 @@ from dice import (
     dice_waiting_responses
 )
 
-bot = Bot(TG_TOKEN)
+if TG_API_SERVER:
+    # Собственный сервер Bot API: короче путь до Telegram и нет лимитов на размер файлов
+    bot = Bot(TG_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TG_API_SERVER, is_local=True)))
+else:
+    bot = Bot(TG_TOKEN)
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 
@@ -143,6 +152,7 @@ async def cmd_start(message: types.Message):
                     )
                 else:
                     # Обновляем информацию о пользователе
+                    unsubscribed = False
                     user.username = message.from_user.username
                     user.first_name = message.from_user.first_name
                     
@@ -150,6 +160,7 @@ async def cmd_start(message: types.Message):
                     if user.subscribed and not user.zodiac:
                         logger.warning(f"Пользователь {user.id} подписан, но не выбрал знак зодиака. Отписываем.")
                         user.subscribed = False
+                        unsubscribed = True
                         welcome_text = (
                             "Привет! Ты был подписан, но не выбрал знак зодиака.\n\n"
                             "Выбери свой знак зодиака, чтобы получать ежедневные прогнозы:\n\n"
@@ -169,6 +180,8 @@ async def cmd_start(message: types.Message):
                         )
                     
                     await session.commit()
+                    if unsubscribed:
+                        invalidate_subscribed_users_cache()
             except SQLAlchemyError as e:
                 await session.rollback()
                 logger.error(f"Ошибка БД при обработке /start: {e}")
@@ -515,7 +528,7 @@ async def registration_city(message: types.Message, state: FSMContext):
 # ----------------- Admin Functions -----------------
 def is_admin(user_id: int) -> bool:
     """Проверка, является ли пользователь администратором"""
-    return ADMIN_IDS is not None and user_id in ADMIN_IDS
+    return user_id in ADMIN_IDS_SET
 
 def admin_keyboard():
     """Клавиатура админ-панели"""
@@ -573,8 +586,7 @@ async def cmd_raffle_start(message: types.Message):
         
         # Если дата не указана, используем текущую дату
         if not raffle_date:
-            moscow_tz = timezone(timedelta(hours=3))
-            current_date_str = datetime.now(moscow_tz).strftime("%Y-%m-%d")
+            current_date_str = datetime.now(QUIZ_MOSCOW_TZ).strftime("%Y-%m-%d")
             raffle_date = current_date_str
         
         # Останавливаем активный розыгрыш, если он есть
@@ -2627,6 +2639,7 @@ async def cmd_unsubscribe(message: types.Message):
                 if user:
                     user.subscribed = False
                     await session.commit()
+                    invalidate_subscribed_users_cache()
                     await message.answer("Ты отписался от ежедневных прогнозов. Используй /start для повторной подписки.")
                     logger.info(f"Пользователь {message.from_user.id} отписался")
                 else:
@@ -2692,11 +2705,11 @@ async def choose_zodiac(cb: types.CallbackQuery):
                     logger.info(f"Обновлен пользователь {cb.from_user.id}, знак: {zodiac_name}")
                 
                 await session.commit()
+                invalidate_subscribed_users_cache()
                 
                 # Проверяем, нужно ли отправить текущий прогноз
                 # Если время >= 09:00 и рассылка уже началась, отправляем прогноз сразу
-                moscow_tz = timezone(timedelta(hours=3))  # UTC+3 для Москвы
-                current_time_moscow = datetime.now(moscow_tz)
+                current_time_moscow = datetime.now(QUIZ_MOSCOW_TZ)
                 current_hour = current_time_moscow.hour
                 current_minute = current_time_moscow.minute
                 
@@ -2707,7 +2720,7 @@ async def choose_zodiac(cb: types.CallbackQuery):
                     start_date, _ = load_predictions()
                     if start_date:
                         try:
-                            start_datetime = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=moscow_tz)
+                            start_datetime = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=QUIZ_MOSCOW_TZ)
                             if current_time_moscow.date() >= start_datetime.date():
                                 should_send_now = True
                         except ValueError:
@@ -2753,8 +2766,7 @@ async def choose_zodiac(cb: types.CallbackQuery):
                         from quiz import QUIZ_PARTICIPATION_WINDOW, send_quiz_announcement, get_quiz, load_quiz, get_quiz_start_datetime_moscow
                         
                         # Получаем текущую дату в МСК
-                        moscow_tz = timezone(timedelta(hours=3))
-                        current_time_moscow = datetime.now(moscow_tz)
+                        current_time_moscow = datetime.now(QUIZ_MOSCOW_TZ)
                         current_date_str = current_time_moscow.strftime("%Y-%m-%d")
                         
                         # Квиз должен существовать в data/quiz.json на текущую дату
@@ -4898,21 +4910,26 @@ async def cmd_check_ticket_time(message: types.Message):
         ticket_number = int(parts[1])
         
         async with AsyncSessionLocal() as session:
-            # Ищем билетики в квизах
+            # Ищем билетики в квизах (только нужные столбцы - строки Row, без ORM-объектов)
             quiz_result = await session.execute(
-                select(QuizResult).where(
+                select(
+                    QuizResult.user_id, QuizResult.quiz_date, QuizResult.completed_at, QuizResult.id
+                ).where(
                     QuizResult.ticket_number == ticket_number
                 ).order_by(QuizResult.completed_at.asc())
             )
-            quiz_tickets = quiz_result.scalars().all()
+            quiz_tickets = quiz_result.all()
             
             # Ищем билетики в розыгрышах
             raffle_result = await session.execute(
-                select(RaffleParticipant).where(
+                select(
+                    RaffleParticipant.user_id, RaffleParticipant.raffle_date,
+                    RaffleParticipant.timestamp, RaffleParticipant.id
+                ).where(
                     RaffleParticipant.ticket_number == ticket_number
                 ).order_by(RaffleParticipant.timestamp.asc())
             )
-            raffle_tickets = raffle_result.scalars().all()
+            raffle_tickets = raffle_result.all()
             
             if not quiz_tickets and not raffle_tickets:
                 await message.answer(f"❌ Билетик №{ticket_number} не найден")
@@ -4934,13 +4951,11 @@ async def cmd_check_ticket_time(message: types.Message):
                 if ticket.completed_at:
                     if ticket.completed_at.tzinfo is None:
                         # Если время без таймзоны, считаем что это UTC
-                        moscow_tz = timezone(timedelta(hours=3))
                         utc_time = ticket.completed_at.replace(tzinfo=timezone.utc)
-                        moscow_time = utc_time.astimezone(moscow_tz)
+                        moscow_time = utc_time.astimezone(QUIZ_MOSCOW_TZ)
                         time_display = moscow_time.strftime("%d.%m.%Y %H:%M:%S МСК")
                     else:
-                        moscow_tz = timezone(timedelta(hours=3))
-                        moscow_time = ticket.completed_at.astimezone(moscow_tz)
+                        moscow_time = ticket.completed_at.astimezone(QUIZ_MOSCOW_TZ)
                         time_display = moscow_time.strftime("%d.%m.%Y %H:%M:%S МСК")
                 else:
                     time_display = "неизвестно"
@@ -4966,13 +4981,11 @@ async def cmd_check_ticket_time(message: types.Message):
                 # Показываем время получения вопроса (билетик выдается позже при одобрении)
                 if ticket.timestamp:
                     if ticket.timestamp.tzinfo is None:
-                        moscow_tz = timezone(timedelta(hours=3))
                         utc_time = ticket.timestamp.replace(tzinfo=timezone.utc)
-                        moscow_time = utc_time.astimezone(moscow_tz)
+                        moscow_time = utc_time.astimezone(QUIZ_MOSCOW_TZ)
                         time_display = moscow_time.strftime("%d.%m.%Y %H:%M:%S МСК") + " (время вопроса, билетик выдан позже)"
                     else:
-                        moscow_tz = timezone(timedelta(hours=3))
-                        moscow_time = ticket.timestamp.astimezone(moscow_tz)
+                        moscow_time = ticket.timestamp.astimezone(QUIZ_MOSCOW_TZ)
                         time_display = moscow_time.strftime("%d.%m.%Y %H:%M:%S МСК") + " (время вопроса, билетик выдан позже)"
                 else:
                     time_display = "неизвестно"
@@ -4986,11 +4999,10 @@ async def cmd_check_ticket_time(message: types.Message):
                     'db_id': ticket.id  # ID записи в БД для определения порядка при одинаковом времени
                 })
             
-            # Сортируем по времени, затем по ID записи (для случаев одинакового времени)
-            all_tickets.sort(key=lambda x: (
-                x['time'] if x['time'] else datetime.min.replace(tzinfo=timezone.utc),
-                x.get('db_id', 0)
-            ))
+            # Сортируем по времени (datetime, без перевода в строку), затем по ID записи
+            # (для случаев одинакового времени). Время в БД хранится без таймзоны, поэтому
+            # и заглушка для пустого значения - naive, иначе сравнение упадёт с TypeError
+            all_tickets.sort(key=lambda x: (x['time'] or datetime.min, x['db_id']))
             
             # Проверяем, есть ли одинаковое время
             same_time = len(all_tickets) > 1 and all_tickets[0]['time'] == all_tickets[1]['time']
@@ -5525,7 +5537,11 @@ async def cmd_daily_report(message: types.Message):
     try:
         from datetime import datetime, timedelta
         today = datetime.now().date()
-        yesterday = today - timedelta(days=1)
+        # Полуоткрытые диапазоны по самим столбцам вместо func.date(column) == день:
+        # условие использует индексы по created_at / completed_at / timestamp
+        day_start = datetime.combine(today, datetime.min.time())
+        day_end = day_start + timedelta(days=1)
+        yesterday_start = day_start - timedelta(days=1)
         
         async with AsyncSessionLocal() as session:
             from sqlalchemy import func
@@ -5533,7 +5549,7 @@ async def cmd_daily_report(message: types.Message):
             # Новые пользователи за сегодня
             new_users_today = await session.scalar(
                 select(func.count(User.id)).where(
-                    func.date(User.created_at) == today
+                    User.created_at >= day_start, User.created_at < day_end
                 )
             )
             
@@ -5542,7 +5558,7 @@ async def cmd_daily_report(message: types.Message):
                 select(func.count(QuizResult.ticket_number)).where(
                     and_(
                         QuizResult.ticket_number.isnot(None),
-                        func.date(QuizResult.completed_at) == today
+                        QuizResult.completed_at >= day_start, QuizResult.completed_at < day_end
                     )
                 )
             )
@@ -5551,7 +5567,7 @@ async def cmd_daily_report(message: types.Message):
                 select(func.count(RaffleParticipant.ticket_number)).where(
                     and_(
                         RaffleParticipant.ticket_number.isnot(None),
-                        func.date(RaffleParticipant.timestamp) == today
+                        RaffleParticipant.timestamp >= day_start, RaffleParticipant.timestamp < day_end
                     )
                 )
             )
@@ -5559,14 +5575,14 @@ async def cmd_daily_report(message: types.Message):
             # Активность квизов
             quiz_participants_today = await session.scalar(
                 select(func.count(QuizResult.id)).where(
-                    func.date(QuizResult.completed_at) == today
+                    QuizResult.completed_at >= day_start, QuizResult.completed_at < day_end
                 )
             )
             
             # Активность розыгрышей
             raffle_participants_today = await session.scalar(
                 select(func.count(RaffleParticipant.id)).where(
-                    func.date(RaffleParticipant.timestamp) == today
+                    RaffleParticipant.timestamp >= day_start, RaffleParticipant.timestamp < day_end
                 )
             )
             
@@ -5590,7 +5606,7 @@ async def cmd_daily_report(message: types.Message):
             # Сравнение с вчера
             new_users_yesterday = await session.scalar(
                 select(func.count(User.id)).where(
-                    func.date(User.created_at) == yesterday
+                    User.created_at >= yesterday_start, User.created_at < day_start
                 )
             )
             
@@ -5618,6 +5634,7 @@ async def cmd_weekly_report(message: types.Message):
         from datetime import datetime, timedelta
         today = datetime.now().date()
         week_ago = today - timedelta(days=7)
+        week_start = datetime.combine(week_ago, datetime.min.time())  # Граница периода - одна на все запросы
         
         async with AsyncSessionLocal() as session:
             from sqlalchemy import func
@@ -5625,7 +5642,7 @@ async def cmd_weekly_report(message: types.Message):
             # Новые пользователи за неделю
             new_users_week = await session.scalar(
                 select(func.count(User.id)).where(
-                    User.created_at >= datetime.combine(week_ago, datetime.min.time())
+                    User.created_at >= week_start
                 )
             )
             
@@ -5634,7 +5651,7 @@ async def cmd_weekly_report(message: types.Message):
                 select(func.count(QuizResult.ticket_number)).where(
                     and_(
                         QuizResult.ticket_number.isnot(None),
-                        QuizResult.completed_at >= datetime.combine(week_ago, datetime.min.time())
+                        QuizResult.completed_at >= week_start
                     )
                 )
             )
@@ -5643,7 +5660,7 @@ async def cmd_weekly_report(message: types.Message):
                 select(func.count(RaffleParticipant.ticket_number)).where(
                     and_(
                         RaffleParticipant.ticket_number.isnot(None),
-                        RaffleParticipant.timestamp >= datetime.combine(week_ago, datetime.min.time())
+                        RaffleParticipant.timestamp >= week_start
                     )
                 )
             )
@@ -5651,13 +5668,13 @@ async def cmd_weekly_report(message: types.Message):
             # Активность
             quiz_participants_week = await session.scalar(
                 select(func.count(QuizResult.id)).where(
-                    QuizResult.completed_at >= datetime.combine(week_ago, datetime.min.time())
+                    QuizResult.completed_at >= week_start
                 )
             )
             
             raffle_participants_week = await session.scalar(
                 select(func.count(RaffleParticipant.id)).where(
-                    RaffleParticipant.timestamp >= datetime.combine(week_ago, datetime.min.time())
+                    RaffleParticipant.timestamp >= week_start
                 )
             )
             
@@ -6511,6 +6528,7 @@ async def finish_quiz(bot, user_id: int, quiz_date: str, answers: dict, last_que
 
 async def main():
     """Главная функция запуска бота"""
+    logger.info(f"Цикл событий: {type(asyncio.get_running_loop()).__module__}")
     try:
         await init_db()
         # Выполняем безопасную миграцию для квизов
@@ -6598,7 +6616,14 @@ async def main():
         logger.info("Бот остановлен")
 
 if __name__ == "__main__":
+    # uvloop ускоряет цикл событий для бота, планировщика и веб-сервера (все работают в одном цикле)
+    # uvloop.install() устарел (uvloop 0.21, Python 3.12+) - запускаем через uvloop.run
+    try:
+        import uvloop
+        run = uvloop.run
+    except ImportError:
+        run = asyncio.run
     try:
-        asyncio.run(main())
+        run(main())
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
@@ -72,10 +72,40 @@ if not DATABASE_URL:
     # Fallback на SQLite если DATABASE_URL не указан
     DATABASE_URL = "sqlite+aiosqlite:///zodiac_bot.db"
     logger.info("Используется SQLite база данных (по умолчанию)")
+elif DATABASE_URL.startswith(("postgres://", "postgresql://")):
+    # URL без драйвера (как выдают хостинги) SQLAlchemy открыл бы синхронным psycopg2,
+    # а async-движку нужен asyncpg
+    DATABASE_URL = "postgresql+asyncpg://" + DATABASE_URL.split("://", 1)[1]
+
+# Пул соединений с БД (для PostgreSQL). Pre-ping (SELECT 1 при каждой выдаче соединения)
+# по умолчанию выключен: устаревшие соединения отсекаются через pool_recycle
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+# Сколько секунд ждать свободное соединение, прежде чем отдать ошибку (в админке - 503)
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+# За PgBouncer собственный пул не нужен: соединения мультиплексирует PgBouncer (NullPool)
+DB_USE_PGBOUNCER = os.getenv("DB_USE_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+# Хранилище задач планировщика (задачи переживают перезапуск бота).
+# APScheduler работает с синхронным драйвером, поэтому async-драйвер заменяется на синхронный
+SCHEDULER_JOBSTORE_URL = os.getenv("SCHEDULER_JOBSTORE_URL") or (
+    DATABASE_URL.replace("+asyncpg", "+psycopg2").replace("+aiosqlite", "")
+)
 
 DAILY_HOUR = int(os.getenv("DAILY_HOUR", "9"))   # час рассылки (по умолчанию 9:00)
 DAILY_MINUTE = int(os.getenv("DAILY_MINUTE", "0"))
 
+# Адрес собственного сервера Telegram Bot API (telegram-bot-api в режиме --local), например http://localhost:8081.
+# Если не задан, используется api.telegram.org
+TG_API_SERVER = os.getenv("TG_API_SERVER")
+
+# Максимальное количество одновременных отправок при массовых рассылках
+TG_CONCURRENCY = int(os.getenv("TG_CONCURRENCY", "25"))
+# Общий лимит отправок в секунду при массовых рассылках (ограничение Telegram ~30 msg/s)
+TG_BROADCAST_RATE = float(os.getenv("TG_BROADCAST_RATE", "30"))
+
 # ID администраторов (опционально, для админ-команд)
 # Можно указать несколько через запятую: "123456789,987654321"
 ADMIN_IDS = os.getenv("ADMIN_ID") or os.getenv("ADMIN_IDS")
@@ -92,6 +122,8 @@ else:
 
 # Обратная совместимость: если был ADMIN_ID, сохраняем для старых фильтров
 ADMIN_ID = ADMIN_IDS[0] if ADMIN_IDS else None
+# Множество для O(1) проверки прав (ADMIN_IDS остаётся списком для рассылок админам по порядку)
+ADMIN_IDS_SET = frozenset(ADMIN_IDS or ())
 
 # Названия знаков зодиака
 ZODIAC_NAMES = {
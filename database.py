@@ -1,10 +1,16 @@
 import logging
 from datetime import datetime
+from typing import AsyncIterator
+from uuid import uuid4
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Index, and_, text
 from sqlalchemy.exc import SQLAlchemyError
-from config import DATABASE_URL
+from sqlalchemy.pool import NullPool
+from config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_POOL_TIMEOUT, DB_USE_PGBOUNCER,
+)
 
 # Определяем тип ID в зависимости от БД
 # SQLite не поддерживает autoincrement для BigInteger, используем Integer
@@ -36,6 +42,17 @@ class User(Base):
     registration_source = Column(String, nullable=True)  # Источник информации (для "Другое")
     registration_completed = Column(Boolean, default=False, nullable=False)  # Завершена ли регистрация
 
+    __table_args__ = (
+        # Keyset-пагинация списков в админке: ORDER BY created_at DESC, id DESC
+        Index("ix_users_created_id", "created_at", "id"),
+        # То же для /users/registered и его COUNT: частичный индекс только по завершившим регистрацию
+        Index(
+            "ix_users_registered_created_id", "created_at", "id",
+            postgresql_where=registration_completed == True,
+            sqlite_where=registration_completed == True,
+        ),
+    )
+
 
 class Raffle(Base):
     """Управление розыгрышами"""
@@ -63,6 +80,28 @@ class RaffleParticipant(Base):
     announcement_time = Column(DateTime, nullable=True)  # Время отправки объявления о розыгрыше
     ticket_number = Column(Integer, nullable=True)  # Номер билетика (если ответ принят)
 
+    __table_args__ = (
+        # Статистика розыгрыша по дате и статусу проверки ответа
+        Index("ix_raffle_participants_date_status", "raffle_date", "is_correct"),
+        # Очередь непроверенных ответов (_unchecked_condition в raffle.py): частичный индекс
+        # содержит только ожидающие проверки строки и остаётся маленьким
+        Index(
+            "ix_raffle_participants_unchecked", "raffle_date", "timestamp",
+            postgresql_where=and_(is_correct.is_(None), question_id != 0),
+            sqlite_where=and_(is_correct.is_(None), question_id != 0),
+        ),
+        # Отчёты за период: COUNT(ticket_number) и COUNT(*) по диапазону timestamp - только по индексу
+        Index("ix_raffle_participants_timestamp_ticket", "timestamp", "ticket_number"),
+        # Поиск и проверка дублей билетов: частичный индекс только по выданным номерам
+        Index(
+            "ix_raffle_participants_ticket", "ticket_number",
+            postgresql_where=ticket_number.isnot(None),
+            sqlite_where=ticket_number.isnot(None),
+        ),
+        # Билеты пользователя и удаление билета (user_id = ? AND ticket_number = ?)
+        Index("ix_raffle_participants_user_ticket", "user_id", "ticket_number"),
+    )
+
 
 class Quiz(Base):
     """Управление квизами"""
@@ -100,12 +139,52 @@ class QuizResult(Base):
     ticket_number = Column(Integer, nullable=True)  # Номер билетика (если 5/5) или NULL
     completed_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # Время завершения
 
+    __table_args__ = (
+        # Покрывающий индекс для статистики квиза и отметки не принявших участие
+        Index(
+            "ix_quiz_results_date_cover",
+            "quiz_date", "ticket_number", "total_questions", "correct_answers"
+        ),
+        # Список участников: WHERE quiz_date = ? ORDER BY completed_at DESC, id DESC LIMIT -
+        # диапазон индекса читается в обратном порядке, без сортировки (и для keyset-курсора)
+        Index("ix_quiz_results_date_completed", "quiz_date", "completed_at", "id"),
+        # Отчёты за период: COUNT(ticket_number) и COUNT(*) по диапазону completed_at - только по индексу
+        Index("ix_quiz_results_completed_ticket", "completed_at", "ticket_number"),
+        # Поиск и проверка дублей билетов: частичный индекс только по выданным номерам
+        Index(
+            "ix_quiz_results_ticket", "ticket_number",
+            postgresql_where=ticket_number.isnot(None),
+            sqlite_where=ticket_number.isnot(None),
+        ),
+        # Билеты пользователя и удаление билета (user_id = ? AND ticket_number = ?)
+        Index("ix_quiz_results_user_ticket", "user_id", "ticket_number"),
+    )
+
 # Настройка engine с улучшенными параметрами
+_engine_kwargs = {}
+if DB_USE_PGBOUNCER:
+    # Каждая сессия берёт соединение у PgBouncer и сразу возвращает его.
+    # В transaction-режиме PgBouncer подготовленные выражения asyncpg не переживают смену соединения
+    _engine_kwargs.update(poolclass=NullPool)
+    if 'asyncpg' in DATABASE_URL.lower():
+        # Отключаем кэш выражений и самого asyncpg, и диалекта SQLAlchemy; уникальные имена
+        # не дают подготовленным выражениям разных клиентов столкнуться на одном backend PgBouncer
+        _engine_kwargs.update(connect_args={
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        })
+elif 'sqlite' not in DATABASE_URL.lower():
+    # Размер пула имеет смысл только для серверной БД: до DB_POOL_SIZE + DB_MAX_OVERFLOW
+    # одновременных соединений (бот + рассылки + параллельные запросы админки)
+    _engine_kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    pool_pre_ping=True,  # Проверка соединения перед использованием
-    pool_recycle=3600,  # Переподключение каждые 3600 секунд
+    pool_pre_ping=DB_POOL_PRE_PING,  # Проверка соединения перед использованием (по умолчанию выключена)
+    pool_recycle=DB_POOL_RECYCLE,  # Переподключение каждые DB_POOL_RECYCLE секунд
+    **_engine_kwargs,
 )
 
 AsyncSessionLocal = sessionmaker(
@@ -114,11 +193,48 @@ AsyncSessionLocal = sessionmaker(
     class_=AsyncSession
 )
 
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """Сессия на запрос для FastAPI (Depends(get_db)).
+
+    Соединение берётся из пула только при первом запросе к БД и возвращается при закрытии сессии.
+    Стриминговые ответы должны открывать свою сессию: зависимость закрывается до отправки тела.
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def fetch_one(stmt):
+    """Выполняет запрос на отдельном соединении из пула и возвращает единственную строку.
+
+    Своё соединение - поэтому независимые агрегаты можно запускать параллельно через
+    asyncio.gather. ORM-сессия (identity map, unit of work) для чтения агрегатов не нужна.
+    """
+    async with engine.connect() as conn:
+        return (await conn.execute(stmt)).one()
+
+
+async def fetch_all(stmt) -> list:
+    """Как fetch_one, но возвращает все строки результата (для небольших выборок)"""
+    async with engine.connect() as conn:
+        return (await conn.execute(stmt)).all()
+
+
 async def init_db():
     """Инициализация базы данных"""
     try:
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            # create_all не добавляет индексы в уже существующие таблицы; quiz_results и
+            # raffle_participants догоняют safe_migrate_*, users - здесь
+            for index in User.__table__.indexes:
+                await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn, checkfirst=True))
+            # Одноколоночный индекс по created_at покрыт ix_users_created_id (тот же первый столбец)
+            await conn.execute(text("DROP INDEX IF EXISTS ix_users_created_at"))
         logger.info("База данных успешно инициализирована")
     except SQLAlchemyError as e:
         logger.error(f"Ошибка при инициализации базы данных: {e}")
@@ -11,6 +11,7 @@ from aiogram import types
 from sqlalchemy import select, and_
 from sqlalchemy.exc import SQLAlchemyError
 from database import AsyncSessionLocal, User, RaffleParticipant
+from jsonio import read_json, read_json_cached, write_json_atomic
 from resilience import safe_send_message, safe_send_message_with_result, safe_edit_message_text
 from raffle import get_next_raffle_ticket_number
 from quiz import _ticket_number_lock
@@ -35,9 +36,21 @@ def load_all_dice_data() -> Optional[Dict]:
         return {"dice_events": {}}
     
     try:
-        with open(dice_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data
+        return read_json(dice_path)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Ошибка при загрузке dice.json: {e}")
+        return None
+
+
+def load_dice_data_readonly() -> Optional[Dict]:
+    """Как load_all_dice_data, но из кэша (файл перечитывается только после изменения).
+
+    Результат общий - не изменять; для правок используйте load_all_dice_data.
+    """
+    try:
+        return read_json_cached(DICE_JSON_PATH)
+    except FileNotFoundError:
+        return {"dice_events": {}}
     except (json.JSONDecodeError, IOError) as e:
         logger.error(f"Ошибка при загрузке dice.json: {e}")
         return None
@@ -47,35 +60,33 @@ def save_dice_data(dice_data: Dict) -> bool:
     """Сохраняет данные dice в dice.json"""
     dice_path = DICE_JSON_PATH
     try:
-        dice_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(dice_path, "w", encoding="utf-8") as f:
-            json.dump(dice_data, f, ensure_ascii=False, indent=4)
+        # orjson + атомарная замена (каталог создаётся внутри write_json_atomic)
+        write_json_atomic(dice_path, dice_data, pretty=True)
         logger.info(f"Dice данные успешно сохранены в {dice_path}")
         return True
-    except (IOError, json.JSONEncodeError) as e:
+    except (IOError, TypeError) as e:
         logger.error(f"Ошибка при сохранении dice.json: {e}")
         return False
 
 
 def get_all_dice_events() -> List[str]:
     """Получает список всех ID событий dice"""
-    all_data = load_all_dice_data()
+    all_data = load_dice_data_readonly()
     if not all_data or "dice_events" not in all_data:
         return []
     return list(all_data["dice_events"].keys())
 
 
 def get_dice_event(dice_id: str) -> Optional[Dict]:
-    """Получает событие dice по ID"""
-    all_data = load_all_dice_data()
+    """Получает событие dice по ID (только для чтения)"""
+    all_data = load_dice_data_readonly()
     if not all_data or "dice_events" not in all_data:
         return None
     return all_data["dice_events"].get(dice_id)
 
 
-def get_dice_start_datetime_moscow(dice_id: str) -> Optional[datetime]:
-    """Получает дату и время старта события dice в МСК"""
-    event = get_dice_event(dice_id)
+def parse_dice_starts_at(event: Optional[Dict], dice_id: str = "") -> Optional[datetime]:
+    """Разбирает starts_at уже загруженного события dice в МСК (без чтения dice.json)"""
     if not event or "starts_at" not in event:
         return None
     
@@ -93,6 +104,11 @@ def get_dice_start_datetime_moscow(dice_id: str) -> Optional[datetime]:
         return None
 
 
+def get_dice_start_datetime_moscow(dice_id: str) -> Optional[datetime]:
+    """Получает дату и время старта события dice в МСК"""
+    return parse_dice_starts_at(get_dice_event(dice_id), dice_id)
+
+
 def create_dice_event(dice_id: str, starts_at_local: str, title: str) -> Dict:
     """Создает новое событие dice
     
@@ -0,0 +1,159 @@
+"""
+Быстрое чтение и сериализация JSON: orjson, если он установлен, иначе стандартный json
+"""
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессная блокировка недоступна
+    fcntl = None
+
+# Кэш разобранных файлов: {путь: ((st_mtime_ns, st_size), данные)}
+_file_cache: dict = {}
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Разбирает JSON из bytes/str.
+
+    Ошибки разбора - json.JSONDecodeError (orjson.JSONDecodeError его наследует).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _default(obj: Any) -> Any:
+    # datetime/date как в orjson (ISO 8601), чтобы запасной путь давал тот же вывод
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Сериализует объект в компактный JSON (UTF-8 bytes); datetime кодируется в ISO 8601"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    """Читает и разбирает JSON-файл целиком"""
+    # Небуферизованный FileIO: readall() берёт размер из fstat и читает одним read() без промежуточного буфера
+    with open(path, "rb", buffering=0) as f:
+        return loads(f.readall())
+
+
+def read_json_cached(path: Union[str, Path]) -> Any:
+    """Читает JSON-файл с кэшем по mtime/размеру: неизменённый файл не перечитывается.
+
+    Возвращается общий для всех вызывающих объект - его нельзя изменять.
+    Для изменения и последующего сохранения используйте read_json.
+    """
+    key = str(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _file_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    data = read_json(path)
+    _file_cache[key] = (stamp, data)
+    return data
+
+
+@contextmanager
+def file_lock(path: Union[str, Path]):
+    """Эксклюзивная межпроцессная блокировка для read-modify-write JSON-файла.
+
+    Блокируется отдельный файл <path>.lock, поэтому атомарная замена самого файла её не снимает.
+    """
+    if fcntl is None:
+        yield
+        return
+    lock_path = f"{path}.lock"
+    Path(lock_path).parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def dumps_pretty(obj: Any) -> bytes:
+    """JSON с отступом 2 пробела - для файлов, которые правят руками (кириллица без \\u-экранирования)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=_default).encode("utf-8")
+
+
+# umask процесса читается один раз: os.umask меняет его глобально, а запись идёт и из пула потоков
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _target_mode(path: Path) -> int:
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def write_json_atomic(path: Union[str, Path], obj: Any, pretty: bool = False) -> None:
+    """Атомарно записывает JSON (компактный или с отступами): временный файл рядом + fsync + os.replace.
+
+    Читатели видят либо старое, либо новое содержимое, но не обрезанный файл.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        # mkstemp создаёт файл с правами 0600, а os.replace их сохраняет: переносим права исходного
+        # файла (новому - обычные 0666 & ~umask), чтобы файлы данных на томе остались читаемыми
+        if hasattr(os, "fchmod"):  # нет на Windows
+            os.fchmod(fd, _target_mode(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(dumps_pretty(obj) if pretty else dumps(obj))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def toggle_disabled_date(path: Union[str, Path], value: str) -> bool:
+    """Переключает value в списке {"dates": [...]} под блокировкой. Возвращает True, если дата теперь отключена.
+
+    Блокирующая функция (flock + fsync) — из async-кода вызывать через asyncio.to_thread.
+    """
+    with file_lock(path):
+        try:
+            dates = set(read_json(path).get("dates", []))
+        except FileNotFoundError:
+            dates = set()
+        disabled = value not in dates
+        if disabled:
+            dates.add(value)
+        else:
+            dates.remove(value)
+        payload = {"dates": sorted(dates)}
+        write_json_atomic(path, payload)
+        # Кладём записанное в кэш read_json_cached: следующий GET не перечитывает и не разбирает файл
+        st = os.stat(path)
+        _file_cache[str(path)] = ((st.st_mtime_ns, st.st_size), payload)
+    return disabled
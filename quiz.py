@@ -4,13 +4,15 @@
 import json
 import logging
 import asyncio
+import functools
 from datetime import datetime, timezone, timedelta, time as dt_time
 from pathlib import Path
 from typing import Optional, Dict, List
 from aiogram import types
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, insert, literal, and_, func
 from sqlalchemy.exc import SQLAlchemyError
 from database import AsyncSessionLocal, User, Quiz, QuizParticipant, QuizResult
+from jsonio import read_json, read_json_cached, write_json_atomic
 from resilience import safe_send_message, safe_send_message_with_result, safe_send_photo, safe_edit_message_text
 
 logger = logging.getLogger(__name__)
@@ -39,34 +41,42 @@ quiz_timeout_tasks = {}
 _ticket_number_lock = asyncio.Lock()
 
 
+def load_quiz_data_readonly() -> Optional[Dict]:
+    """Как load_all_quiz_data, но из кэша (файл перечитывается только после изменения).
+
+    Результат общий - не изменять; для правок используйте load_all_quiz_data.
+    """
+    try:
+        return read_json_cached(QUIZ_JSON_PATH)
+    except FileNotFoundError:
+        logger.error("Файл quiz.json не найден!")
+        return None
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Ошибка при загрузке квизов: {e}")
+        return None
+
+
 def load_quiz(quiz_date: str) -> Optional[Dict]:
     """Загружает квиз для указанной даты из quiz.json"""
-    quiz_path = QUIZ_JSON_PATH
-    if not quiz_path.exists():
-        logger.error("Файл quiz.json не найден!")
+    # Только чтение: берём разобранный quiz.json из кэша (перечитывается после изменения файла)
+    data = load_quiz_data_readonly()
+    if data is None:
         return None
     
-    try:
-        with open(quiz_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
-        quiz_dates = data.get("quiz_dates", {})
-        quiz_data = quiz_dates.get(quiz_date)
-        
-        if not quiz_data:
-            logger.warning(f"Квиз для даты {quiz_date} не найден в quiz.json")
-            return None
-
-        # Поддержка нового формата:
-        # quiz_dates[date] = { "meta": {...}, "questions": {...} }
-        if isinstance(quiz_data, dict) and "questions" in quiz_data:
-            quiz_data = quiz_data.get("questions") or {}
-        
-        return quiz_data
-    except (json.JSONDecodeError, IOError) as e:
-        logger.error(f"Ошибка при загрузке квиза: {e}")
+    quiz_dates = data.get("quiz_dates", {})
+    quiz_data = quiz_dates.get(quiz_date)
+    
+    if not quiz_data:
+        logger.warning(f"Квиз для даты {quiz_date} не найден в quiz.json")
         return None
 
+    # Поддержка нового формата:
+    # quiz_dates[date] = { "meta": {...}, "questions": {...} }
+    if isinstance(quiz_data, dict) and "questions" in quiz_data:
+        quiz_data = quiz_data.get("questions") or {}
+    
+    return quiz_data
+
 
 def get_question_by_id(question_id: int, quiz_date: str) -> Optional[Dict]:
     """Получает вопрос по ID для указанной даты"""
@@ -95,9 +105,7 @@ def load_all_quiz_data() -> Optional[Dict]:
         return None
     
     try:
-        with open(quiz_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data
+        return read_json(quiz_path)
     except (json.JSONDecodeError, IOError) as e:
         logger.error(f"Ошибка при загрузке квизов: {e}")
         return None
@@ -128,7 +136,7 @@ def get_all_questions(quiz_date: str) -> List[Dict]:
 
 def get_all_quiz_dates() -> List[str]:
     """Получает список всех дат квизов из quiz.json"""
-    all_data = load_all_quiz_data()
+    all_data = load_quiz_data_readonly()
     if not all_data or "quiz_dates" not in all_data:
         return []
     
@@ -146,8 +154,8 @@ def save_quiz_data(quiz_data: Dict) -> bool:
     """
     quiz_path = QUIZ_JSON_PATH
     try:
-        with open(quiz_path, "w", encoding="utf-8") as f:
-            json.dump(quiz_data, f, ensure_ascii=False, indent=4)
+        # orjson + атомарная замена: читатели (бот, кэш) не увидят недописанный файл
+        write_json_atomic(quiz_path, quiz_data, pretty=True)
         logger.info(f"Квизы успешно сохранены в {quiz_path}")
         return True
     except (IOError, TypeError) as e:
@@ -155,6 +163,15 @@ def save_quiz_data(quiz_data: Dict) -> bool:
         return False
 
 
+# Async-обёртки для веб-роутов: чтение/запись quiz.json уходит в пул потоков и не блокирует event loop.
+# Между загрузкой и сохранением есть await, поэтому каждое чтение-изменение-запись quiz.json
+# (и вызовы set_quiz_meta_from_local/duplicate_quiz_from_local/update_quiz_question через to_thread)
+# выполняется под quiz_json_lock - иначе параллельные правки из админки затирают друг друга
+quiz_json_lock = asyncio.Lock()
+aload_all_quiz_data = functools.partial(asyncio.to_thread, load_all_quiz_data)
+asave_quiz_data = functools.partial(asyncio.to_thread, save_quiz_data)
+
+
 def _ensure_quiz_date_new_format(all_data: Dict, quiz_date: str) -> bool:
     """Гарантирует новый формат записи по дате: {meta, questions}. Возвращает True если меняли данные."""
     if not all_data or "quiz_dates" not in all_data or not isinstance(all_data["quiz_dates"], dict):
@@ -295,42 +312,62 @@ def duplicate_quiz_from_local(source_quiz_date: str, starts_at_local: str, title
 
     return {"success": True, "quiz_date": target_quiz_date}
 
+def _entry_meta(date_entry) -> Dict:
+    """meta записи quiz_dates[date] (пустой dict для старого формата)"""
+    if not isinstance(date_entry, dict):
+        return {}
+    if "meta" in date_entry and isinstance(date_entry.get("meta"), dict):
+        return date_entry.get("meta") or {}
+    return {}
+
+
+def _entry_questions_count(date_entry) -> int:
+    """Количество вопросов в записи quiz_dates[date] (оба формата, как в load_quiz)"""
+    if not date_entry:
+        return 0
+    if isinstance(date_entry, dict) and "questions" in date_entry:
+        return len(date_entry.get("questions") or {})
+    return len(date_entry)
+
+
 def get_quiz_meta(quiz_date: str) -> Dict:
     """Возвращает метаданные квиза для даты (title, starts_at и т.д.).
 
     Поддерживает оба формата:
     - старый: quiz_dates[date] = { "1": {...}, ... }
     - новый:  quiz_dates[date] = { "meta": {...}, "questions": {...} }
+
+    Результат только для чтения.
     """
-    all_data = load_all_quiz_data()
+    all_data = load_quiz_data_readonly()
     if not all_data or "quiz_dates" not in all_data:
         return {}
 
-    date_entry = all_data["quiz_dates"].get(quiz_date)
-    if not isinstance(date_entry, dict):
-        return {}
-
-    if "meta" in date_entry and isinstance(date_entry.get("meta"), dict):
-        return date_entry.get("meta") or {}
-    return {}
+    return _entry_meta(all_data["quiz_dates"].get(quiz_date))
 
 
-def get_quiz_title(quiz_date: str) -> Optional[str]:
-    meta = get_quiz_meta(quiz_date)
+def _title_from_meta(meta: Dict) -> Optional[str]:
     title = meta.get("title")
     if isinstance(title, str) and title.strip():
         return title.strip()
     return None
 
 
+def get_quiz_title(quiz_date: str) -> Optional[str]:
+    return _title_from_meta(get_quiz_meta(quiz_date))
+
+
 def get_quiz_start_datetime_moscow(quiz_date: str) -> Optional[datetime]:
     """Возвращает datetime начала квиза в МСК (timezone-aware).
 
     - Если в meta есть starts_at (ISO), используем его.
     - Иначе — комбинируем quiz_date + QUIZ_HOUR/QUIZ_MINUTE.
     """
+    return _start_from_meta(quiz_date, get_quiz_meta(quiz_date))
+
+
+def _start_from_meta(quiz_date: str, meta: Dict) -> Optional[datetime]:
     # starts_at в ISO, например: 2025-12-17T12:00:00+03:00
-    meta = get_quiz_meta(quiz_date)
     starts_at = meta.get("starts_at")
     if isinstance(starts_at, str) and starts_at.strip():
         try:
@@ -349,6 +386,28 @@ def get_quiz_start_datetime_moscow(quiz_date: str) -> Optional[datetime]:
         return None
 
 
+def get_quiz_list_items() -> List[tuple]:
+    """Список квизов для админки одним проходом по quiz.json.
+
+    Returns:
+        [(quiz_date, title, starts_at_moscow, questions_count), ...], отсортированный по дате
+    """
+    all_data = load_quiz_data_readonly()
+    if not all_data or "quiz_dates" not in all_data:
+        return []
+
+    items = []
+    for quiz_date, date_entry in sorted(all_data["quiz_dates"].items()):
+        meta = _entry_meta(date_entry)
+        items.append((
+            quiz_date,
+            _title_from_meta(meta),
+            _start_from_meta(quiz_date, meta),
+            _entry_questions_count(date_entry),
+        ))
+    return items
+
+
 def update_quiz_question(question_id: int, quiz_date: str, question_text: str, options: Dict[str, str], correct_answer: str) -> bool:
     """Обновляет вопрос квиза по ID для указанной даты
     
@@ -621,55 +680,42 @@ async def mark_non_participants(quiz_date: str):
         deadline = moscow_now - timedelta(hours=QUIZ_PARTICIPATION_WINDOW)
         deadline_utc = deadline.astimezone(timezone.utc).replace(tzinfo=None)
         
+        # Участники, которые получили объявление, но не начали квиз и еще не имеют результата
+        has_result = select(QuizResult.id).where(
+            and_(
+                QuizResult.user_id == QuizParticipant.user_id,
+                QuizResult.quiz_date == quiz_date
+            )
+        ).exists()
+        non_participants = select(
+            QuizParticipant.user_id,
+            User.username,
+            literal(quiz_date),
+            literal(0),
+            literal(0),
+            literal(datetime.utcnow()),
+        ).outerjoin(
+            User, User.id == QuizParticipant.user_id
+        ).where(
+            and_(
+                QuizParticipant.quiz_date == quiz_date,
+                QuizParticipant.announcement_time.isnot(None),
+                QuizParticipant.started_at.is_(None),
+                QuizParticipant.announcement_time <= deadline_utc,
+                ~has_result
+            )
+        ).distinct()
+        
         async with AsyncSessionLocal() as session:
-            # Находим всех участников, которые получили объявление, но не начали квиз
+            # Записываем их в результаты как не принявших участие одним INSERT ... SELECT
             result = await session.execute(
-                select(QuizParticipant).where(
-                    and_(
-                        QuizParticipant.quiz_date == quiz_date,
-                        QuizParticipant.announcement_time.isnot(None),
-                        QuizParticipant.started_at.is_(None),
-                        QuizParticipant.announcement_time <= deadline_utc
-                    )
+                insert(QuizResult).from_select(
+                    ["user_id", "username", "quiz_date", "correct_answers", "total_questions", "completed_at"],
+                    non_participants
                 )
             )
-            non_participants = result.scalars().all()
-            
-            # Записываем их в результаты как не принявших участие
-            for participant in non_participants:
-                # Проверяем, нет ли уже записи
-                existing_result = await session.execute(
-                    select(QuizResult).where(
-                        and_(
-                            QuizResult.user_id == participant.user_id,
-                            QuizResult.quiz_date == quiz_date
-                        )
-                    )
-                )
-                if existing_result.scalar_one_or_none():
-                    continue
-                
-                # Получаем username
-                user_result = await session.execute(
-                    select(User).where(User.id == participant.user_id)
-                )
-                user = user_result.scalar_one_or_none()
-                username = user.username if user else None
-                
-                # Создаем запись о неучастии
-                result = QuizResult(
-                    user_id=participant.user_id,
-                    username=username,
-                    quiz_date=quiz_date,
-                    correct_answers=0,
-                    total_questions=0,
-                    ticket_number=None,
-                    completed_at=datetime.utcnow()
-                )
-                session.add(result)
-            
             await session.commit()
-            logger.info(f"Отмечено {len(non_participants)} пользователей как не принявших участие в квизе {quiz_date}")
+            logger.info(f"Отмечено {result.rowcount} пользователей как не принявших участие в квизе {quiz_date}")
             
     except Exception as e:
         logger.error(f"Ошибка при отметке не принявших участие: {e}")
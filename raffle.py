@@ -5,13 +5,15 @@ import json
 import random
 import logging
 import asyncio
-from datetime import datetime, timezone, timedelta, time as dt_time
+import functools
+from datetime import date, datetime, timezone, timedelta, time as dt_time
 from pathlib import Path
 from typing import Optional, Tuple, List, Dict
 from aiogram import types
-from sqlalchemy import select, and_
+from sqlalchemy import select, update, and_
 from sqlalchemy.exc import SQLAlchemyError
 from database import AsyncSessionLocal, User, RaffleParticipant, Raffle, QuizResult
+from jsonio import file_lock, read_json, read_json_cached, write_json_atomic
 from resilience import safe_send_message, safe_send_message_with_result, safe_send_photo, safe_edit_message_text
 from sqlalchemy import func
 
@@ -30,12 +32,16 @@ RAFFLE_DATES = [
     "2025-12-22",
     "2025-12-29"
 ]
+RAFFLE_DATES_SET = frozenset(RAFFLE_DATES)  # Для O(1) проверки принадлежности
+
+QUESTIONS_JSON_PATH = Path("data/question.json")
 
 RAFFLE_HOUR = 12  # 21:00 МСК
 RAFFLE_MINUTE = 00  # Минуты для запуска розыгрыша (0-59)
 RAFFLE_PARTICIPATION_WINDOW = 2  # 2 часа на участие
 RAFFLE_REMINDER_DELAY = 1  # 1 час до напоминания
 RAFFLE_ANSWER_TIME = 15  # 15 минут на ответ (в минутах)
+_RAFFLE_START_TIME = dt_time(RAFFLE_HOUR, RAFFLE_MINUTE)  # Время старта по умолчанию (без метаданных)
 
 
 async def check_answer_timeout(bot, user_id: int, raffle_date: str, timeout_minutes: int):
@@ -84,15 +90,29 @@ async def check_answer_timeout(bot, user_id: int, raffle_date: str, timeout_minu
 
 def load_questions() -> Optional[Dict]:
     """Загружает вопросы из question.json"""
-    questions_path = Path("data/question.json")
+    questions_path = QUESTIONS_JSON_PATH
     if not questions_path.exists():
         logger.error("Файл question.json не найден!")
         return None
     
     try:
-        with open(questions_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data
+        return read_json(questions_path)
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Ошибка при загрузке вопросов: {e}")
+        return None
+
+
+def load_questions_readonly() -> Optional[Dict]:
+    """Как load_questions, но из кэша (файл перечитывается только после изменения mtime/размера).
+
+    Результат общий - не изменять; для правок используйте load_questions.
+    Явная инвалидация после записи не нужна: save_questions_data меняет mtime.
+    """
+    try:
+        return read_json_cached(QUESTIONS_JSON_PATH)
+    except FileNotFoundError:
+        logger.error("Файл question.json не найден!")
+        return None
     except (json.JSONDecodeError, IOError) as e:
         logger.error(f"Ошибка при загрузке вопросов: {e}")
         return None
@@ -100,7 +120,7 @@ def load_questions() -> Optional[Dict]:
 
 def get_random_question(raffle_date: str) -> Optional[Dict]:
     """Получает случайный вопрос для указанной даты розыгрыша"""
-    questions_data = load_questions()
+    questions_data = load_questions_readonly()
     if not questions_data or "raffle_dates" not in questions_data:
         return None
     
@@ -125,12 +145,12 @@ def get_random_question(raffle_date: str) -> Optional[Dict]:
     if not questions_list:
         return None
     
-    return random.choice(questions_list)
+    return dict(random.choice(questions_list))
 
 
 def get_question_by_id(question_id: int, raffle_date: str) -> Optional[Dict]:
     """Получает вопрос по ID для указанной даты розыгрыша"""
-    questions_data = load_questions()
+    questions_data = load_questions_readonly()
     if not questions_data or "raffle_dates" not in questions_data:
         return None
     
@@ -148,14 +168,14 @@ def get_question_by_id(question_id: int, raffle_date: str) -> Optional[Dict]:
     
     for question_key, question in questions.items():
         if question.get("id") == question_id:
-            return question
+            return dict(question)
     
     return None
 
 
 def get_all_questions(raffle_date: str = None) -> List[Dict]:
     """Получает все вопросы для указанной даты или всех дат"""
-    questions_data = load_questions()
+    questions_data = load_questions_readonly()
     if not questions_data or "raffle_dates" not in questions_data:
         return []
     
@@ -172,7 +192,8 @@ def get_all_questions(raffle_date: str = None) -> List[Dict]:
         else:
             # Старый формат
             questions = raffle_data
-        return list(questions.values())
+        # Копии: данные из кэша общие для всех вызывающих
+        return [dict(q) for q in questions.values()]
     else:
         # Возвращаем все вопросы из всех дат
         all_questions = []
@@ -182,13 +203,13 @@ def get_all_questions(raffle_date: str = None) -> List[Dict]:
                 questions = date_questions["questions"]
             else:
                 questions = date_questions
-            all_questions.extend(list(questions.values()))
+            all_questions.extend(dict(q) for q in questions.values())
         return all_questions
 
 
 def get_all_raffle_dates() -> List[str]:
     """Получает список всех дат розыгрышей из question.json"""
-    questions_data = load_questions()
+    questions_data = load_questions_readonly()
     if not questions_data or "raffle_dates" not in questions_data:
         return []
     
@@ -204,17 +225,32 @@ def save_questions_data(questions_data: Dict) -> bool:
     Returns:
         True если успешно, False в противном случае
     """
-    questions_path = Path("data/question.json")
+    questions_path = QUESTIONS_JSON_PATH
     try:
-        with open(questions_path, "w", encoding="utf-8") as f:
-            json.dump(questions_data, f, ensure_ascii=False, indent=4)
+        # orjson + атомарная замена: читатели (бот, кэш) не увидят недописанный файл
+        write_json_atomic(questions_path, questions_data, pretty=True)
         logger.info(f"Вопросы успешно сохранены в {questions_path}")
         return True
-    except (IOError, json.JSONEncodeError) as e:
+    except (IOError, TypeError) as e:
         logger.error(f"Ошибка при сохранении вопросов: {e}")
         return False
 
 
+def _questions_locked(func):
+    """Выполняет чтение-изменение-запись question.json под межпроцессной блокировкой файла.
+
+    flock берётся на отдельный дескриптор при каждом вызове, поэтому правки из пула потоков
+    (админка через asyncio.to_thread) и из бота не затирают друг друга. Обёрнутые функции
+    не должны вызывать друг друга (повторный захват заблокирует поток) и ждать внутри await.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with file_lock(QUESTIONS_JSON_PATH):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+@_questions_locked
 def update_question(question_id: int, raffle_date: str, title: str, text: str) -> bool:
     """Обновляет вопрос по ID для указанной даты розыгрыша
     
@@ -258,7 +294,7 @@ def get_raffle_meta(raffle_date: str) -> Dict:
     Returns:
         Словарь с метаданными или пустой словарь, если метаданных нет
     """
-    questions_data = load_questions()
+    questions_data = load_questions_readonly()
     if not questions_data or "raffle_dates" not in questions_data:
         return {}
     
@@ -279,7 +315,11 @@ def get_raffle_start_datetime_moscow(raffle_date: str) -> Optional[datetime]:
     
     Сначала проверяет метаданные в question.json, если их нет - использует константы
     """
-    meta = get_raffle_meta(raffle_date)
+    return _start_from_meta(raffle_date, get_raffle_meta(raffle_date))
+
+
+def _start_from_meta(raffle_date: str, meta: Dict) -> Optional[datetime]:
+    """Время старта по уже загруженным метаданным (или по константам, если их нет)"""
     if meta and "starts_at" in meta:
         try:
             starts_at_str = meta["starts_at"]
@@ -298,10 +338,10 @@ def get_raffle_start_datetime_moscow(raffle_date: str) -> Optional[datetime]:
     
     # Fallback на константы
     try:
-        date_obj = datetime.strptime(raffle_date, "%Y-%m-%d")
+        # date.fromisoformat - без разбора формат-строки strptime на каждый розыгрыш списка
         starts_at = datetime.combine(
-            date_obj.date(),
-            dt_time(RAFFLE_HOUR, RAFFLE_MINUTE),
+            date.fromisoformat(raffle_date),
+            _RAFFLE_START_TIME,
             MOSCOW_TZ
         )
         return starts_at
@@ -310,6 +350,34 @@ def get_raffle_start_datetime_moscow(raffle_date: str) -> Optional[datetime]:
         return None
 
 
+def get_raffle_list_items() -> List[tuple]:
+    """Список розыгрышей для админки одним чтением question.json.
+
+    Returns:
+        [(raffle_date, title, starts_at_moscow, questions_count), ...], отсортированный по дате
+    """
+    questions_data = load_questions_readonly()
+    if not questions_data or "raffle_dates" not in questions_data:
+        return []
+
+    items = []
+    for raffle_date, raffle_data in sorted(questions_data["raffle_dates"].items()):
+        # Поддержка нового формата с метаданными и старого (вопросы напрямую)
+        if isinstance(raffle_data, dict) and "questions" in raffle_data:
+            questions = raffle_data["questions"]
+        else:
+            questions = raffle_data
+        meta = (raffle_data.get("meta") or {}) if isinstance(raffle_data, dict) else {}
+        items.append((
+            raffle_date,
+            meta.get("title"),
+            _start_from_meta(raffle_date, meta),
+            len(questions),
+        ))
+    return items
+
+
+@_questions_locked
 def set_raffle_meta_from_local(raffle_date: str, title: str, starts_at_local: str) -> Dict:
     """Устанавливает метаданные розыгрыша из локального времени (МСК)
     
@@ -407,13 +475,12 @@ def is_raffle_date(date_str: Optional[str] = None) -> bool:
         current_date = datetime.now(MOSCOW_TZ).date()
         date_str = current_date.strftime("%Y-%m-%d")
     
-    # Сначала проверяем в question.json (динамические розыгрыши)
-    all_dates = get_all_raffle_dates()
-    if date_str in all_dates:
+    # Сначала проверяем жестко заданный список (для обратной совместимости) - без чтения файла
+    if date_str in RAFFLE_DATES_SET:
         return True
     
-    # Затем проверяем в жестко заданном списке (для обратной совместимости)
-    return date_str in RAFFLE_DATES
+    # Затем проверяем в question.json (динамические розыгрыши)
+    return date_str in get_all_raffle_dates()
 
 
 def get_next_raffle_date() -> Optional[str]:
@@ -776,8 +843,12 @@ async def send_raffle_announcement(bot, user_id: int, raffle_date: str, force_se
         return None
 
 
-async def send_raffle_reminder(bot, user_id: int, raffle_date: str):
-    """Отправляет напоминание о розыгрыше"""
+async def send_raffle_reminder(bot, user_id: int, raffle_date: str) -> bool:
+    """Отправляет напоминание о розыгрыше
+    
+    Returns:
+        True если сообщение отправлено, False в противном случае
+    """
     text = (
         "⏰ <b>Напоминание о розыгрыше!</b>\n\n"
         "У тебя еще есть время принять участие.\n\n"
@@ -791,7 +862,7 @@ async def send_raffle_reminder(bot, user_id: int, raffle_date: str):
         )]
     ])
     
-    await safe_send_message(
+    return await safe_send_message(
         bot,
         user_id,
         text,
@@ -1049,30 +1120,68 @@ async def get_unchecked_answers(raffle_date: str) -> List[RaffleParticipant]:
         async with AsyncSessionLocal() as session:
             result = await session.execute(
                 select(RaffleParticipant).where(
-                    and_(
-                        RaffleParticipant.raffle_date == raffle_date,
-                        RaffleParticipant.is_correct.is_(None),
-                        RaffleParticipant.question_id != 0  # Только те, кто получил вопрос
-                    )
+                    _unchecked_condition(raffle_date)
                 ).order_by(
                     # Сначала те, кто ответил (answer is not None), потом те, кто не ответил
                     RaffleParticipant.answer.isnot(None).desc(),
                     RaffleParticipant.timestamp.asc()  # Внутри группы - по времени
                 )
             )
-            participants = list(result.scalars().all())
-            
-            # Фильтруем: сначала показываем тех, кто ответил, потом тех, кто не ответил
-            answered = [p for p in participants if p.answer is not None]
-            not_answered = [p for p in participants if p.answer is None]
-            
-            # Возвращаем сначала ответивших, потом не ответивших
-            return answered + not_answered
+            return list(result.scalars().all())
+    except Exception as e:
+        logger.error(f"Ошибка при получении непроверенных ответов: {e}")
+        return []
+
+
+def _unchecked_condition(raffle_date: str):
+    """Условие непроверенного ответа: вопрос получен, решение по ответу еще не принято"""
+    return and_(
+        RaffleParticipant.raffle_date == raffle_date,
+        RaffleParticipant.is_correct.is_(None),
+        RaffleParticipant.question_id != 0  # Только те, кто получил вопрос
+    )
+
+
+async def get_unchecked_answers_page(raffle_date: str, skip: int, limit: int) -> List:
+    """Страница непроверенных ответов (LIMIT/OFFSET в SQL) в порядке get_unchecked_answers
+
+    Выбираются только нужные админке столбцы - строки Row без ORM-объектов и identity map.
+    """
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(
+                    RaffleParticipant.user_id,
+                    RaffleParticipant.question_id,
+                    RaffleParticipant.question_text,
+                    RaffleParticipant.answer,
+                    RaffleParticipant.timestamp,
+                ).where(
+                    _unchecked_condition(raffle_date)
+                ).order_by(
+                    RaffleParticipant.answer.isnot(None).desc(),
+                    RaffleParticipant.timestamp.asc()
+                ).offset(skip).limit(limit)
+            )
+            return result.all()
     except Exception as e:
         logger.error(f"Ошибка при получении непроверенных ответов: {e}")
         return []
 
 
+async def count_unchecked_answers(raffle_date: str) -> int:
+    """Количество непроверенных ответов для даты розыгрыша"""
+    try:
+        async with AsyncSessionLocal() as session:
+            total = await session.scalar(
+                select(func.count(RaffleParticipant.id)).where(_unchecked_condition(raffle_date))
+            )
+            return total or 0
+    except Exception as e:
+        logger.error(f"Ошибка при подсчете непроверенных ответов: {e}")
+        return 0
+
+
 async def get_users_for_reminder(raffle_date: str) -> List[RaffleParticipant]:
     """Получает список пользователей, которым нужно отправить напоминание
     
@@ -1218,27 +1327,28 @@ async def deny_answer(user_id: int, raffle_date: str) -> bool:
     try:
         async with AsyncSessionLocal() as session:
             # Может быть несколько записей для одного пользователя и даты
-            # Выбираем запись с ответом (answer is not None), если есть, иначе самую свежую
+            # Выбираем запись с ответом (answer is not None), если есть, иначе самую свежую -
+            # выбор и изменение одним UPDATE ... WHERE id = (подзапрос), без загрузки строки в Python
+            target_id = select(RaffleParticipant.id).where(
+                and_(
+                    RaffleParticipant.user_id == user_id,
+                    RaffleParticipant.raffle_date == raffle_date
+                )
+            ).order_by(
+                RaffleParticipant.answer.isnot(None).desc(),  # Сначала записи с ответом
+                RaffleParticipant.timestamp.desc()  # Затем по времени (самая свежая)
+            ).limit(1).scalar_subquery()
             result = await session.execute(
-                select(RaffleParticipant).where(
-                    and_(
-                        RaffleParticipant.user_id == user_id,
-                        RaffleParticipant.raffle_date == raffle_date
-                    )
-                ).order_by(
-                    RaffleParticipant.answer.isnot(None).desc(),  # Сначала записи с ответом
-                    RaffleParticipant.timestamp.desc()  # Затем по времени (самая свежая)
-                ).limit(1)
+                update(RaffleParticipant)
+                .where(RaffleParticipant.id == target_id)
+                .values(is_correct=False)
             )
-            participant = result.scalar_one_or_none()
+            await session.commit()
             
-            if not participant:
+            if result.rowcount == 0:
                 logger.warning(f"Участник не найден для отклонения: user_id={user_id}, raffle_date={raffle_date}")
                 return False
             
-            participant.is_correct = False
-            await session.commit()
-            
             # Отправляем пользователю сообщение с картинкой в одном сообщении
             from aiogram import Bot
             from config import TG_TOKEN
@@ -1273,6 +1383,7 @@ async def deny_answer(user_id: int, raffle_date: str) -> bool:
         return False
 
 
+@_questions_locked
 def create_raffle_data(raffle_date: str, starts_at_local: str, title: str, questions: List[Dict]) -> Dict:
     """Создает новый розыгрыш с вопросами
     
@@ -1341,6 +1452,7 @@ def create_raffle_data(raffle_date: str, starts_at_local: str, title: str, quest
         return {"success": False, "error": str(e)}
 
 
+@_questions_locked
 def duplicate_raffle_from_local(source_raffle_date: str, starts_at_local: str, title: str) -> Dict:
     """Дублирует розыгрыш с новой датой/временем и заголовком, копируя вопросы."""
     if not isinstance(source_raffle_date, str) or not source_raffle_date.strip():
@@ -1413,6 +1525,24 @@ def duplicate_raffle_from_local(source_raffle_date: str, starts_at_local: str, t
     return {"success": True, "raffle_date": target_raffle_date}
 
 
+@_questions_locked
+def _delete_raffle_data(raffle_date: str) -> Dict:
+    questions_data = load_questions()
+    if not questions_data or "raffle_dates" not in questions_data:
+        return {"success": False, "error": "Розыгрыш не найден"}
+    
+    raffle_dates = questions_data["raffle_dates"]
+    if raffle_date not in raffle_dates:
+        return {"success": False, "error": "Розыгрыш не найден"}
+    
+    del raffle_dates[raffle_date]
+    
+    if save_questions_data(questions_data):
+        return {"success": True}
+    else:
+        return {"success": False, "error": "Не удалось сохранить question.json"}
+
+
 async def delete_raffle(raffle_date: str) -> Dict:
     """Удаляет розыгрыш (вопросы и метаданные)
     
@@ -1420,30 +1550,18 @@ async def delete_raffle(raffle_date: str) -> Dict:
         {"success": bool, "error": str или None}
     """
     try:
-        questions_data = load_questions()
-        if not questions_data or "raffle_dates" not in questions_data:
-            return {"success": False, "error": "Розыгрыш не найден"}
-        
-        raffle_dates = questions_data["raffle_dates"]
-        if raffle_date not in raffle_dates:
-            return {"success": False, "error": "Розыгрыш не найден"}
-        
-        # Проверяем, не начался ли розыгрыш
+        # Проверка по БД - до блокировки question.json: под flock ждать нельзя
         if await has_raffle_started(raffle_date):
             return {"success": False, "error": "Нельзя удалить розыгрыш, который уже начался"}
         
-        del raffle_dates[raffle_date]
-        
-        if save_questions_data(questions_data):
-            return {"success": True}
-        else:
-            return {"success": False, "error": "Не удалось сохранить question.json"}
+        return await asyncio.to_thread(_delete_raffle_data, raffle_date)
             
     except Exception as e:
         logger.error(f"Ошибка при удалении розыгрыша: {e}")
         return {"success": False, "error": str(e)}
 
 
+@_questions_locked
 def add_raffle_question(raffle_date: str, question_id: int, title: str, text: str) -> Dict:
     """Добавляет вопрос к розыгрышу
     
@@ -1489,6 +1607,34 @@ def add_raffle_question(raffle_date: str, question_id: int, title: str, text: st
         return {"success": False, "error": str(e)}
 
 
+@_questions_locked
+def _remove_raffle_question_data(raffle_date: str, question_id: int) -> Dict:
+    questions_data = load_questions()
+    if not questions_data or "raffle_dates" not in questions_data:
+        return {"success": False, "error": "Розыгрыш не найден"}
+    
+    raffle_dates = questions_data["raffle_dates"]
+    if raffle_date not in raffle_dates:
+        return {"success": False, "error": "Розыгрыш не найден"}
+    
+    raffle_data = raffle_dates[raffle_date]
+    # Поддержка нового формата
+    if isinstance(raffle_data, dict) and "questions" in raffle_data:
+        questions = raffle_data["questions"]
+    else:
+        return {"success": False, "error": "Розыгрыш в старом формате"}
+    
+    if str(question_id) not in questions:
+        return {"success": False, "error": "Вопрос не найден"}
+    
+    del questions[str(question_id)]
+    
+    if save_questions_data(questions_data):
+        return {"success": True}
+    else:
+        return {"success": False, "error": "Не удалось сохранить question.json"}
+
+
 async def remove_raffle_question(raffle_date: str, question_id: int) -> Dict:
     """Удаляет вопрос из розыгрыша
     
@@ -1496,34 +1642,11 @@ async def remove_raffle_question(raffle_date: str, question_id: int) -> Dict:
         {"success": bool, "error": str или None}
     """
     try:
-        questions_data = load_questions()
-        if not questions_data or "raffle_dates" not in questions_data:
-            return {"success": False, "error": "Розыгрыш не найден"}
-        
-        raffle_dates = questions_data["raffle_dates"]
-        if raffle_date not in raffle_dates:
-            return {"success": False, "error": "Розыгрыш не найден"}
-        
-        raffle_data = raffle_dates[raffle_date]
-        # Поддержка нового формата
-        if isinstance(raffle_data, dict) and "questions" in raffle_data:
-            questions = raffle_data["questions"]
-        else:
-            return {"success": False, "error": "Розыгрыш в старом формате"}
-        
-        if str(question_id) not in questions:
-            return {"success": False, "error": "Вопрос не найден"}
-        
-        # Проверяем, не начался ли розыгрыш
+        # Проверка по БД - до блокировки question.json: под flock ждать нельзя
         if await has_raffle_started(raffle_date):
             return {"success": False, "error": "Нельзя удалить вопрос из розыгрыша, который уже начался"}
         
-        del questions[str(question_id)]
-        
-        if save_questions_data(questions_data):
-            return {"success": True}
-        else:
-            return {"success": False, "error": "Не удалось сохранить question.json"}
+        return await asyncio.to_thread(_remove_raffle_question_data, raffle_date, question_id)
             
     except Exception as e:
         logger.error(f"Ошибка при удалении вопроса: {e}")
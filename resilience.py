@@ -6,7 +6,7 @@
 import asyncio
 import logging
 import functools
-from typing import Callable, Any, Optional, TypeVar, Union
+from typing import Callable, Any, Optional, TypeVar, Union, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.exc import SQLAlchemyError, OperationalError, DisconnectionError
 from aiogram.exceptions import (
@@ -34,6 +34,32 @@ MAX_RETRY_DELAY = 60.0  # максимальная задержка
 RATE_LIMIT_DELAY = 0.05
 
 
+class RateLimiter:
+    """Ограничитель скорости: пропускает не более rate входов в секунду
+    
+    Используется как `async with limiter:` вокруг самой отправки, поэтому
+    паузы не зависят от того, успешно ли прошла предыдущая отправка.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            wait = self._next_slot - now
+            self._next_slot = max(self._next_slot, now) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
 class ResilienceError(Exception):
     """Базовый класс для ошибок отказоустойчивости"""
     pass
@@ -162,16 +188,37 @@ async def safe_send_message(
     text: str,
     parse_mode: Optional[str] = None,
     max_retries: int = MAX_RETRIES,
+    copy_source: Optional[Tuple[int, int]] = None,
     **kwargs
 ) -> bool:
     """
     Безопасная отправка сообщения с retry механизмом
     
+    Args:
+        copy_source: (chat_id, message_id) уже отправленного сообщения с тем же текстом.
+            Если указан, сообщение копируется через copy_message; при ошибке копирования
+            выполняется обычная отправка text
+    
     Returns:
         True если сообщение отправлено успешно, False в противном случае
     """
     for attempt in range(max_retries + 1):
         try:
+            if copy_source:
+                try:
+                    await bot.copy_message(
+                        chat_id=user_id,
+                        from_chat_id=copy_source[0],
+                        message_id=copy_source[1],
+                        **kwargs
+                    )
+                    return True
+                except (TelegramBadRequest, TelegramForbiddenError) as e:
+                    # Исходное сообщение/чат недоступны (Forbidden бывает и из-за чата-источника) -
+                    # отправляем текст в этой же попытке. Ошибки самого получателя, в том числе
+                    # блокировка бота, проявятся уже при обычной отправке
+                    logger.debug(f"Не удалось скопировать сообщение для {user_id}, отправляю текст: {e}")
+                    copy_source = None
             await bot.send_message(
                 user_id,
                 text,
@@ -473,6 +520,7 @@ async def safe_load_predictions(file_path: str, fallback_data: Optional[dict] =
     """
     import json
     from pathlib import Path
+    from jsonio import read_json
     
     predictions_path = Path(file_path)
     
@@ -485,8 +533,7 @@ async def safe_load_predictions(file_path: str, fallback_data: Optional[dict] =
                     return fallback_data.get("start_date"), fallback_data.get("days", {})
                 return None, None
             
-            with open(predictions_path, "r", encoding="utf-8") as f:
-                predictions_data = json.load(f)
+            predictions_data = read_json(predictions_path)
             
             start_date = predictions_data.get("start_date", "2025-12-01")
             days_data = predictions_data.get("days", {})
@@ -100,6 +100,13 @@ async def migrate_quiz_tables():
                 else:
                     logger.info("✅ Таблица quiz_results уже существует")
             
+            # Индексы для уже существующих таблиц (create_all их не добавляет)
+            for index in QuizResult.__table__.indexes:
+                await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn, checkfirst=True))
+            # Одноколоночный индекс по completed_at покрыт ix_quiz_results_completed_ticket (тот же первый столбец)
+            await conn.execute(text("DROP INDEX IF EXISTS ix_quiz_results_completed_at"))
+            logger.info("✅ Индексы quiz_results проверены")
+            
             logger.info("✅ Миграция квизов завершена успешно!")
             
     except Exception as e:
@@ -227,6 +227,13 @@ async def safe_migrate():
                     logger.warning("⚠️ Поле id не найдено в таблице")
                 
                 logger.info("✅ Структура таблицы для PostgreSQL проверена")
+            
+            # Индексы (в т.ч. после пересоздания таблицы в SQLite)
+            for index in RaffleParticipant.__table__.indexes:
+                await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn, checkfirst=True))
+            # Одноколоночный индекс по timestamp покрыт ix_raffle_participants_timestamp_ticket (тот же первый столбец)
+            await conn.execute(text("DROP INDEX IF EXISTS ix_raffle_participants_timestamp"))
+            logger.info("✅ Индексы raffle_participants проверены")
                     
     except Exception as e:
         logger.error(f"Ошибка при миграции: {e}", exc_info=True)
@@ -1,17 +1,25 @@
 import asyncio
 import json
 import logging
+import time
+from functools import lru_cache
+from operator import itemgetter
 from datetime import datetime, date, timezone, timedelta, time as dt_time
 from pathlib import Path
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from sqlalchemy import select, and_
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from sqlalchemy import select, update, and_, or_
 from sqlalchemy.exc import SQLAlchemyError
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from database import AsyncSessionLocal, User, RaffleParticipant
-from config import DAILY_HOUR, DAILY_MINUTE, ZODIAC_NAMES
+from jsonio import read_json
+from config import (
+    DAILY_HOUR, DAILY_MINUTE, ZODIAC_NAMES, TG_CONCURRENCY, TG_BROADCAST_RATE, SCHEDULER_JOBSTORE_URL
+)
 from raffle import (
-    send_raffle_announcement, send_raffle_reminder, is_raffle_date, auto_close_raffle,
-    RAFFLE_DATES, RAFFLE_HOUR, RAFFLE_MINUTE, RAFFLE_PARTICIPATION_WINDOW, RAFFLE_REMINDER_DELAY
+    send_raffle_announcement, send_raffle_reminder, is_raffle_date, auto_close_raffle, create_or_get_raffle,
+    get_all_raffle_dates,
+    RAFFLE_DATES, RAFFLE_DATES_SET, RAFFLE_HOUR, RAFFLE_MINUTE, RAFFLE_PARTICIPATION_WINDOW, RAFFLE_REMINDER_DELAY
 )
 from quiz import (
     send_quiz_announcement, send_quiz_reminder, mark_non_participants,
@@ -23,16 +31,19 @@ from quiz import (
 MOSCOW_TZ = timezone(timedelta(hours=3))
 from resilience import (
     safe_send_message,
+    safe_send_message_with_result,
     safe_load_predictions,
     safe_db_operation,
     should_unsubscribe_user,
     handle_critical_error,
-    RATE_LIMIT_DELAY
+    RateLimiter,
 )
 
 # Импорт bot будет выполнен позже для избежания циклического импорта
 bot = None
 scheduler = None  # Глобальный экземпляр планировщика
+# Общий для всех рассылок планировщика лимит скорости отправки в Telegram
+TG_LIMITER = RateLimiter(TG_BROADCAST_RATE)
 
 def set_bot(bot_instance):
     """Установка экземпляра бота для использования в scheduler"""
@@ -41,30 +52,159 @@ def set_bot(bot_instance):
 
 logger = logging.getLogger(__name__)
 
-def _quiz_disabled_file() -> Path:
-    # scheduler.py лежит в корне проекта
-    base_dir = Path(__file__).parent
-    return base_dir / "data" / "quiz_disabled_dates.json"
+# Пути к файлам отключенных дат (scheduler.py лежит в корне проекта) - вычисляются один раз
+_QUIZ_DISABLED_FILE = Path(__file__).resolve().parent / "data" / "quiz_disabled_dates.json"
+_RAFFLE_DISABLED_FILE = Path(__file__).resolve().parent / "data" / "raffle_disabled_dates.json"
+
 
+# Кэш списков отключенных дат: {путь: (st_mtime_ns, даты)}.
+# Файл перечитывается только после изменения (правки из админки меняют mtime)
+_disabled_dates_cache: dict[Path, tuple[int, frozenset[str]]] = {}
 
-def _load_quiz_disabled_dates() -> set[str]:
-    disabled_file = _quiz_disabled_file()
+
+def _load_disabled_dates(disabled_file: Path) -> frozenset[str]:
+    try:
+        mtime_ns = disabled_file.stat().st_mtime_ns
+    except FileNotFoundError:
+        _disabled_dates_cache.pop(disabled_file, None)
+        return frozenset()
+    except OSError as e:
+        logger.warning(f"Не удалось загрузить {disabled_file.name}: {e}")
+        return frozenset()
+
+    cached = _disabled_dates_cache.get(disabled_file)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    dates_set = frozenset()
     try:
-        if disabled_file.exists():
-            with open(disabled_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                dates = data.get("dates", [])
-                if isinstance(dates, list):
-                    return set(str(d).strip() for d in dates if str(d).strip())
+        data = read_json(disabled_file)
+        dates = data.get("dates", [])
+        if isinstance(dates, list):
+            dates_set = frozenset(str(d).strip() for d in dates if str(d).strip())
     except Exception as e:
-        logger.warning(f"Не удалось загрузить quiz_disabled_dates.json: {e}")
-    return set()
+        logger.warning(f"Не удалось загрузить {disabled_file.name}: {e}")
+        return dates_set
+    _disabled_dates_cache[disabled_file] = (mtime_ns, dates_set)
+    return dates_set
+
+
+def _load_quiz_disabled_dates() -> frozenset[str]:
+    return _load_disabled_dates(_QUIZ_DISABLED_FILE)
 
 
 def _is_quiz_disabled(quiz_date: str) -> bool:
     return quiz_date in _load_quiz_disabled_dates()
 
 
+def _add_date_job(func, run_date: datetime, job_id: str, args: list) -> bool:
+    """Добавляет разовую задачу, если её нет в хранилище или изменилось время запуска.
+
+    Задачи хранятся в БД и переживают перезапуск бота, поэтому неизменённые
+    задачи не пересоздаются при каждом старте.
+
+    Returns:
+        True если задача добавлена/обновлена, False если такая задача уже есть
+    """
+    existing = scheduler.get_job(job_id)
+    if (
+        existing is not None
+        and getattr(existing.trigger, "run_date", None) == run_date
+        and list(existing.args) == list(args)
+    ):
+        return False
+    scheduler.add_job(func, "date", run_date=run_date, id=job_id, replace_existing=True, args=args)
+    return True
+
+
+# Выполняющиеся составные задачи дня: {job_id: asyncio.Task}
+_day_tasks = {}
+# Задачи, которые сейчас ждут времени следующего этапа (только их можно отменять)
+_sleeping_day_tasks = set()
+# Задачи, заменённые перепланированием во время выполнения этапа: остановятся после него
+_superseded_day_tasks = set()
+
+
+def _schedule_day_job(func, job_id: str, day: str, stages: list) -> bool:
+    """Планирует одну составную задачу на день вместо отдельной задачи на каждый этап.
+
+    Задача срабатывает к первому будущему этапу и дальше сама дожидается остальных.
+    Этапы, время которых уже прошло, передаются как None и не выполняются.
+    """
+    pending = [run_at for run_at in stages if run_at is not None]
+    if not pending:
+        return False
+    return _add_date_job(func, min(pending), job_id, [day, *stages])
+
+
+def _cancel_day_job(job_id: str):
+    """Удаляет составную задачу дня и останавливает уже запущенную.
+
+    Задача, которая ждёт следующего этапа, отменяется сразу. Этап, который выполняется
+    (например, рассылка объявления), не прерывается: задача завершится после него,
+    иначе часть пользователей не получила бы сообщение - повторно прошедший этап не планируется.
+    """
+    try:
+        scheduler.remove_job(job_id)
+    except Exception:
+        pass
+    task = _day_tasks.pop(job_id, None)
+    if task is None or task.done():
+        return
+    if task in _sleeping_day_tasks:
+        task.cancel()
+    else:
+        _superseded_day_tasks.add(task)
+        logger.info(f"Этап задачи {job_id} выполняется - задача остановится после его завершения")
+
+
+async def _sleep_until(run_at: datetime):
+    delay = (run_at - datetime.now(timezone.utc)).total_seconds()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def _run_day_stages(job_id: str, day: str, stages):
+    """Выполняет этапы дня по очереди, дожидаясь времени каждого"""
+    task = asyncio.current_task()
+    _day_tasks[job_id] = task
+    try:
+        for run_at, action in stages:
+            if run_at is None:
+                continue
+            if task in _superseded_day_tasks:
+                return
+            # Отменить задачу можно только здесь, пока она ждёт; сам этап дорабатывает до конца
+            _sleeping_day_tasks.add(task)
+            try:
+                await _sleep_until(run_at)
+            finally:
+                _sleeping_day_tasks.discard(task)
+            await action(day)
+    finally:
+        _superseded_day_tasks.discard(task)
+        if _day_tasks.get(job_id) is task:
+            del _day_tasks[job_id]
+
+
+async def run_quiz_day(quiz_date: str, announcement_at, reminder_at, mark_at):
+    """Составная задача квиза: объявление, напоминание и отметка не принявших участие"""
+    await _run_day_stages(f"quiz_day_{quiz_date}", quiz_date, (
+        (announcement_at, send_quiz_announcements_for_date),
+        (reminder_at, send_quiz_reminders_for_date),
+        (mark_at, mark_quiz_non_participants_for_date),
+    ))
+
+
+async def run_raffle_day(raffle_date: str, announcement_at, reminder_at, close_at):
+    """Составная задача розыгрыша: объявление, напоминание и закрытие"""
+    await _run_day_stages(f"raffle_day_{raffle_date}", raffle_date, (
+        (announcement_at, send_raffle_announcements_for_date),
+        (reminder_at, send_raffle_reminders_for_date),
+        (close_at, close_raffle_automatically),
+    ))
+
+
 def _schedule_quiz_jobs_for_date(quiz_date: str):
     """Планирует объявление/напоминание/отметку для конкретного квиза.
 
@@ -91,44 +231,25 @@ def _schedule_quiz_jobs_for_date(quiz_date: str):
         reminder_datetime = (starts_at_moscow + timedelta(hours=QUIZ_REMINDER_DELAY)).astimezone(timezone.utc)
         mark_datetime = (starts_at_moscow + timedelta(hours=QUIZ_PARTICIPATION_WINDOW)).astimezone(timezone.utc)
 
-        if announcement_datetime > now_utc:
-            scheduler.add_job(
-                send_quiz_announcements_for_date,
-                "date",
-                run_date=announcement_datetime,
-                id=f"quiz_announcements_{quiz_date}",
-                replace_existing=True,
-                args=[quiz_date],
-            )
-            logger.info(
-                f"✅ Задача объявления квиза для {quiz_date} запланирована на "
-                f"{announcement_datetime.strftime('%d.%m.%Y %H:%M')} UTC "
-                f"({starts_at_moscow.strftime('%d.%m.%Y %H:%M')} МСК)"
-            )
-        else:
-            logger.debug(f"⏰ Время объявления квиза для {quiz_date} уже прошло, задача не будет создана")
+        stages = [dt if dt > now_utc else None for dt in (announcement_datetime, reminder_datetime, mark_datetime)]
+        # Логируем только реальное (пере)планирование: неизменённая задача в хранилище не трогается
+        if _schedule_day_job(run_quiz_day, f"quiz_day_{quiz_date}", quiz_date, stages):
+            if announcement_datetime > now_utc:
+                logger.info(
+                    f"✅ Задача объявления квиза для {quiz_date} запланирована на "
+                    f"{announcement_datetime.strftime('%d.%m.%Y %H:%M')} UTC "
+                    f"({starts_at_moscow.strftime('%d.%m.%Y %H:%M')} МСК)"
+                )
+            else:
+                logger.debug(f"⏰ Время объявления квиза для {quiz_date} уже прошло, задача не будет создана")
 
-        if reminder_datetime > now_utc:
-            scheduler.add_job(
-                send_quiz_reminders_for_date,
-                "date",
-                run_date=reminder_datetime,
-                id=f"quiz_reminders_{quiz_date}",
-                replace_existing=True,
-                args=[quiz_date],
-            )
-            logger.info(f"✅ Задача напоминания квиза для {quiz_date} запланирована на {reminder_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
-
-        if mark_datetime > now_utc:
-            scheduler.add_job(
-                mark_quiz_non_participants_for_date,
-                "date",
-                run_date=mark_datetime,
-                id=f"quiz_mark_{quiz_date}",
-                replace_existing=True,
-                args=[quiz_date],
-            )
-            logger.info(f"✅ Задача отметки не принявших участие для {quiz_date} запланирована на {mark_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
+            if reminder_datetime > now_utc:
+                logger.info(f"✅ Задача напоминания квиза для {quiz_date} запланирована на {reminder_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
+
+            if mark_datetime > now_utc:
+                logger.info(f"✅ Задача отметки не принявших участие для {quiz_date} запланирована на {mark_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
+        else:
+            logger.debug(f"Задачи квиза для {quiz_date} без изменений или все этапы уже прошли")
 
     except Exception as e:
         logger.error(f"Ошибка при планировании задач квиза {quiz_date}: {e}", exc_info=True)
@@ -173,29 +294,23 @@ def get_jobs_snapshot() -> dict:
     if not scheduler:
         return {"running": False, "jobs": []}
 
-    jobs = []
+    rows = []
+    append = rows.append
     try:
         for j in scheduler.get_jobs():
-            next_run = None
-            try:
-                next_run = j.next_run_time.isoformat() if j.next_run_time else None
-            except Exception:
-                next_run = None
-
-            jobs.append({
-                "id": j.id,
-                "name": getattr(j, "name", None),
-                "next_run_time": next_run,
-                "trigger": str(j.trigger) if getattr(j, "trigger", None) else None,
-            })
+            next_run_time = getattr(j, "next_run_time", None)
+            next_run = next_run_time.isoformat() if next_run_time else None
+            trigger = getattr(j, "trigger", None)
+            # Ключ сортировки - первые элементы кортежа: сначала с временем, потом без
+            append((next_run is None, next_run or "", j.id, next_run, getattr(j, "name", None), str(trigger) if trigger else None))
     except Exception as e:
         return {"running": bool(getattr(scheduler, "running", False)), "jobs": [], "error": str(e)}
 
-    # Стабильная сортировка: сначала с временем, потом без
-    def _sort_key(x):
-        return (x["next_run_time"] is None, x["next_run_time"] or "", x["id"])
-
-    jobs.sort(key=_sort_key)
+    rows.sort(key=itemgetter(0, 1, 2))
+    jobs = [
+        {"id": job_id, "name": name, "next_run_time": next_run, "trigger": trigger}
+        for _, _, job_id, next_run, name, trigger in rows
+    ]
     return {"running": bool(getattr(scheduler, "running", False)), "jobs": jobs}
 
 
@@ -205,58 +320,43 @@ def reschedule_quiz_jobs_if_running(quiz_date: str) -> bool:
     if not scheduler or not getattr(scheduler, "running", False):
         return False
 
-    for job_id in (f"quiz_announcements_{quiz_date}", f"quiz_reminders_{quiz_date}", f"quiz_mark_{quiz_date}"):
-        try:
-            scheduler.remove_job(job_id)
-        except Exception:
-            pass
+    _cancel_day_job(f"quiz_day_{quiz_date}")
 
     _schedule_quiz_jobs_for_date(quiz_date)
     return True
 
 
-def _raffle_disabled_file() -> Path:
-    base_dir = Path(__file__).parent
-    return base_dir / "data" / "raffle_disabled_dates.json"
-
-
-def _load_raffle_disabled_dates() -> set[str]:
-    disabled_file = _raffle_disabled_file()
-    try:
-        if disabled_file.exists():
-            with open(disabled_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                dates = data.get("dates", [])
-                if isinstance(dates, list):
-                    return set(str(d).strip() for d in dates if str(d).strip())
-    except Exception as e:
-        logger.warning(f"Не удалось загрузить raffle_disabled_dates.json: {e}")
-    return set()
+def _load_raffle_disabled_dates() -> frozenset[str]:
+    return _load_disabled_dates(_RAFFLE_DISABLED_FILE)
 
 
 def _is_raffle_disabled(raffle_date: str) -> bool:
     return raffle_date in _load_raffle_disabled_dates()
 
 
-def _schedule_raffle_jobs_for_date(raffle_date: str):
+def _schedule_raffle_jobs_for_date(raffle_date: str) -> bool:
     """Планирует объявление/напоминание/закрытие для конкретного розыгрыша.
 
     Время берётся из meta.starts_at в data/question.json, иначе из RAFFLE_HOUR/RAFFLE_MINUTE.
+
+    Returns:
+        True, если задачи розыгрыша запланированы; False - розыгрыш отключен или планирование
+        не удалось (ошибка записана в лог)
     """
     global scheduler
     if scheduler is None:
-        return
+        return False
 
     if _is_raffle_disabled(raffle_date):
         logger.info(f"⏭️ Розыгрыш для {raffle_date} отключен (raffle_disabled_dates.json), пропускаю планирование")
-        return
+        return False
 
     try:
         from raffle import get_raffle_start_datetime_moscow
         starts_at_moscow = get_raffle_start_datetime_moscow(raffle_date)
         if not starts_at_moscow:
             logger.warning(f"Не удалось получить starts_at для розыгрыша {raffle_date}, пропускаю")
-            return
+            return False
 
         now_utc = datetime.now(timezone.utc)
 
@@ -264,56 +364,47 @@ def _schedule_raffle_jobs_for_date(raffle_date: str):
         reminder_datetime = (starts_at_moscow + timedelta(hours=RAFFLE_REMINDER_DELAY)).astimezone(timezone.utc)
         close_datetime = (starts_at_moscow + timedelta(hours=RAFFLE_PARTICIPATION_WINDOW)).astimezone(timezone.utc)
 
-        if announcement_datetime > now_utc:
-            scheduler.add_job(
-                send_raffle_announcements_for_date,
-                "date",
-                run_date=announcement_datetime,
-                id=f"raffle_announcements_{raffle_date}",
-                replace_existing=True,
-                args=[raffle_date],
-            )
-            logger.info(
-                f"✅ Задача объявления розыгрыша для {raffle_date} запланирована на "
-                f"{announcement_datetime.strftime('%d.%m.%Y %H:%M')} UTC "
-                f"({starts_at_moscow.strftime('%d.%m.%Y %H:%M')} МСК)"
-            )
-        else:
-            logger.debug(f"⏰ Время объявления розыгрыша для {raffle_date} уже прошло, задача не будет создана")
+        stages = [dt if dt > now_utc else None for dt in (announcement_datetime, reminder_datetime, close_datetime)]
+        # Логируем только реальное (пере)планирование: неизменённая задача в хранилище не трогается
+        if _schedule_day_job(run_raffle_day, f"raffle_day_{raffle_date}", raffle_date, stages):
+            if announcement_datetime > now_utc:
+                logger.info(
+                    f"✅ Задача объявления розыгрыша для {raffle_date} запланирована на "
+                    f"{announcement_datetime.strftime('%d.%m.%Y %H:%M')} UTC "
+                    f"({starts_at_moscow.strftime('%d.%m.%Y %H:%M')} МСК)"
+                )
+            else:
+                logger.debug(f"⏰ Время объявления розыгрыша для {raffle_date} уже прошло, задача не будет создана")
 
-        if reminder_datetime > now_utc:
-            scheduler.add_job(
-                send_raffle_reminders_for_date,
-                "date",
-                run_date=reminder_datetime,
-                id=f"raffle_reminders_{raffle_date}",
-                replace_existing=True,
-                args=[raffle_date],
-            )
-            logger.info(f"✅ Задача напоминания розыгрыша для {raffle_date} запланирована на {reminder_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
+            if reminder_datetime > now_utc:
+                logger.info(f"✅ Задача напоминания розыгрыша для {raffle_date} запланирована на {reminder_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
 
-        if close_datetime > now_utc:
-            scheduler.add_job(
-                close_raffle_automatically,
-                "date",
-                run_date=close_datetime,
-                id=f"raffle_close_{raffle_date}",
-                replace_existing=True,
-                args=[raffle_date],
-            )
-            logger.info(f"✅ Задача закрытия розыгрыша для {raffle_date} запланирована на {close_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
+            if close_datetime > now_utc:
+                logger.info(f"✅ Задача закрытия розыгрыша для {raffle_date} запланирована на {close_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
+        else:
+            logger.debug(f"Задачи розыгрыша для {raffle_date} без изменений или все этапы уже прошли")
 
     except Exception as e:
         logger.error(f"Ошибка при планировании розыгрыша {raffle_date}: {e}", exc_info=True)
+        return False
+    return True
+
+
+def is_scheduler_running() -> bool:
+    """Запущен ли scheduler"""
+    return scheduler is not None and getattr(scheduler, "running", False)
 
 
 def schedule_raffle_jobs_if_running(raffle_date: str) -> bool:
-    """Публичный хук для web-админки: сразу добавить задачи нового розыгрыша без рестарта бота."""
+    """Публичный хук для web-админки: сразу добавить задачи нового розыгрыша без рестарта бота.
+
+    Вызывается в потоке event loop: _cancel_day_job и _day_tasks не потокобезопасны.
+    Возвращает True только если задачи действительно запланированы.
+    """
     global scheduler
     if scheduler is None or not getattr(scheduler, "running", False):
         return False
-    _schedule_raffle_jobs_for_date(raffle_date)
-    return True
+    return _schedule_raffle_jobs_for_date(raffle_date)
 
 
 def reschedule_raffle_jobs_if_running(raffle_date: str) -> bool:
@@ -322,14 +413,9 @@ def reschedule_raffle_jobs_if_running(raffle_date: str) -> bool:
     if not scheduler or not getattr(scheduler, "running", False):
         return False
 
-    for job_id in (f"raffle_announcements_{raffle_date}", f"raffle_reminders_{raffle_date}", f"raffle_close_{raffle_date}"):
-        try:
-            scheduler.remove_job(job_id)
-        except Exception:
-            pass
+    _cancel_day_job(f"raffle_day_{raffle_date}")
 
-    _schedule_raffle_jobs_for_date(raffle_date)
-    return True
+    return _schedule_raffle_jobs_for_date(raffle_date)
 
 
 async def send_dice_announcements_for_dice_id(dice_id: str):
@@ -399,15 +485,10 @@ def _schedule_dice_jobs_for_dice_id(dice_id: str):
         announcement_datetime = starts_at_moscow.astimezone(timezone.utc)
         
         if announcement_datetime > now_utc:
-            scheduler.add_job(
-                send_dice_announcements_for_dice_id,
-                "date",
-                run_date=announcement_datetime,
-                id=f"dice_announcements_{dice_id}",
-                replace_existing=True,
-                args=[dice_id]
-            )
-            logger.info(f"✅ Запланировано объявление dice {dice_id} на {starts_at_moscow.strftime('%Y-%m-%d %H:%M')} МСК")
+            if _add_date_job(send_dice_announcements_for_dice_id, announcement_datetime, f"dice_announcements_{dice_id}", [dice_id]):
+                logger.info(f"✅ Запланировано объявление dice {dice_id} на {starts_at_moscow.strftime('%Y-%m-%d %H:%M')} МСК")
+            else:
+                logger.debug(f"Объявление dice {dice_id} уже запланировано на это время, пропускаю")
         else:
             logger.info(f"⏭️ Время объявления dice {dice_id} уже прошло, пропускаю планирование")
     except Exception as e:
@@ -450,8 +531,7 @@ def load_predictions():
         return None, None
     
     try:
-        with open(predictions_path, "r", encoding="utf-8") as f:
-            predictions_data = json.load(f)
+        predictions_data = read_json(predictions_path)
         
         start_date = predictions_data.get("start_date", "2025-12-01")
         days_data = predictions_data.get("days", {})
@@ -481,6 +561,10 @@ def get_today_prediction(zodiac_id: int, force_day: int = None):
     
     return prediction_data, current_day
 
+# Дата начала рассылки меняется редко: разобранное значение кэшируем по строке
+_parse_start_date = lru_cache(maxsize=8)(date.fromisoformat)
+
+
 def get_day_number(start_date_str: str, current_date: date = None) -> int:
     """
     Вычисляет номер дня (1-31) от даты начала рассылки
@@ -491,23 +575,27 @@ def get_day_number(start_date_str: str, current_date: date = None) -> int:
     if current_date is None:
         current_date = datetime.now(MOSCOW_TZ).date()
     
+    debug_on = logger.isEnabledFor(logging.DEBUG)
     try:
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        start_date = _parse_start_date(start_date_str)
         delta = (current_date - start_date).days + 1
         
         # Если рассылка еще не началась (delta < 1), используем день 1
         if delta < 1:
-            logger.debug(f"Рассылка еще не началась. Текущая дата: {current_date}, дата начала: {start_date}")
+            if debug_on:
+                logger.debug(f"Рассылка еще не началась. Текущая дата: {current_date}, дата начала: {start_date}")
             return 1
         
         # Если день > 31, используем цикл (день % 31, но не 0)
         if delta > 31:
             day_num = ((delta - 1) % 31) + 1
-            logger.debug(f"Прошел 31-й день, используем цикл. Delta: {delta}, Day: {day_num}")
+            if debug_on:
+                logger.debug(f"Прошел 31-й день, используем цикл. Delta: {delta}, Day: {day_num}")
         else:
             day_num = delta
         
-        logger.debug(f"Вычислен день рассылки: {day_num} (от {start_date}, текущая дата: {current_date})")
+        if debug_on:
+            logger.debug(f"Вычислен день рассылки: {day_num} (от {start_date}, текущая дата: {current_date})")
         return day_num
     except ValueError as e:
         logger.error(f"Ошибка парсинга даты {start_date_str}: {e}")
@@ -536,7 +624,7 @@ async def send_daily(force_day: int = None):
             logger.info(f"⚠️ ПРИНУДИТЕЛЬНАЯ рассылка для дня {current_day} (игнорируется текущая дата)")
         else:
             current_day = get_day_number(start_date, current_date_moscow)
-            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
+            start_date_obj = date.fromisoformat(start_date)
             
             # Проверяем, что рассылка в допустимом периоде (до 31 дня включительно)
             days_since_start = (current_date_moscow - start_date_obj).days + 1
@@ -562,7 +650,7 @@ async def send_daily(force_day: int = None):
 
         # Безопасное получение всех подписанных пользователей
         try:
-            users = await _get_subscribed_users()
+            users = await _get_daily_recipients()
         except SQLAlchemyError as e:
             logger.error(f"Ошибка БД при получении пользователей: {e}")
             return
@@ -576,80 +664,212 @@ async def send_daily(force_day: int = None):
 
         logger.info(f"Начинаю рассылку для {len(users)} пользователей (день {current_day})")
 
+        # Тексты прогнозов одинаковы для всех пользователей одного знака:
+        # собираем их один раз до цикла, а не для каждого пользователя
+        default_names = {}
+        bodies_by_zid = {}
+        texts_by_zid = {}
+        for zid, prediction_data in day_predictions.items():
+            zodiac_id = int(zid) if str(zid).isdigit() else zid
+            default_names[zid] = ZODIAC_NAMES.get(zodiac_id, f"Знак #{zid}")
+            bodies_by_zid[zid] = (
+                f"{prediction_data.get('prediction', '')}\n\n"
+                f"📝 Задание: {prediction_data.get('task', '')}"
+            )
+            texts_by_zid[zid] = _format_daily_text(default_names[zid], bodies_by_zid[zid])
+
+        # Первое отправленное сообщение каждого знака: (chat_id, message_id) для copy_message
+        copy_sources = {}
+
         success_count = 0
         error_count = 0
-        unsubscribe_count = 0
 
-        for user in users:
-            # Пропускаем пользователей без знака зодиака
-            if not user.zodiac:
-                logger.warning(f"Пользователь {user.id} подписан, но не выбрал знак зодиака. Пропускаем.")
-                # Отписываем таких пользователей, чтобы не проверять их каждый раз
-                await _unsubscribe_user_safe(user.id, reason="нет знака зодиака")
-                continue
+        # Пропуски считаем в цикле и логируем одной сводкой после него
+        missing_prediction = {}
 
+        # Пользователи без знака зодиака отфильтрованы в запросе
+        # и отписываются еженедельной задачей unsubscribe_users_without_zodiac
+        for user in users:
             zid = str(user.zodiac)
-            if zid not in day_predictions:
-                logger.warning(f"Нет прогноза для знака {zid} в день {current_day} (пользователь {user.id})")
+            text = texts_by_zid.get(zid)
+            if text is None:
+                missing_prediction[zid] = missing_prediction.get(zid, 0) + 1
                 continue
 
-            prediction_data = day_predictions[zid]
-            # Используем название из базы, если есть, иначе из словаря
-            zodiac_name = user.zodiac_name or ZODIAC_NAMES.get(user.zodiac, f"Знак #{user.zodiac}")
-            text = (
-                f"🌟 Гороскоп на сегодня - {zodiac_name}\n\n"
-                f"{prediction_data.get('prediction', '')}\n\n"
-                f"📝 Задание: {prediction_data.get('task', '')}"
-            )
-
             # Безопасная отправка сообщения с автоматической обработкой ошибок
-            success = await safe_send_message(bot, user.id, text)
+            async with TG_LIMITER:  # Throttling для избежания rate limit
+                if user.zodiac_name and user.zodiac_name != default_names[zid]:
+                    # Используем название из базы, если оно отличается от стандартного
+                    text = _format_daily_text(user.zodiac_name, bodies_by_zid[zid])
+                    success = await safe_send_message(bot, user.id, text)
+                elif zid in copy_sources:
+                    # Такой же текст уже отправлен: копируем сообщение вместо повторной передачи тела
+                    success = await safe_send_message(bot, user.id, text, copy_source=copy_sources[zid])
+                else:
+                    message = await safe_send_message_with_result(bot, user.id, text)
+                    success = message is not None
+                    if message:
+                        copy_sources[zid] = (user.id, message.message_id)
             
             if success:
                 success_count += 1
-                await asyncio.sleep(RATE_LIMIT_DELAY)  # Throttling для избежания rate limit
             else:
+                # Ошибка уже залогирована внутри safe_send_message
                 error_count += 1
-                # Проверяем, нужно ли отписать пользователя (заблокировал бота и т.д.)
-                # Это уже обработано внутри safe_send_message, но проверим еще раз
-                try:
-                    # Пытаемся отписать, если пользователь заблокировал бота
-                    # (это уже сделано в safe_send_message, но добавим для надежности)
-                    pass
-                except Exception as e:
-                    logger.warning(f"Ошибка при обработке ошибки отправки для пользователя {user.id}: {e}")
+
+        for zid, count in missing_prediction.items():
+            logger.warning(f"Нет прогноза для знака {zid} в день {current_day} (пропущено пользователей: {count})")
 
         logger.info(
-            f"Рассылка завершена. Успешно: {success_count}, Ошибок: {error_count}, "
-            f"Отписано: {unsubscribe_count}"
+            f"Рассылка завершена. Успешно: {success_count}, Ошибок: {error_count}"
         )
 
     except Exception as e:
         handle_critical_error("send_daily", e, {"force_day": force_day})
 
 
+def _format_daily_text(zodiac_name: str, body: str) -> str:
+    """Собирает текст ежедневного гороскопа из названия знака и готового тела прогноза"""
+    return f"🌟 Гороскоп на сегодня - {zodiac_name}\n\n{body}"
+
+
+# Кэш подписанных пользователей: объявления и напоминания одного квиза/розыгрыша
+# идут с разницей в минуты, поэтому повторно сканировать таблицу незачем
+SUBSCRIBED_USERS_TTL = 60.0
+_subscribed_users_cache = None  # (monotonic-время загрузки, список пользователей)
+_subscribed_users_lock = asyncio.Lock()
+
+
+def invalidate_subscribed_users_cache():
+    """Сбрасывает кэш подписанных пользователей (вызывать после подписки/отписки)"""
+    global _subscribed_users_cache
+    _subscribed_users_cache = None
+
+
 async def _get_subscribed_users():
-    """Вспомогательная функция для получения подписанных пользователей"""
+    """Вспомогательная функция для получения подписанных пользователей
+    
+    Результат кэшируется на SUBSCRIBED_USERS_TTL секунд; возвращаемый список только для чтения.
+    """
+    global _subscribed_users_cache
+    async with _subscribed_users_lock:
+        cached = _subscribed_users_cache
+        if cached is not None and time.monotonic() - cached[0] < SUBSCRIBED_USERS_TTL:
+            return cached[1]
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(User).where(User.subscribed == True)
+            )
+            users = result.scalars().all()
+        _subscribed_users_cache = (time.monotonic(), users)
+        return users
+
+
+# Сколько отправок одной рассылки планируется за раз (одновременность ограничена TG_CONCURRENCY)
+BROADCAST_CHUNK_SIZE = 1000
+
+
+async def _broadcast(user_ids, send_fn, label: str) -> tuple[int, int]:
+    """Параллельная рассылка с ограничением числа одновременных отправок и общей скорости
+    
+    Args:
+        user_ids: ID пользователей для рассылки
+        send_fn: корутинная функция send_fn(user_id), возвращающая истинное значение при успехе
+        label: описание рассылки для логов
+    
+    Returns:
+        (успешно, ошибок)
+    """
+    semaphore = asyncio.Semaphore(TG_CONCURRENCY)
+
+    async def _send(user_id: int):
+        async with semaphore:
+            async with TG_LIMITER:
+                return await send_fn(user_id)
+
+    user_ids = list(user_ids)
+    success_count = 0
+    # Корутины создаём порциями, чтобы не держать в памяти задачи на всех пользователей сразу
+    for start in range(0, len(user_ids), BROADCAST_CHUNK_SIZE):
+        chunk = user_ids[start:start + BROADCAST_CHUNK_SIZE]
+        # Исключения возвращаются как результаты: подсчёт и логирование - одним проходом после gather
+        results = await asyncio.gather(*(_send(user_id) for user_id in chunk), return_exceptions=True)
+        for user_id, result in zip(chunk, results):
+            # BaseException: отменённая отправка (CancelledError) - тоже неуспех, а не истинный результат
+            if isinstance(result, BaseException):
+                logger.error(f"Ошибка при отправке ({label}) пользователю {user_id}: {result!r}")
+            elif result:
+                success_count += 1
+
+    return success_count, len(user_ids) - success_count
+
+
+async def _get_subscribed_user_ids_not_in_raffle(raffle_date: str) -> list[int]:
+    """ID подписанных пользователей, которые еще не участвовали в розыгрыше
+    
+    Участник - это тот, у кого question_id != 0 (нажал кнопку и получил вопрос);
+    записи с question_id == 0 (только получено объявление) участием не считаются.
+    """
+    participated = select(RaffleParticipant.id).where(
+        RaffleParticipant.user_id == User.id,
+        RaffleParticipant.raffle_date == raffle_date,
+        RaffleParticipant.question_id != 0,
+    )
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(User.id).where(User.subscribed == True, ~participated.exists())
+        )
+        return list(result.scalars().all())
+
+
+async def _get_daily_recipients():
+    """Подписанные пользователи с выбранным знаком зодиака (получатели ежедневного гороскопа)"""
     async with AsyncSessionLocal() as session:
         result = await session.execute(
-            select(User).where(User.subscribed == True)
+            select(User).where(
+                User.subscribed == True,
+                User.zodiac.isnot(None),
+                User.zodiac != 0,
+            )
         )
         return result.scalars().all()
 
 
+async def unsubscribe_users_without_zodiac():
+    """Отписывает одним UPDATE подписанных пользователей, не выбравших знак зодиака"""
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(User)
+                .where(
+                    User.subscribed == True,
+                    or_(User.zodiac.is_(None), User.zodiac == 0),
+                )
+                .values(subscribed=False)
+            )
+            await session.commit()
+            if result.rowcount:
+                invalidate_subscribed_users_cache()
+                logger.info(f"Автоматически отписано {result.rowcount} пользователей без знака зодиака")
+    except SQLAlchemyError as e:
+        logger.error(f"Ошибка при отписке пользователей без знака зодиака: {e}")
+    except Exception as e:
+        handle_critical_error("unsubscribe_users_without_zodiac", e)
+
+
 async def _unsubscribe_user_safe(user_id: int, reason: str = "неизвестно"):
     """Безопасная отписка пользователя с обработкой ошибок"""
     try:
+        # При ошибке сессия откатывает транзакцию при выходе из контекста
         async with AsyncSessionLocal() as session:
-            try:
-                db_user = await session.get(User, user_id)
-                if db_user:
-                    db_user.subscribed = False
-                    await session.commit()
-                    logger.info(f"Пользователь {user_id} автоматически отписан ({reason})")
-            except SQLAlchemyError as e:
-                await session.rollback()
-                logger.error(f"Ошибка при отписке пользователя {user_id}: {e}")
+            db_user = await session.get(User, user_id)
+            if db_user:
+                db_user.subscribed = False
+                await session.commit()
+                invalidate_subscribed_users_cache()
+                logger.info(f"Пользователь {user_id} автоматически отписан ({reason})")
+    except SQLAlchemyError as e:
+        logger.error(f"Ошибка при отписке пользователя {user_id}: {e}")
     except Exception as e:
         logger.error(f"Неожиданная ошибка при отписке пользователя {user_id}: {e}")
 
@@ -667,7 +887,17 @@ def start_scheduler():
     
     # APScheduler работает в UTC, поэтому нужно конвертировать московское время
     # 09:00 МСК (UTC+3) = 06:00 UTC
-    scheduler = AsyncIOScheduler(timezone="UTC")
+    # SQLAlchemyJobStore синхронный: запросы к хранилищу выполняются прямо в event loop бота.
+    # Это допустимо: задач несколько десятков, запись идёт только при старте (и то лишь для
+    # изменённых задач, см. _add_date_job) и при правках из админки, а при пробуждении
+    # планировщик делает один запрос по индексу next_run_time - единицы миллисекунд
+    scheduler = AsyncIOScheduler(
+        timezone="UTC",
+        jobstores={"default": SQLAlchemyJobStore(url=SCHEDULER_JOBSTORE_URL)},
+    )
+    # Запускаем на паузе: так видны задачи, сохранённые в хранилище, и можно
+    # добавить только новые/изменённые до того, как что-либо сработает
+    scheduler.start(paused=True)
     
     # Конвертируем московское время в UTC через timezone (надежнее, чем простое вычитание)
     daily_time_moscow = dt_time(hour=DAILY_HOUR, minute=DAILY_MINUTE)
@@ -686,6 +916,18 @@ def start_scheduler():
         replace_existing=True,
         timezone="UTC"
     )
+
+    # Раз в неделю (перед понедельничной рассылкой) отписываем пользователей без знака зодиака
+    scheduler.add_job(
+        unsubscribe_users_without_zodiac,
+        'cron',
+        day_of_week='mon',
+        hour=daily_utc_hour,
+        minute=daily_utc_minute,
+        id='unsubscribe_without_zodiac',
+        replace_existing=True,
+        timezone="UTC"
+    )
     
     # Планировщик для розыгрышей: из question.json (с метаданными) или из констант
     _schedule_all_raffles_from_json()
@@ -716,88 +958,65 @@ def start_scheduler():
     now_utc = datetime.now(timezone.utc)
     
     # Исключаем завтрашнюю дату из расписания розыгрышей (если она там есть)
-    tomorrow_date = (datetime.now(MOSCOW_TZ) + timedelta(days=1)).strftime("%Y-%m-%d")
+    tomorrow_date = (now_utc.astimezone(MOSCOW_TZ).date() + timedelta(days=1)).isoformat()
     filtered_raffle_dates = [d for d in RAFFLE_DATES if d != tomorrow_date]
-    if tomorrow_date in RAFFLE_DATES:
+    # Розыгрыши из question.json уже запланированы выше (_schedule_all_raffles_from_json) под тем же
+    # id raffle_day_{date}: второй владелец перезаписывал бы задачу другим временем закрытия на каждом старте
+    json_raffle_dates = set(get_all_raffle_dates())
+    filtered_raffle_dates = [d for d in filtered_raffle_dates if d not in json_raffle_dates]
+    if tomorrow_date in RAFFLE_DATES_SET:
         logger.info(f"⏭️ Розыгрыш для {tomorrow_date} исключен из расписания")
     
     for raffle_date_str in filtered_raffle_dates:
-        raffle_date_obj = datetime.strptime(raffle_date_str, "%Y-%m-%d")
+        raffle_date_obj = date.fromisoformat(raffle_date_str)
         
         # Дата и время для объявления (конвертируется из МСК в UTC)
-        announcement_datetime = datetime.combine(raffle_date_obj.date(), dt_time(hour=raffle_utc_hour, minute=raffle_utc_minute))
+        announcement_datetime = datetime.combine(raffle_date_obj, dt_time(hour=raffle_utc_hour, minute=raffle_utc_minute))
         announcement_datetime = announcement_datetime.replace(tzinfo=timezone.utc)
         
         # Дата и время для напоминания (через час после объявления, конвертируется из МСК в UTC)
-        reminder_datetime = datetime.combine(raffle_date_obj.date(), dt_time(hour=reminder_utc_hour, minute=reminder_utc_minute))
+        reminder_datetime = datetime.combine(raffle_date_obj, dt_time(hour=reminder_utc_hour, minute=reminder_utc_minute))
         reminder_datetime = reminder_datetime.replace(tzinfo=timezone.utc)
         
-        # Проверяем, не прошло ли время для объявления
-        # Если время еще не прошло - создаем задачу
-        if announcement_datetime > now_utc:
-            scheduler.add_job(
-                send_raffle_announcements_for_date,
-                'date',
-                run_date=announcement_datetime,
-                id=f'raffle_announcements_{raffle_date_str}',
-                replace_existing=True,
-                args=[raffle_date_str]  # Передаем дату как аргумент
-            )
-            logger.info(f"✅ Задача объявления для {raffle_date_str} запланирована на {announcement_datetime.strftime('%d.%m.%Y %H:%M')} UTC ({RAFFLE_HOUR:02d}:{RAFFLE_MINUTE:02d} МСК)")
-        else:
-            # Время уже прошло - проверяем, было ли уже отправлено объявление
-            # Если объявление уже было отправлено (есть участники с announcement_time), не создаем задачу
-            logger.debug(f"⏰ Время объявления для {raffle_date_str} уже прошло ({announcement_datetime.strftime('%d.%m.%Y %H:%M')} UTC). Проверяю, было ли уже отправлено объявление...")
-            # Проверка будет выполнена в самой функции send_raffle_announcements_for_date через is_automatic=True
-            # Не создаем задачу, чтобы избежать повторных уведомлений при перезапуске бота
-            logger.info(f"⏭️ Пропускаю создание задачи для {raffle_date_str} - время уже прошло. Используйте /raffle_start для ручного запуска.")
-        
-        # Проверяем, не прошло ли время для напоминания
-        if reminder_datetime > now_utc:
-            scheduler.add_job(
-                send_raffle_reminders_for_date,
-                'date',
-                run_date=reminder_datetime,
-                id=f'raffle_reminders_{raffle_date_str}',
-                replace_existing=True,
-                args=[raffle_date_str]  # Передаем дату как аргумент
-            )
-            logger.info(f"✅ Задача напоминания для {raffle_date_str} запланирована на {reminder_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
-        else:
-            logger.debug(f"⏰ Время напоминания для {raffle_date_str} уже прошло. Задача не будет создана.")
-        
         # Автоматическое закрытие розыгрыша в 23:59 его даты
         close_time_moscow = dt_time(hour=23, minute=59)
-        temp_close_moscow = datetime.combine(raffle_date_obj.date(), close_time_moscow)
+        temp_close_moscow = datetime.combine(raffle_date_obj, close_time_moscow)
         temp_close_moscow = temp_close_moscow.replace(tzinfo=MOSCOW_TZ)
         temp_close_utc = temp_close_moscow.astimezone(timezone.utc)
         close_utc_hour = temp_close_utc.hour
         close_utc_minute = temp_close_utc.minute
         
-        close_datetime = datetime.combine(raffle_date_obj.date(), dt_time(hour=close_utc_hour, minute=close_utc_minute))
+        close_datetime = datetime.combine(raffle_date_obj, dt_time(hour=close_utc_hour, minute=close_utc_minute))
         close_datetime = close_datetime.replace(tzinfo=timezone.utc)
         
-        # Проверяем, не прошло ли время для закрытия
+        # Этапы, время которых уже прошло, не выполняются - в том числе объявление:
+        # при перезапуске бота оно не должно уйти повторно (для ручного запуска есть /raffle_start)
+        stages = [dt if dt > now_utc else None for dt in (announcement_datetime, reminder_datetime, close_datetime)]
+        # Логируем только реальное (пере)планирование: неизменённая задача в хранилище не трогается
+        if not _schedule_day_job(run_raffle_day, f"raffle_day_{raffle_date_str}", raffle_date_str, stages):
+            logger.debug(f"Задачи розыгрыша для {raffle_date_str} без изменений или все этапы уже прошли")
+            continue
+        
+        if announcement_datetime > now_utc:
+            logger.info(f"✅ Задача объявления для {raffle_date_str} запланирована на {announcement_datetime.strftime('%d.%m.%Y %H:%M')} UTC ({RAFFLE_HOUR:02d}:{RAFFLE_MINUTE:02d} МСК)")
+        else:
+            logger.info(f"⏭️ Пропускаю создание задачи объявления для {raffle_date_str} - время уже прошло. Используйте /raffle_start для ручного запуска.")
+        
+        if reminder_datetime > now_utc:
+            logger.info(f"✅ Задача напоминания для {raffle_date_str} запланирована на {reminder_datetime.strftime('%d.%m.%Y %H:%M')} UTC")
+        else:
+            logger.debug(f"⏰ Время напоминания для {raffle_date_str} уже прошло. Задача не будет создана.")
+        
         if close_datetime > now_utc:
-            scheduler.add_job(
-                close_raffle_automatically,
-                'date',
-                run_date=close_datetime,
-                id=f'raffle_close_{raffle_date_str}',
-                replace_existing=True,
-                args=[raffle_date_str]  # Передаем дату как аргумент
-            )
             logger.info(f"✅ Задача закрытия для {raffle_date_str} запланирована на {close_datetime.strftime('%d.%m.%Y %H:%M')} UTC (23:59 МСК)")
-        else:
-            logger.debug(f"⏰ Время закрытия для {raffle_date_str} уже прошло. Задача не будет создана.")
     
     # Планировщик для квизов: каждый день начиная с 11.12 в 12:00 МСК
     _schedule_all_quizzes_from_json()
     
-    scheduler.start()
+    scheduler.resume()
     
     # Формируем список дат розыгрышей для логирования
-    raffle_dates_for_log = ', '.join(filtered_raffle_dates) if 'filtered_raffle_dates' in locals() else ', '.join(RAFFLE_DATES)
+    raffle_dates_for_log = ', '.join(sorted(json_raffle_dates.union(filtered_raffle_dates)))
     
     logger.info(
         f"📅 Планировщик запущен.\n"
@@ -814,16 +1033,16 @@ async def send_raffle_announcements_for_date(raffle_date: str):
     Args:
         raffle_date: Дата розыгрыша в формате YYYY-MM-DD
     """
+    # Проверяем, является ли указанная дата датой розыгрыша (до входа в try, как в рассылках квиза)
+    if not is_raffle_date(raffle_date):
+        logger.warning(f"❌ Дата {raffle_date} не является датой розыгрыша (не найдена в question.json и RAFFLE_DATES)")
+        return
+    
     if bot is None:
         logger.error("Бот не инициализирован в scheduler!")
         return
     
     try:
-        # Проверяем, является ли указанная дата датой розыгрыша
-        if not is_raffle_date(raffle_date):
-            logger.warning(f"❌ Дата {raffle_date} не является датой розыгрыша (не найдена в question.json и RAFFLE_DATES)")
-            return
-        
         # Проверяем, было ли уже отправлено объявление для этой даты
         # Если время уже прошло и объявления были отправлены, не отправляем повторно
         moscow_now = datetime.now(MOSCOW_TZ)
@@ -833,7 +1052,7 @@ async def send_raffle_announcements_for_date(raffle_date: str):
         announcement_moscow = get_raffle_start_datetime_moscow(raffle_date)
         if not announcement_moscow:
             # Fallback на константы, если метаданных нет
-            raffle_date_obj = datetime.strptime(raffle_date, "%Y-%m-%d").date()
+            raffle_date_obj = date.fromisoformat(raffle_date)
             announcement_moscow = datetime.combine(raffle_date_obj, dt_time(hour=RAFFLE_HOUR, minute=RAFFLE_MINUTE))
             announcement_moscow = announcement_moscow.replace(tzinfo=MOSCOW_TZ)
         
@@ -867,17 +1086,16 @@ async def send_raffle_announcements_for_date(raffle_date: str):
             logger.info("Нет подписанных пользователей для розыгрыша")
             return
         
-        success_count = 0
-        error_count = 0
+        # Создаём (и активируем) розыгрыш заранее, чтобы параллельные отправки
+        # не пытались одновременно создать одну и ту же запись
+        await create_or_get_raffle(raffle_date, force_activate=True)
         
-        for user in users:
-            # Автоматический запуск всегда отправляет объявления в запланированное время
-            message_id = await send_raffle_announcement(bot, user.id, raffle_date, force_send=False, is_automatic=True)
-            if message_id:
-                success_count += 1
-                await asyncio.sleep(RATE_LIMIT_DELAY)
-            else:
-                error_count += 1
+        # Автоматический запуск всегда отправляет объявления в запланированное время
+        success_count, error_count = await _broadcast(
+            [user.id for user in users],
+            lambda user_id: send_raffle_announcement(bot, user_id, raffle_date, force_send=False, is_automatic=True),
+            "объявления о розыгрыше",
+        )
         
         logger.info(
             f"✅ Рассылка объявлений о розыгрыше завершена. "
@@ -899,12 +1117,11 @@ async def close_raffle_automatically(raffle_date: str):
         return
     
     try:
-        moscow_now = datetime.now(MOSCOW_TZ)
-        current_date_str = moscow_now.strftime("%Y-%m-%d")
+        current_date = datetime.now(MOSCOW_TZ).date()
         
         # Проверяем, что это правильная дата
-        if raffle_date != current_date_str:
-            logger.debug(f"Дата розыгрыша {raffle_date} не совпадает с текущей датой {current_date_str}")
+        if date.fromisoformat(raffle_date) != current_date:
+            logger.debug(f"Дата розыгрыша {raffle_date} не совпадает с текущей датой {current_date}")
             return
         
         logger.info(f"🕐 Автоматически закрываю розыгрыш {raffle_date} в 23:59")
@@ -925,51 +1142,36 @@ async def send_raffle_reminders_for_date(raffle_date: str):
     Args:
         raffle_date: Дата розыгрыша в формате YYYY-MM-DD
     """
+    # Проверяем, является ли указанная дата датой розыгрыша (до входа в try, как в рассылках квиза)
+    if not is_raffle_date(raffle_date):
+        logger.debug(f"Дата {raffle_date} не является датой розыгрыша")
+        return
+    
     if bot is None:
         logger.error("Бот не инициализирован в scheduler!")
         return
     
     try:
-        # Проверяем, является ли указанная дата датой розыгрыша
-        if not is_raffle_date(raffle_date):
-            logger.debug(f"Дата {raffle_date} не является датой розыгрыша")
-            return
-        
         logger.info(f"⏰ Отправляю напоминания о розыгрыше ({raffle_date})")
         
-        # Получаем всех подписанных пользователей
+        # Получаем подписанных пользователей, которые еще не участвовали (не нажали кнопку)
         try:
-            users = await _get_subscribed_users()
+            user_ids = await _get_subscribed_user_ids_not_in_raffle(raffle_date)
         except Exception as e:
             logger.error(f"Ошибка при получении пользователей для напоминаний: {e}")
             return
         
-        if not users:
+        if not user_ids:
             return
         
-        # Проверяем, кто еще не участвовал (не нажал кнопку)
-        # Участник - это тот, у кого question_id != 0 (нажал кнопку и получил вопрос)
-        async with AsyncSessionLocal() as session:
-            result = await session.execute(
-                select(RaffleParticipant).where(
-                    and_(
-                        RaffleParticipant.raffle_date == raffle_date,
-                        RaffleParticipant.question_id != 0  # Участвовал (получил вопрос, нажал кнопку)
-                    )
-                )
-            )
-            participants = result.scalars().all()
-            participant_ids = {p.user_id for p in participants}
-        
         # Отправляем напоминания тем, кто не участвовал
-        success_count = 0
-        for user in users:
-            if user.id not in participant_ids:
-                await send_raffle_reminder(bot, user.id, raffle_date)
-                success_count += 1
-                await asyncio.sleep(RATE_LIMIT_DELAY)
+        success_count, error_count = await _broadcast(
+            user_ids,
+            lambda user_id: send_raffle_reminder(bot, user_id, raffle_date),
+            "напоминания о розыгрыше",
+        )
         
-        logger.info(f"Напоминания отправлены {success_count} пользователям")
+        logger.info(f"Напоминания отправлены {success_count} пользователям, Ошибок: {error_count}")
         
     except Exception as e:
         logger.error(f"Ошибка при отправке напоминаний о розыгрыше: {e}", exc_info=True)
@@ -999,20 +1201,11 @@ async def send_quiz_announcements_for_date(quiz_date: str):
             return
         
         # Отправляем объявления
-        success_count = 0
-        error_count = 0
-        
-        for user in users:
-            try:
-                success = await send_quiz_announcement(bot, user.id, quiz_date, force_send=False, is_automatic=True)
-                if success:
-                    success_count += 1
-                    await asyncio.sleep(RATE_LIMIT_DELAY)
-                else:
-                    error_count += 1
-            except Exception as e:
-                logger.error(f"Ошибка при отправке объявления о квизе пользователю {user.id}: {e}")
-                error_count += 1
+        success_count, error_count = await _broadcast(
+            [user.id for user in users],
+            lambda user_id: send_quiz_announcement(bot, user_id, quiz_date, force_send=False, is_automatic=True),
+            "объявления о квизе",
+        )
         
         logger.info(f"Объявления о квизе отправлены. Успешно: {success_count}, Ошибок: {error_count}")
         
@@ -1044,20 +1237,11 @@ async def send_quiz_reminders_for_date(quiz_date: str):
             return
         
         # Отправляем напоминания только тем, кто не начал квиз
-        success_count = 0
-        error_count = 0
-        
-        for user in users:
-            try:
-                success = await send_quiz_reminder(bot, user.id, quiz_date)
-                if success:
-                    success_count += 1
-                    await asyncio.sleep(RATE_LIMIT_DELAY)
-                else:
-                    error_count += 1
-            except Exception as e:
-                logger.error(f"Ошибка при отправке напоминания о квизе пользователю {user.id}: {e}")
-                error_count += 1
+        success_count, error_count = await _broadcast(
+            [user.id for user in users],
+            lambda user_id: send_quiz_reminder(bot, user_id, quiz_date),
+            "напоминания о квизе",
+        )
         
         logger.info(f"Напоминания о квизе отправлены. Успешно: {success_count}, Ошибок: {error_count}")
         
@@ -1,15 +1,16 @@
 """
 Модуль аутентификации для веб-интерфейса
 """
-from fastapi import HTTPException, Depends, status, Request
-from typing import Annotated
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from starlette.middleware.sessions import SessionMiddleware
+from fastapi import HTTPException, status, Request
 import os
+import secrets
 
 # Настройки авторизации из переменных окружения
 WEB_ADMIN_LOGIN = os.getenv("WEB_ADMIN_LOGIN", "admin")
 WEB_ADMIN_PASSWORD = os.getenv("WEB_ADMIN_PASSWORD", "admin")
+# Байтовые версии для сравнения за постоянное время
+_LOGIN_BYTES = WEB_ADMIN_LOGIN.encode("utf-8")
+_PASSWORD_BYTES = WEB_ADMIN_PASSWORD.encode("utf-8")
 
 def get_current_user(request: Request) -> str:
     """Получает текущего пользователя из сессии"""
@@ -22,6 +23,9 @@ def get_current_user(request: Request) -> str:
 
 
 def verify_login(login: str, password: str) -> bool:
-    """Проверяет логин и пароль"""
-    return login == WEB_ADMIN_LOGIN and password == WEB_ADMIN_PASSWORD
+    """Проверяет логин и пароль (сравнение за постоянное время)"""
+    # Сравниваем оба значения без короткого замыкания, чтобы время не выдавало верный логин
+    login_ok = secrets.compare_digest(login.encode("utf-8"), _LOGIN_BYTES)
+    password_ok = secrets.compare_digest(password.encode("utf-8"), _PASSWORD_BYTES)
+    return login_ok and password_ok
 
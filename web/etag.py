@@ -0,0 +1,44 @@
+"""
+Условные GET (ETag / If-None-Match) для эндпоинтов, которые отдают данные из JSON-файлов
+"""
+import hashlib
+import os
+from typing import Optional
+from fastapi import Request, Response
+from jsonio import dumps
+
+
+def file_etag(*paths) -> str:
+    """Сильный ETag по mtime и размеру файлов-источников (отсутствующий файл тоже учитывается)"""
+    parts = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except FileNotFoundError:
+            parts.append("-")
+    digest = hashlib.blake2b("|".join(parts).encode(), digest_size=8).hexdigest()
+    return f'"{digest}"'
+
+
+def payload_etag(payload) -> str:
+    """ETag по содержимому ответа - для данных из БД, у которых нет mtime"""
+    return f'"{hashlib.blake2b(dumps(payload), digest_size=16).hexdigest()}"'
+
+
+def not_modified(
+    request: Request, response: Response, etag: str, cache_control: str = "no-cache"
+) -> Optional[Response]:
+    """Возвращает 304, если клиент прислал тот же ETag; иначе ставит ETag на обычный ответ.
+
+    Cache-Control: no-cache (по умолчанию) - браузер хранит ответ, но каждый раз перепроверяет
+    его условным запросом; для сводной статистики допустимо "private, max-age=N".
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
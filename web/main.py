@@ -2,13 +2,17 @@
 FastAPI веб-сервер для управления ботом
 """
 from fastapi import FastAPI, Request, Depends, HTTPException, Form
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 from contextlib import asynccontextmanager
 from pathlib import Path
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+import os
 import secrets
+import tempfile
 
 from web.auth import get_current_user, verify_login
 from web.routes import tickets, users, quiz, raffle, stats, scheduler as scheduler_routes, dice
@@ -45,16 +49,34 @@ app = FastAPI(
     title="Zodiac Bot Admin Panel",
     description="Веб-интерфейс для управления ботом",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson сериализует ответы API быстрее стандартного json
+    default_response_class=ORJSONResponse
 )
 
 # Добавляем middleware для сессий
-app.add_middleware(SessionMiddleware, secret_key=secrets.token_urlsafe(32))
+# Ключ из env стабилен между перезапусками и воркерами; без него сессии сбрасываются при каждом старте
+SESSION_SECRET = os.getenv("WEB_SESSION_SECRET") or secrets.token_urlsafe(32)
+app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """Пул соединений исчерпан (ожидание дольше pool_timeout) - отвечаем 503, а не 500"""
+    return ORJSONResponse(status_code=503, content={"detail": "База данных перегружена, повторите запрос позже"})
 
 # Подключаем статические файлы и шаблоны
-base_dir = Path(__file__).parent
-app.mount("/static", StaticFiles(directory=str(base_dir / "static")), name="static")
-templates = Jinja2Templates(directory=str(base_dir / "templates"))
+BASE_DIR = Path(__file__).resolve().parent
+STATIC_DIR = BASE_DIR / "static"
+TEMPLATES_DIR = BASE_DIR / "templates"
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+templates = Jinja2Templates(directory=TEMPLATES_DIR)
+# Шаблоны компилируются один раз; проверка mtime файлов на каждый рендер
+# нужна только при разработке (WEB_DEBUG=1)
+WEB_DEBUG = os.getenv("WEB_DEBUG", "").lower() in ("1", "true", "yes")
+if not WEB_DEBUG:
+    templates.env.auto_reload = False
+    templates.env.bytecode_cache = FileSystemBytecodeCache(tempfile.gettempdir())
 
 # Подключаем роуты
 app.include_router(tickets.router, prefix="/api/tickets", tags=["tickets"])
@@ -0,0 +1,56 @@
+"""
+Кэш посчитанных сводок админки в памяти процесса (TTL)
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+from fastapi import Response
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Сводки меняются за минуты, а админка опрашивает их по таймеру из нескольких вкладок:
+# в пределах TTL все запросы получают один и тот же посчитанный payload без запросов к БД
+DEFAULT_TTL = 30.0
+
+_cache: dict[str, tuple[float, object, object]] = {}  # ключ -> (monotonic-время расчёта, scope, payload)
+# Ошибки недоступности БД (соединение, пул): на них отдаём последнюю удачную сводку.
+# Ошибки в самих запросах (ProgrammingError и т.п.) не маскируются
+_DB_UNAVAILABLE = (OperationalError, InterfaceError, PoolTimeoutError, OSError)
+
+# Замок на ключ: одновременные запросы одной сводки ждут один расчёт, разные сводки не мешают друг другу
+_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+def invalidate_memo():
+    """Сбрасывает все сводки (вызывать после изменений, которые меняют цифры, - например удаления билета)"""
+    _cache.clear()
+
+
+async def memoized(
+    key: str, build, scope=None, ttl: float = DEFAULT_TTL, response: Optional[Response] = None
+):
+    """Возвращает payload из кэша или считает его корутиной build() (не чаще раза в ttl секунд).
+
+    scope - то, к чему привязана сводка (например, день отчёта): при его смене кэш не используется.
+    Если БД недоступна, а сводка уже считалась, отдаётся последняя (устаревшая) версия;
+    при переданном response она помечается заголовками X-Cache: stale и Warning: 110.
+    """
+    async with _locks[key]:
+        cached = _cache.get(key)
+        if cached is not None and cached[1] == scope and time.monotonic() - cached[0] < ttl:
+            return cached[2]
+        try:
+            payload = await build()
+        except _DB_UNAVAILABLE as e:
+            if cached is None or cached[1] != scope:
+                raise
+            logger.warning(f"БД недоступна, отдаём устаревшую сводку {key}: {e}")
+            if response is not None:
+                response.headers["X-Cache"] = "stale"
+                response.headers["Warning"] = '110 - "Response is Stale"'
+            return cached[2]
+        _cache[key] = (time.monotonic(), scope, payload)
+        return payload
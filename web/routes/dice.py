@@ -5,9 +5,9 @@ from fastapi import APIRouter, Depends, HTTPException, Body
 from typing import List, Dict, Optional
 from web.auth import get_current_user
 from dice import (
-    load_all_dice_data, get_all_dice_events, get_dice_event,
+    get_all_dice_events, get_dice_event,
     create_dice_event, update_dice_event, delete_dice_event,
-    get_dice_start_datetime_moscow
+    get_dice_start_datetime_moscow, parse_dice_starts_at, load_dice_data_readonly
 )
 
 router = APIRouter()
@@ -17,13 +17,14 @@ router = APIRouter()
 async def get_dice_list(username: str = Depends(get_current_user)):
     """Получает список всех событий dice"""
     try:
-        all_data = load_all_dice_data()
+        all_data = load_dice_data_readonly()
         if not all_data or "dice_events" not in all_data:
             return {"dice_events": []}
         
         dice_events = []
         for dice_id, event_data in all_data["dice_events"].items():
-            starts_at = get_dice_start_datetime_moscow(dice_id)
+            # Разбираем уже загруженное событие, не перечитывая dice.json для каждого ID
+            starts_at = parse_dice_starts_at(event_data, dice_id)
             starts_at_msk = starts_at.strftime("%Y-%m-%d %H:%M") if starts_at else None
             
             dice_events.append({
@@ -35,7 +36,7 @@ async def get_dice_list(username: str = Depends(get_current_user)):
             })
         
         # Сортируем по дате старта
-        dice_events.sort(key=lambda x: x.get("starts_at", ""))
+        dice_events.sort(key=lambda x: x["starts_at"] or "")
         
         return {"dice_events": dice_events}
     except Exception as e:
@@ -1,42 +1,121 @@
 """
 Роуты для управления квизами
 """
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy import select, func, and_
-from database import AsyncSessionLocal, Quiz, QuizResult, QuizParticipant
+import asyncio
+from datetime import datetime
+from pathlib import Path
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import Annotated, Literal, Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, ValidationError
+from sqlalchemy import select, func, and_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal, Quiz, QuizResult, QuizParticipant, get_db
+from jsonio import dumps, read_json_cached, toggle_disabled_date
+from quiz import (
+    MOSCOW_TZ, QUIZ_JSON_PATH, aload_all_quiz_data, asave_quiz_data, duplicate_quiz_from_local,
+    get_all_questions, get_all_quiz_dates, get_quiz_list_items, get_quiz_start_datetime_moscow,
+    get_quiz_title, has_quiz_started, quiz_json_lock, set_quiz_meta_from_local,
+    update_quiz_question as update_question,
+)
+from scheduler import reschedule_quiz_jobs_if_running, schedule_quiz_jobs_if_running
 from web.auth import get_current_user
+from web.etag import file_etag, not_modified
 
 router = APIRouter()
 
+# Путь к файлу отключенных дат (работает и в Docker, и локально) - вычисляется один раз при импорте;
+# строка передаётся в open()/кэш как есть, без преобразования Path на каждый запрос
+DISABLED_FILE = Path(__file__).resolve().parents[2] / "data" / "quiz_disabled_dates.json"
+DISABLED_FILE_STR = str(DISABLED_FILE)
+
 def _format_msk(dt) -> str:
-    try:
-        return dt.strftime("%Y-%m-%d %H:%M")
-    except Exception:
-        return ""
+    # "YYYY-MM-DD HH:MM" без разбора формат-строки strftime; смещение пояса отрезается срезом
+    return dt.isoformat(sep=" ", timespec="minutes")[:16] if dt else ""
+
+
+_OPTION_KEYS = ("1", "2", "3", "4")
+_NonEmptyStr = Annotated[str, Field(min_length=1)]
+
+
+class _QuizOptionsIn(BaseModel):
+    """Четыре варианта ответа: ключи "1".."4" как в quiz.json."""
+    model_config = ConfigDict(str_strip_whitespace=True, populate_by_name=True)
+
+    o1: _NonEmptyStr = Field(alias="1")
+    o2: _NonEmptyStr = Field(alias="2")
+    o3: _NonEmptyStr = Field(alias="3")
+    o4: _NonEmptyStr = Field(alias="4")
+
+    def as_dict(self) -> dict:
+        return self.model_dump(by_alias=True)
+
+
+class QuizQuestionIn(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    question: _NonEmptyStr
+    options: _QuizOptionsIn
+    # Фронт может прислать номер числом — приводим к строке до проверки Literal
+    correct_answer: Annotated[Literal["1", "2", "3", "4"], BeforeValidator(str)]
+
+
+class QuizCreateIn(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    starts_at_local: _NonEmptyStr
+    title: _NonEmptyStr
+    questions: Annotated[list[QuizQuestionIn], Field(min_length=1)]
+
+
+def _create_error_detail(exc: ValidationError) -> str:
+    """Первая ошибка валидации -> понятное сообщение для админки (фронт показывает detail строкой)."""
+    loc = exc.errors()[0]["loc"]
+    field = loc[0] if loc else None
+    if field == "starts_at_local":
+        return "Поле starts_at_local обязательно"
+    if field == "title":
+        return "Заголовок обязателен"
+    if field != "questions" or len(loc) < 2 or not isinstance(loc[1], int):
+        return "Должен быть минимум 1 вопрос"
+    idx = loc[1] + 1
+    part = loc[2] if len(loc) > 2 else None
+    if part == "question":
+        return f"Вопрос #{idx}: пустой текст"
+    if part == "options":
+        if len(loc) > 3 and loc[3] in _OPTION_KEYS:
+            return f"Вопрос #{idx}: вариант {loc[3]} обязателен"
+        return f"Вопрос #{idx}: варианты ответов обязательны"
+    if part == "correct_answer":
+        return f"Вопрос #{idx}: correct_answer должен быть 1-4"
+    return f"Вопрос #{idx}: неверный формат"
 
 
 @router.get("/dates")
-async def get_quiz_dates(username: str = Depends(get_current_user)):
+async def get_quiz_dates(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Получить список дат квизов"""
-    from quiz import get_all_quiz_dates
+    cached = not_modified(request, response, file_etag(QUIZ_JSON_PATH))
+    if cached is not None:
+        return cached
     dates = get_all_quiz_dates()
     return {"dates": dates}
 
 @router.get("/list")
-async def get_quiz_list(username: str = Depends(get_current_user)):
+async def get_quiz_list(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Список квизов с метаданными (для админки)."""
-    from quiz import get_all_quiz_dates, get_quiz_title, get_quiz_start_datetime_moscow, get_total_questions
+    cached = not_modified(request, response, file_etag(QUIZ_JSON_PATH))
+    if cached is not None:
+        return cached
 
-    dates = sorted(get_all_quiz_dates())
+    # Все поля берём из одной загрузки quiz.json, а не 3 вызовами на каждую дату
     items = []
-    for d in dates:
-        starts_at = get_quiz_start_datetime_moscow(d)
+    for d, title, starts_at, questions_count in get_quiz_list_items():
         items.append({
             "quiz_date": d,
-            "title": get_quiz_title(d),
+            "title": title,
             "starts_at": starts_at.isoformat() if starts_at else None,
             "starts_at_msk": _format_msk(starts_at) if starts_at else None,
-            "questions_count": get_total_questions(d)
+            "questions_count": questions_count
         })
     return {"quizzes": items}
 
@@ -44,7 +123,6 @@ async def get_quiz_list(username: str = Depends(get_current_user)):
 @router.get("/{quiz_date}/meta")
 async def get_quiz_meta_api(quiz_date: str, username: str = Depends(get_current_user)):
     """Метаданные квиза (заголовок, дата-время начала)."""
-    from quiz import get_quiz_title, get_quiz_start_datetime_moscow
     starts_at = get_quiz_start_datetime_moscow(quiz_date)
     return {
         "quiz_date": quiz_date,
@@ -70,24 +148,16 @@ async def create_quiz(
       ]
     }
     """
-    from datetime import datetime, timedelta, timezone
-    from quiz import load_all_quiz_data, save_quiz_data, MOSCOW_TZ
-    from scheduler import schedule_quiz_jobs_if_running
 
-    starts_at_local = data.get("starts_at_local")
-    title = data.get("title")
-    questions = data.get("questions")
-
-    if not isinstance(starts_at_local, str) or not starts_at_local.strip():
-        raise HTTPException(status_code=400, detail="Поле starts_at_local обязательно")
-    if not isinstance(title, str) or not title.strip():
-        raise HTTPException(status_code=400, detail="Заголовок обязателен")
-    if not isinstance(questions, list) or len(questions) < 1:
-        raise HTTPException(status_code=400, detail="Должен быть минимум 1 вопрос")
+    try:
+        payload = QuizCreateIn.model_validate(data)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=_create_error_detail(e))
+    starts_at_local = payload.starts_at_local
 
     try:
         # HTML datetime-local -> naive datetime (интерпретируем как МСК)
-        starts_at = datetime.fromisoformat(starts_at_local.strip())
+        starts_at = datetime.fromisoformat(starts_at_local)
         if starts_at.tzinfo is not None:
             starts_at = starts_at.astimezone(MOSCOW_TZ).replace(tzinfo=MOSCOW_TZ)
         else:
@@ -98,51 +168,37 @@ async def create_quiz(
     quiz_date = starts_at.date().strftime("%Y-%m-%d")
     starts_at_iso = starts_at.isoformat()
 
-    all_data = load_all_quiz_data()
-    if not all_data:
-        all_data = {"quiz_dates": {}}
-    if "quiz_dates" not in all_data or not isinstance(all_data["quiz_dates"], dict):
-        all_data["quiz_dates"] = {}
-
-    if quiz_date in all_data["quiz_dates"]:
-        raise HTTPException(status_code=409, detail=f"Квиз на дату {quiz_date} уже существует")
-
-    # Нормализуем вопросы в формат quiz.json
-    questions_dict = {}
-    for idx, q in enumerate(questions, start=1):
-        if not isinstance(q, dict):
-            raise HTTPException(status_code=400, detail=f"Вопрос #{idx}: неверный формат")
-        q_text = q.get("question")
-        options = q.get("options")
-        correct = q.get("correct_answer")
-        if not isinstance(q_text, str) or not q_text.strip():
-            raise HTTPException(status_code=400, detail=f"Вопрос #{idx}: пустой текст")
-        if not isinstance(options, dict) or not options:
-            raise HTTPException(status_code=400, detail=f"Вопрос #{idx}: варианты ответов обязательны")
-        # Требуем 4 варианта как в текущем формате
-        for k in ("1", "2", "3", "4"):
-            if k not in options or not isinstance(options.get(k), str) or not options.get(k).strip():
-                raise HTTPException(status_code=400, detail=f"Вопрос #{idx}: вариант {k} обязателен")
-        if str(correct) not in ("1", "2", "3", "4"):
-            raise HTTPException(status_code=400, detail=f"Вопрос #{idx}: correct_answer должен быть 1-4")
-
-        questions_dict[str(idx)] = {
-            "id": idx,
-            "question": q_text.strip(),
-            "options": {k: str(options[k]).strip() for k in ("1", "2", "3", "4")},
-            "correct_answer": str(correct),
+    async with quiz_json_lock:
+        all_data = await aload_all_quiz_data()
+        if not all_data:
+            all_data = {"quiz_dates": {}}
+        if "quiz_dates" not in all_data or not isinstance(all_data["quiz_dates"], dict):
+            all_data["quiz_dates"] = {}
+
+        if quiz_date in all_data["quiz_dates"]:
+            raise HTTPException(status_code=409, detail=f"Квиз на дату {quiz_date} уже существует")
+
+        # Вопросы уже провалидированы и очищены моделью — остаётся разложить по id
+        questions_dict = {
+            str(idx): {
+                "id": idx,
+                "question": q.question,
+                "options": q.options.as_dict(),
+                "correct_answer": q.correct_answer,
+            }
+            for idx, q in enumerate(payload.questions, start=1)
         }
 
-    all_data["quiz_dates"][quiz_date] = {
-        "meta": {
-            "title": title.strip(),
-            "starts_at": starts_at_iso,
-        },
-        "questions": questions_dict,
-    }
+        all_data["quiz_dates"][quiz_date] = {
+            "meta": {
+                "title": payload.title,
+                "starts_at": starts_at_iso,
+            },
+            "questions": questions_dict,
+        }
 
-    if not save_quiz_data(all_data):
-        raise HTTPException(status_code=500, detail="Не удалось сохранить quiz.json")
+        if not await asave_quiz_data(all_data):
+            raise HTTPException(status_code=500, detail="Не удалось сохранить quiz.json")
 
     scheduled = schedule_quiz_jobs_if_running(quiz_date)
     return {"success": True, "quiz_date": quiz_date, "scheduled": scheduled}
@@ -155,13 +211,12 @@ async def update_quiz_meta(
     username: str = Depends(get_current_user)
 ):
     """Обновить заголовок/время старта квиза (meta) и пересоздать задачи планировщика."""
-    from quiz import set_quiz_meta_from_local
-    from scheduler import reschedule_quiz_jobs_if_running
 
     title = data.get("title")
     starts_at_local = data.get("starts_at_local")
 
-    result = set_quiz_meta_from_local(quiz_date, title, starts_at_local)
+    async with quiz_json_lock:
+        result = await asyncio.to_thread(set_quiz_meta_from_local, quiz_date, title, starts_at_local)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error") or "Ошибка")
 
@@ -175,14 +230,13 @@ async def duplicate_quiz(
     username: str = Depends(get_current_user)
 ):
     """Дублировать квиз на новую дату/время, копируя вопросы."""
-    from quiz import duplicate_quiz_from_local
-    from scheduler import schedule_quiz_jobs_if_running
 
     source_quiz_date = data.get("source_quiz_date")
     starts_at_local = data.get("starts_at_local")
     title = data.get("title")
 
-    result = duplicate_quiz_from_local(source_quiz_date, starts_at_local, title)
+    async with quiz_json_lock:
+        result = await asyncio.to_thread(duplicate_quiz_from_local, source_quiz_date, starts_at_local, title)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error") or "Ошибка")
 
@@ -191,90 +245,194 @@ async def duplicate_quiz(
     return {"success": True, "quiz_date": quiz_date, "scheduled": scheduled}
 
 
-@router.get("/{quiz_date}/stats")
-async def get_quiz_stats(quiz_date: str, username: str = Depends(get_current_user)):
-    """Получить статистику по квизу"""
+async def _in_session(fn, *args):
+    """Выполняет fn(session, *args) в отдельной сессии - для параллельных запросов через gather."""
     async with AsyncSessionLocal() as session:
-        # Все участники
-        total = await session.scalar(
-            select(func.count(QuizResult.id)).where(
-                QuizResult.quiz_date == quiz_date
-            )
-        )
-        
-        # Получили билетик
-        with_tickets = await session.scalar(
-            select(func.count(QuizResult.id)).where(
-                and_(
-                    QuizResult.quiz_date == quiz_date,
-                    QuizResult.ticket_number.isnot(None)
-                )
-            )
-        )
-        
-        # Не получили билетик
-        no_tickets = await session.scalar(
-            select(func.count(QuizResult.id)).where(
+        return await fn(session, *args)
+
+
+async def _quiz_stats(session: AsyncSession, quiz_date: str) -> dict:
+    # Все счётчики одним запросом (условные агрегаты вместо четырёх COUNT)
+    row = (await session.execute(
+        select(
+            # Все участники
+            func.count(QuizResult.id).label("total"),
+            # Получили билетик
+            func.count(QuizResult.id).filter(
+                QuizResult.ticket_number.isnot(None)
+            ).label("with_tickets"),
+            # Не получили билетик
+            func.count(QuizResult.id).filter(
                 and_(
-                    QuizResult.quiz_date == quiz_date,
                     QuizResult.ticket_number.is_(None),
                     QuizResult.total_questions > 0
                 )
-            )
-        )
-        
-        # Не приняли участие
-        non_participants = await session.scalar(
-            select(func.count(QuizResult.id)).where(
+            ).label("no_tickets"),
+            # Не приняли участие
+            func.count(QuizResult.id).filter(
                 and_(
-                    QuizResult.quiz_date == quiz_date,
                     QuizResult.correct_answers == 0,
                     QuizResult.total_questions == 0
                 )
-            )
-        )
-        
-        return {
-            "quiz_date": quiz_date,
-            "total_participants": total or 0,
-            "with_tickets": with_tickets or 0,
-            "no_tickets": no_tickets or 0,
-            "non_participants": non_participants or 0
-        }
+            ).label("non_participants"),
+        ).where(QuizResult.quiz_date == quiz_date)
+    )).one()
+    total, with_tickets, no_tickets, non_participants = row
+    
+    return {
+        "quiz_date": quiz_date,
+        "total_participants": total or 0,
+        "with_tickets": with_tickets or 0,
+        "no_tickets": no_tickets or 0,
+        "non_participants": non_participants or 0
+    }
+
+
+@router.get("/{quiz_date}/stats")
+async def get_quiz_stats(
+    quiz_date: str,
+    session: AsyncSession = Depends(get_db),
+    username: str = Depends(get_current_user)
+):
+    """Получить статистику по квизу"""
+    return await _quiz_stats(session, quiz_date)
+
+
+def _participant_dict(p) -> dict:
+    # completed_at отдаём как datetime: orjson сам кодирует его в ISO 8601
+    return {
+        "id": p.id,
+        "user_id": p.user_id,
+        "username": p.username,
+        "correct_answers": p.correct_answers,
+        "total_questions": p.total_questions,
+        "ticket_number": p.ticket_number,
+        "completed_at": p.completed_at
+    }
+
+
+def _participants_stmt(quiz_date: str, skip: int, limit: int, before: Optional[tuple] = None):
+    stmt = select(
+        QuizResult.id,
+        QuizResult.user_id,
+        QuizResult.username,
+        QuizResult.correct_answers,
+        QuizResult.total_questions,
+        QuizResult.ticket_number,
+        QuizResult.completed_at,
+    ).where(
+        QuizResult.quiz_date == quiz_date
+    )
+    if before is not None:
+        # Keyset-пагинация: продолжаем строго после курсора (completed_at, id), без OFFSET
+        stmt = stmt.where(tuple_(QuizResult.completed_at, QuizResult.id) < before)
+    else:
+        stmt = stmt.offset(skip)
+    # id - тай-брейкер для одинаковых completed_at, чтобы курсор был однозначным
+    return stmt.order_by(QuizResult.completed_at.desc(), QuizResult.id.desc()).limit(limit)
+
+
+async def _quiz_participants(session: AsyncSession, stmt) -> list:
+    participants = (await session.execute(stmt)).all()
+    return [_participant_dict(p) for p in participants]
+
+
+def _split_participants(participants: list, limit: int) -> tuple[list, Optional[dict]]:
+    """Отрезает строку-заглядывание; курсор следующей страницы - None, если страница последняя"""
+    if len(participants) <= limit:
+        return participants, None
+    participants = participants[:limit]
+    last = participants[-1]
+    return participants, {"before_completed_at": last["completed_at"], "before_id": last["id"]}
+
 
 @router.get("/{quiz_date}/participants")
 async def get_quiz_participants(
     quiz_date: str,
-    skip: int = 0,
-    limit: int = 50,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    format: str = "json",
+    before_completed_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_db),
     username: str = Depends(get_current_user)
 ):
-    """Получить список участников квиза"""
-    async with AsyncSessionLocal() as session:
-        participants_query = await session.execute(
-            select(QuizResult).where(
-                QuizResult.quiz_date == quiz_date
-            ).offset(skip).limit(limit).order_by(QuizResult.completed_at.desc())
-        )
-        participants = participants_query.scalars().all()
-        
-        result = []
-        for p in participants:
-            result.append({
-                "user_id": p.user_id,
-                "username": p.username,
-                "correct_answers": p.correct_answers,
-                "total_questions": p.total_questions,
-                "ticket_number": p.ticket_number,
-                "completed_at": p.completed_at.isoformat() if p.completed_at else None
-            })
-        
-        return {"participants": result}
+    """Получить список участников квиза
+    
+    Для глубокой пагинации передавайте курсор before_completed_at + before_id
+    (значение next_cursor из предыдущего ответа) вместо skip.
+    
+    format=stream отдаёт участников построчно (NDJSON) через серверный курсор,
+    не загружая всю выборку в память - для больших выгрузок.
+    format=stream-json - то же, но в привычной форме {"participants": [...]}.
+    """
+    if (before_completed_at is None) != (before_id is None):
+        raise HTTPException(status_code=400, detail="Курсор задаётся парой before_completed_at и before_id")
+    before = (before_completed_at, before_id) if before_id is not None else None
+
+    if format in ("stream", "stream-json"):
+        # Курсор выбирает строки пачками по 500, каждая сериализуется сразу
+        stream_stmt = _participants_stmt(quiz_date, skip, limit, before).execution_options(yield_per=500)
+
+        # Своя сессия: сессия из Depends(get_db) закрывается до отправки тела ответа
+        async def _rows():
+            async with AsyncSessionLocal() as stream_session:
+                rows = await stream_session.stream(stream_stmt)
+                async for p in rows:
+                    yield dumps(_participant_dict(p))
+
+        if format == "stream":
+            async def _ndjson():
+                async for chunk in _rows():
+                    yield chunk + b"\n"
+
+            return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+        async def _json_array():
+            yield b'{"participants":['
+            sep = b""
+            async for chunk in _rows():
+                yield sep + chunk
+                sep = b","
+            yield b"]}"
+
+        return StreamingResponse(_json_array(), media_type="application/json")
+
+    # limit + 1: лишняя строка показывает, что есть следующая страница
+    rows = await _quiz_participants(session, _participants_stmt(quiz_date, skip, limit + 1, before))
+    participants, next_cursor = _split_participants(rows, limit)
+    return {"participants": participants, "has_more": next_cursor is not None, "next_cursor": next_cursor}
+
+
+@router.get("/{quiz_date}/overview")
+async def get_quiz_overview(
+    quiz_date: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    username: str = Depends(get_current_user)
+):
+    """Статистика и страница участников квиза за один запрос
+    
+    Оба запроса к БД выполняются параллельно, каждый в своей сессии (своём соединении).
+    """
+    stats, rows = await asyncio.gather(
+        _in_session(_quiz_stats, quiz_date),
+        _in_session(_quiz_participants, _participants_stmt(quiz_date, skip, limit + 1)),
+    )
+    participants, next_cursor = _split_participants(rows, limit)
+    return {**stats, "participants": participants, "has_more": next_cursor is not None, "next_cursor": next_cursor}
 
 @router.get("/{quiz_date}/questions")
-async def get_quiz_questions(quiz_date: str, username: str = Depends(get_current_user)):
+async def get_quiz_questions(
+    quiz_date: str,
+    request: Request,
+    response: Response,
+    username: str = Depends(get_current_user)
+):
     """Получить вопросы квиза"""
-    from quiz import get_all_questions
+    cached = not_modified(request, response, file_etag(QUIZ_JSON_PATH))
+    if cached is not None:
+        return cached
     questions = get_all_questions(quiz_date)
     return {"quiz_date": quiz_date, "questions": questions}
 
@@ -286,8 +444,6 @@ async def update_quiz_question(
     username: str = Depends(get_current_user)
 ):
     """Обновить вопрос квиза"""
-    from quiz import update_quiz_question as update_question, has_quiz_started
-    from scheduler import reschedule_quiz_jobs_if_running
     
     # Проверяем, не начался ли квиз
     if await has_quiz_started(quiz_date):
@@ -298,7 +454,8 @@ async def update_quiz_question(
         options = data.get("options")
         correct_answer = data.get("correct_answer")
         # Функция принимает параметры в порядке: question_id, quiz_date, question_text, options, correct_answer
-        result = update_question(question_id, quiz_date, question_text, options, correct_answer)
+        async with quiz_json_lock:
+            result = await asyncio.to_thread(update_question, question_id, quiz_date, question_text, options, correct_answer)
         if result:
             # Автоматически обновляем scheduler
             scheduled = reschedule_quiz_jobs_if_running(quiz_date)
@@ -316,50 +473,49 @@ async def add_quiz_question(
     username: str = Depends(get_current_user)
 ):
     """Добавить вопрос к квизу"""
-    from quiz import load_all_quiz_data, save_quiz_data, has_quiz_started
-    from scheduler import reschedule_quiz_jobs_if_running
     
     # Проверяем, не начался ли квиз
     if await has_quiz_started(quiz_date):
         raise HTTPException(status_code=400, detail="Нельзя добавить вопрос в квиз, который уже начался")
     
-    all_data = load_all_quiz_data()
-    if not all_data or "quiz_dates" not in all_data or quiz_date not in all_data["quiz_dates"]:
-        raise HTTPException(status_code=404, detail="Квиз не найден")
+    async with quiz_json_lock:
+        all_data = await aload_all_quiz_data()
+        if not all_data or "quiz_dates" not in all_data or quiz_date not in all_data["quiz_dates"]:
+            raise HTTPException(status_code=404, detail="Квиз не найден")
     
-    quiz_data = all_data["quiz_dates"][quiz_date]
-    if "questions" not in quiz_data:
-        raise HTTPException(status_code=400, detail="Неверный формат квиза")
+        quiz_data = all_data["quiz_dates"][quiz_date]
+        if "questions" not in quiz_data:
+            raise HTTPException(status_code=400, detail="Неверный формат квиза")
     
-    questions = quiz_data["questions"]
-    question_id = data.get("question_id")
-    question_text = data.get("question_text")
-    options = data.get("options")
-    correct_answer = data.get("correct_answer")
+        questions = quiz_data["questions"]
+        question_id = data.get("question_id")
+        question_text = data.get("question_text")
+        options = data.get("options")
+        correct_answer = data.get("correct_answer")
     
-    if not question_id or not question_text or not options or not correct_answer:
-        raise HTTPException(status_code=400, detail="Все поля обязательны")
+        if not question_id or not question_text or not options or not correct_answer:
+            raise HTTPException(status_code=400, detail="Все поля обязательны")
     
-    if str(question_id) in questions:
-        raise HTTPException(status_code=400, detail=f"Вопрос с ID {question_id} уже существует")
+        if str(question_id) in questions:
+            raise HTTPException(status_code=400, detail=f"Вопрос с ID {question_id} уже существует")
     
-    # Проверяем, что есть 4 варианта ответа
-    for k in ("1", "2", "3", "4"):
-        if k not in options or not isinstance(options.get(k), str) or not options.get(k).strip():
-            raise HTTPException(status_code=400, detail=f"Вариант {k} обязателен")
+        # Проверяем, что есть 4 варианта ответа
+        for k in ("1", "2", "3", "4"):
+            if k not in options or not isinstance(options.get(k), str) or not options.get(k).strip():
+                raise HTTPException(status_code=400, detail=f"Вариант {k} обязателен")
     
-    if str(correct_answer) not in ("1", "2", "3", "4"):
-        raise HTTPException(status_code=400, detail="correct_answer должен быть 1-4")
+        if str(correct_answer) not in ("1", "2", "3", "4"):
+            raise HTTPException(status_code=400, detail="correct_answer должен быть 1-4")
     
-    questions[str(question_id)] = {
-        "id": question_id,
-        "question": question_text.strip(),
-        "options": {k: str(options[k]).strip() for k in ("1", "2", "3", "4")},
-        "correct_answer": str(correct_answer),
-    }
+        questions[str(question_id)] = {
+            "id": question_id,
+            "question": question_text.strip(),
+            "options": {k: str(options[k]).strip() for k in ("1", "2", "3", "4")},
+            "correct_answer": str(correct_answer),
+        }
     
-    if not save_quiz_data(all_data):
-        raise HTTPException(status_code=500, detail="Не удалось сохранить quiz.json")
+        if not await asave_quiz_data(all_data):
+            raise HTTPException(status_code=500, detail="Не удалось сохранить quiz.json")
     
     # Автоматически обновляем scheduler
     scheduled = reschedule_quiz_jobs_if_running(quiz_date)
@@ -373,107 +529,81 @@ async def delete_quiz_question(
     username: str = Depends(get_current_user)
 ):
     """Удалить вопрос из квиза"""
-    from quiz import load_all_quiz_data, save_quiz_data, has_quiz_started
-    from scheduler import reschedule_quiz_jobs_if_running
     
     # Проверяем, не начался ли квиз
     if await has_quiz_started(quiz_date):
         raise HTTPException(status_code=400, detail="Нельзя удалить вопрос из квиза, который уже начался")
     
-    all_data = load_all_quiz_data()
-    if not all_data or "quiz_dates" not in all_data or quiz_date not in all_data["quiz_dates"]:
-        raise HTTPException(status_code=404, detail="Квиз не найден")
+    async with quiz_json_lock:
+        all_data = await aload_all_quiz_data()
+        if not all_data or "quiz_dates" not in all_data or quiz_date not in all_data["quiz_dates"]:
+            raise HTTPException(status_code=404, detail="Квиз не найден")
     
-    quiz_data = all_data["quiz_dates"][quiz_date]
-    if "questions" not in quiz_data:
-        raise HTTPException(status_code=400, detail="Неверный формат квиза")
+        quiz_data = all_data["quiz_dates"][quiz_date]
+        if "questions" not in quiz_data:
+            raise HTTPException(status_code=400, detail="Неверный формат квиза")
     
-    questions = quiz_data["questions"]
-    if str(question_id) not in questions:
-        raise HTTPException(status_code=404, detail="Вопрос не найден")
+        questions = quiz_data["questions"]
+        if str(question_id) not in questions:
+            raise HTTPException(status_code=404, detail="Вопрос не найден")
     
-    if len(questions) <= 1:
-        raise HTTPException(status_code=400, detail="Нельзя удалить последний вопрос")
+        if len(questions) <= 1:
+            raise HTTPException(status_code=400, detail="Нельзя удалить последний вопрос")
     
-    del questions[str(question_id)]
+        del questions[str(question_id)]
     
-    if not save_quiz_data(all_data):
-        raise HTTPException(status_code=500, detail="Не удалось сохранить quiz.json")
+        if not await asave_quiz_data(all_data):
+            raise HTTPException(status_code=500, detail="Не удалось сохранить quiz.json")
     
     # Автоматически обновляем scheduler
     scheduled = reschedule_quiz_jobs_if_running(quiz_date)
     return {"success": True, "message": "Вопрос удален", "scheduled": scheduled}
 
 @router.get("/disabled-dates")
-async def get_disabled_dates(username: str = Depends(get_current_user)):
+async def get_disabled_dates(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Получить список отключенных дат квизов"""
-    from pathlib import Path
-    import json
-    import os
+    # 304 без чтения и сериализации, если файл не менялся с прошлого запроса админки
+    cached = not_modified(request, response, file_etag(DISABLED_FILE_STR))
+    if cached is not None:
+        return cached
     
-    # Определяем путь к файлу (работает и в Docker, и локально)
-    base_dir = Path(__file__).parent.parent.parent
-    disabled_file = base_dir / "data" / "quiz_disabled_dates.json"
-    
-    if disabled_file.exists():
-        with open(disabled_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return {"disabled_dates": data.get("dates", [])}
-    return {"disabled_dates": []}
+    # Файл перечитывается только после изменения (кэш по mtime); stat/чтение — вне event loop
+    try:
+        data = await asyncio.to_thread(read_json_cached, DISABLED_FILE_STR)
+    except FileNotFoundError:
+        return {"disabled_dates": []}
+    return {"disabled_dates": data.get("dates", [])}
 
 @router.post("/{quiz_date}/toggle")
 async def toggle_quiz_date(quiz_date: str, username: str = Depends(get_current_user)):
     """Включить/отключить квиз для даты"""
-    from pathlib import Path
-    import json
-    
-    # Определяем путь к файлу (работает и в Docker, и локально)
-    base_dir = Path(__file__).parent.parent.parent
-    disabled_file = base_dir / "data" / "quiz_disabled_dates.json"
-    
-    # Загружаем текущий список
-    if disabled_file.exists():
-        with open(disabled_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            disabled_dates = set(data.get("dates", []))
-    else:
-        disabled_dates = set()
-    
-    # Переключаем состояние
-    if quiz_date in disabled_dates:
-        disabled_dates.remove(quiz_date)
-        action = "включен"
-    else:
-        disabled_dates.add(quiz_date)
-        action = "отключен"
     
-    # Сохраняем
-    disabled_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(disabled_file, "w", encoding="utf-8") as f:
-        json.dump({"dates": sorted(list(disabled_dates))}, f, ensure_ascii=False, indent=2)
+    # Чтение-изменение-запись под межпроцессной блокировкой, запись атомарная; flock и fsync — в пуле потоков
+    disabled = await asyncio.to_thread(toggle_disabled_date, DISABLED_FILE_STR, quiz_date)
+    action = "отключен" if disabled else "включен"
     
-    return {"success": True, "message": f"Квиз для {quiz_date} {action}", "disabled": quiz_date not in disabled_dates}
+    return {"success": True, "message": f"Квиз для {quiz_date} {action}", "disabled": not disabled}
 
 
 @router.delete("/{quiz_date}")
 async def delete_quiz(quiz_date: str, username: str = Depends(get_current_user)):
     """Удалить квиз"""
-    from quiz import load_all_quiz_data, save_quiz_data, has_quiz_started
     
     # Проверяем, не начался ли квиз
     if await has_quiz_started(quiz_date):
         raise HTTPException(status_code=400, detail="Нельзя удалить квиз, который уже начался")
     
-    all_data = load_all_quiz_data()
-    if not all_data or "quiz_dates" not in all_data:
-        raise HTTPException(status_code=404, detail="Квиз не найден")
+    async with quiz_json_lock:
+        all_data = await aload_all_quiz_data()
+        if not all_data or "quiz_dates" not in all_data:
+            raise HTTPException(status_code=404, detail="Квиз не найден")
     
-    if quiz_date not in all_data["quiz_dates"]:
-        raise HTTPException(status_code=404, detail="Квиз не найден")
+        if quiz_date not in all_data["quiz_dates"]:
+            raise HTTPException(status_code=404, detail="Квиз не найден")
     
-    del all_data["quiz_dates"][quiz_date]
+        del all_data["quiz_dates"][quiz_date]
     
-    if not save_quiz_data(all_data):
-        raise HTTPException(status_code=500, detail="Не удалось сохранить quiz.json")
+        if not await asave_quiz_data(all_data):
+            raise HTTPException(status_code=500, detail="Не удалось сохранить quiz.json")
     
     return {"success": True, "message": f"Квиз {quiz_date} удален"}
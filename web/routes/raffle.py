@@ -1,94 +1,161 @@
 """
 Роуты для управления розыгрышами
 """
-from fastapi import APIRouter, Depends, HTTPException, Body
+import asyncio
+from pathlib import Path
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, Body, Request, Response
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from sqlalchemy import select, func, and_
-from database import AsyncSessionLocal, Raffle, RaffleParticipant
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Raffle, RaffleParticipant, get_db
+from jsonio import read_json_cached, toggle_disabled_date
+from raffle import (
+    QUESTIONS_JSON_PATH, add_raffle_question as add_question, approve_answer as approve, count_unchecked_answers,
+    create_raffle_data, delete_raffle, deny_answer as deny, duplicate_raffle_from_local,
+    get_all_questions, get_all_raffle_dates, get_question_by_id, get_raffle_list_items,
+    get_raffle_meta, get_raffle_start_datetime_moscow, get_unchecked_answers_page,
+    remove_raffle_question, set_raffle_meta_from_local, update_question,
+)
+from scheduler import reschedule_raffle_jobs_if_running, schedule_raffle_jobs_if_running
 from web.auth import get_current_user
+from web.etag import file_etag, not_modified
 
 router = APIRouter()
 
+# Путь к файлу отключенных дат - вычисляется один раз при импорте
+DISABLED_FILE = Path(__file__).resolve().parents[2] / "data" / "raffle_disabled_dates.json"
+DISABLED_FILE_STR = str(DISABLED_FILE)
+
+_NonEmptyStr = Annotated[str, Field(min_length=1)]
+
+
+class RaffleQuestionIn(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    id: Annotated[int, Field(gt=0)]
+    title: str = ""
+    text: str = ""
+
+
+class RaffleCreateIn(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    starts_at_local: _NonEmptyStr
+    title: _NonEmptyStr
+    questions: Annotated[list[RaffleQuestionIn], Field(min_length=1)]
+
+
+class RaffleQuestionAddIn(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    question_id: Annotated[int, Field(gt=0)]
+    title: _NonEmptyStr
+    text: _NonEmptyStr
+
+
+class RaffleQuestionUpdateIn(BaseModel):
+    """Старые клиенты присылают question_title/question_text вместо title/text."""
+    title: Optional[str] = None
+    text: Optional[str] = None
+    question_title: str = ""
+    question_text: str = ""
+
+
+def _create_error_detail(exc: ValidationError) -> str:
+    """Первая ошибка валидации -> понятное сообщение для админки (фронт показывает detail строкой)."""
+    loc = exc.errors()[0]["loc"]
+    field = loc[0] if loc else None
+    if field == "starts_at_local":
+        return "Поле starts_at_local обязательно"
+    if field == "title":
+        return "Заголовок обязателен"
+    if field == "questions" and len(loc) > 1 and isinstance(loc[1], int):
+        return f"Вопрос #{loc[1] + 1}: неверный формат (нужен числовой id)"
+    return "Должен быть минимум 1 вопрос"
+
+
 @router.get("/dates")
-async def get_raffle_dates(username: str = Depends(get_current_user)):
+async def get_raffle_dates(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Получить список дат розыгрышей"""
-    from raffle import get_all_raffle_dates
+    cached = not_modified(request, response, file_etag(QUESTIONS_JSON_PATH))
+    if cached is not None:
+        return cached
     dates = get_all_raffle_dates()
     return {"dates": dates}
 
 @router.get("/{raffle_date}/stats")
-async def get_raffle_stats(raffle_date: str, username: str = Depends(get_current_user)):
+async def get_raffle_stats(
+    raffle_date: str,
+    session: AsyncSession = Depends(get_db),
+    username: str = Depends(get_current_user)
+):
     """Получить статистику по розыгрышу"""
-    async with AsyncSessionLocal() as session:
-        # Все участники
-        total = await session.scalar(
-            select(func.count(RaffleParticipant.id)).where(
-                RaffleParticipant.raffle_date == raffle_date
-            )
-        )
-        
-        # Принятые
-        approved = await session.scalar(
-            select(func.count(RaffleParticipant.id)).where(
-                and_(
-                    RaffleParticipant.raffle_date == raffle_date,
-                    RaffleParticipant.is_correct == True
-                )
-            )
-        )
-        
-        # Отклоненные
-        denied = await session.scalar(
-            select(func.count(RaffleParticipant.id)).where(
-                and_(
-                    RaffleParticipant.raffle_date == raffle_date,
-                    RaffleParticipant.is_correct == False
-                )
-            )
-        )
-        
-        # Не проверенные
-        unchecked = await session.scalar(
-            select(func.count(RaffleParticipant.id)).where(
+    # Все счётчики одним запросом (условные агрегаты вместо четырёх COUNT)
+    row = (await session.execute(
+        select(
+            # Все участники
+            func.count(RaffleParticipant.id).label("total"),
+            # Принятые
+            func.count(RaffleParticipant.id).filter(
+                RaffleParticipant.is_correct == True
+            ).label("approved"),
+            # Отклоненные
+            func.count(RaffleParticipant.id).filter(
+                RaffleParticipant.is_correct == False
+            ).label("denied"),
+            # Не проверенные
+            func.count(RaffleParticipant.id).filter(
                 and_(
-                    RaffleParticipant.raffle_date == raffle_date,
                     RaffleParticipant.is_correct.is_(None),
                     RaffleParticipant.answer.isnot(None)
                 )
-            )
-        )
-        
-        return {
-            "raffle_date": raffle_date,
-            "total_participants": total or 0,
-            "approved": approved or 0,
-            "denied": denied or 0,
-            "unchecked": unchecked or 0
-        }
+            ).label("unchecked"),
+        ).where(RaffleParticipant.raffle_date == raffle_date)
+    )).one()
+    total, approved, denied, unchecked = row
+    
+    return {
+        "raffle_date": raffle_date,
+        "total_participants": total or 0,
+        "approved": approved or 0,
+        "denied": denied or 0,
+        "unchecked": unchecked or 0
+    }
 
 @router.get("/{raffle_date}/unchecked")
 async def get_unchecked_answers(
     raffle_date: str,
     skip: int = 0,
     limit: int = 50,
+    with_total: bool = True,
     username: str = Depends(get_current_user)
 ):
-    """Получить список непроверенных ответов"""
-    from raffle import get_unchecked_answers as get_unchecked
+    """Получить список непроверенных ответов
     
-    unchecked = await get_unchecked(raffle_date)
+    with_total=false пропускает COUNT по всем непроверенным: вместо total отдаётся has_more
+    (выбирается limit + 1 строка - поиск останавливается на первой лишней).
+    """
     
-    result = []
-    for p in unchecked[skip:skip+limit]:
-        result.append({
-            "user_id": p.user_id,
-            "question_id": p.question_id,
-            "question_text": p.question_text,
-            "answer": p.answer,
-            "timestamp": p.timestamp.isoformat() if p.timestamp else None
-        })
+    if with_total:
+        # Страница и общее количество - два независимых запроса, выполняем параллельно
+        unchecked, total = await asyncio.gather(
+            get_unchecked_answers_page(raffle_date, skip, limit),
+            count_unchecked_answers(raffle_date),
+        )
+        has_more = skip + len(unchecked) < total
+    else:
+        unchecked = await get_unchecked_answers_page(raffle_date, skip, limit + 1)
+        total = None
+        has_more = len(unchecked) > limit
+        unchecked = unchecked[:limit]
+    
+    # Row -> dict напрямую по именам столбцов; timestamp кодирует orjson
+    result = [p._asdict() for p in unchecked]
     
     return {
-        "total": len(unchecked),
+        "total": total,
+        "has_more": has_more,
         "skip": skip,
         "limit": limit,
         "unchecked": result
@@ -101,7 +168,6 @@ async def approve_answer(
     username: str = Depends(get_current_user)
 ):
     """Одобрить ответ пользователя"""
-    from raffle import approve_answer as approve
     
     success = await approve(user_id, raffle_date)
     if not success:
@@ -116,7 +182,6 @@ async def deny_answer(
     username: str = Depends(get_current_user)
 ):
     """Отклонить ответ пользователя"""
-    from raffle import deny_answer as deny
     
     success = await deny(user_id, raffle_date)
     if not success:
@@ -125,9 +190,16 @@ async def deny_answer(
     return {"success": True, "message": f"Ответ пользователя {user_id} отклонен"}
 
 @router.get("/{raffle_date}/questions")
-async def get_raffle_questions(raffle_date: str, username: str = Depends(get_current_user)):
+async def get_raffle_questions(
+    raffle_date: str,
+    request: Request,
+    response: Response,
+    username: str = Depends(get_current_user)
+):
     """Получить вопросы розыгрыша"""
-    from raffle import get_all_questions
+    cached = not_modified(request, response, file_etag(QUESTIONS_JSON_PATH))
+    if cached is not None:
+        return cached
     questions = get_all_questions(raffle_date)
     return {"raffle_date": raffle_date, "questions": questions}
 
@@ -138,7 +210,6 @@ async def get_raffle_question(
     username: str = Depends(get_current_user)
 ):
     """Получить конкретный вопрос розыгрыша"""
-    from raffle import get_question_by_id
     question = get_question_by_id(question_id, raffle_date)
     if not question:
         raise HTTPException(status_code=404, detail="Вопрос не найден")
@@ -152,11 +223,14 @@ async def update_raffle_question(
     username: str = Depends(get_current_user)
 ):
     """Обновить вопрос розыгрыша"""
-    from raffle import update_question
     try:
-        title = data.get("title") or data.get("question_title", "")
-        text = data.get("text") or data.get("question_text", "")
-        result = update_question(question_id, raffle_date, title, text)
+        payload = RaffleQuestionUpdateIn.model_validate(data)
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="title и text должны быть строками")
+    try:
+        title = payload.title or payload.question_title
+        text = payload.text or payload.question_text
+        result = await asyncio.to_thread(update_question, question_id, raffle_date, title, text)
         if result:
             return {"success": True, "message": "Вопрос обновлен"}
         else:
@@ -166,37 +240,43 @@ async def update_raffle_question(
 
 
 def _format_msk(dt) -> str:
-    try:
-        return dt.strftime("%Y-%m-%d %H:%M")
-    except Exception:
-        return ""
+    # "YYYY-MM-DD HH:MM" без разбора формат-строки strftime; смещение пояса отрезается срезом
+    return dt.isoformat(sep=" ", timespec="minutes")[:16] if dt else ""
 
 
 @router.get("/list")
-async def get_raffle_list(username: str = Depends(get_current_user)):
+async def get_raffle_list(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Список розыгрышей с метаданными (для админки)."""
-    from raffle import get_all_raffle_dates, get_raffle_meta, get_raffle_start_datetime_moscow, get_all_questions
+    cached = not_modified(request, response, file_etag(QUESTIONS_JSON_PATH))
+    if cached is not None:
+        return cached
 
-    dates = sorted(get_all_raffle_dates())
+    # Все поля берём из одного чтения question.json, а не 3 чтениями на каждую дату;
+    # холодный разбор файла (после правки) уводим из event loop в поток
+    rows = await asyncio.to_thread(get_raffle_list_items)
     items = []
-    for d in dates:
-        meta = get_raffle_meta(d)
-        starts_at = get_raffle_start_datetime_moscow(d)
-        questions = get_all_questions(d)
+    for d, title, starts_at, questions_count in rows:
         items.append({
             "raffle_date": d,
-            "title": meta.get("title") if meta else None,
+            "title": title,
             "starts_at": starts_at.isoformat() if starts_at else None,
             "starts_at_msk": _format_msk(starts_at) if starts_at else None,
-            "questions_count": len(questions)
+            "questions_count": questions_count
         })
     return {"raffles": items}
 
 
 @router.get("/{raffle_date}/meta")
-async def get_raffle_meta_api(raffle_date: str, username: str = Depends(get_current_user)):
+async def get_raffle_meta_api(
+    raffle_date: str,
+    request: Request,
+    response: Response,
+    username: str = Depends(get_current_user)
+):
     """Метаданные розыгрыша (заголовок, дата-время начала)."""
-    from raffle import get_raffle_meta, get_raffle_start_datetime_moscow
+    cached = not_modified(request, response, file_etag(QUESTIONS_JSON_PATH))
+    if cached is not None:
+        return cached
     meta = get_raffle_meta(raffle_date)
     starts_at = get_raffle_start_datetime_moscow(raffle_date)
     return {
@@ -223,21 +303,16 @@ async def create_raffle(
       ]
     }
     """
-    from raffle import create_raffle_data
-    from scheduler import schedule_raffle_jobs_if_running
-
-    starts_at_local = data.get("starts_at_local")
-    title = data.get("title")
-    questions = data.get("questions")
-
-    if not isinstance(starts_at_local, str) or not starts_at_local.strip():
-        raise HTTPException(status_code=400, detail="Поле starts_at_local обязательно")
-    if not isinstance(title, str) or not title.strip():
-        raise HTTPException(status_code=400, detail="Заголовок обязателен")
-    if not isinstance(questions, list) or len(questions) < 1:
-        raise HTTPException(status_code=400, detail="Должен быть минимум 1 вопрос")
 
-    result = create_raffle_data(starts_at_local[:10], starts_at_local, title, questions)
+    try:
+        payload = RaffleCreateIn.model_validate(data)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=_create_error_detail(e))
+    starts_at_local = payload.starts_at_local
+    title = payload.title
+    questions = [q.model_dump() for q in payload.questions]
+
+    result = await asyncio.to_thread(create_raffle_data, starts_at_local[:10], starts_at_local, title, questions)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error") or "Ошибка")
 
@@ -252,14 +327,12 @@ async def duplicate_raffle(
     username: str = Depends(get_current_user)
 ):
     """Дублировать розыгрыш на новую дату/время, копируя вопросы."""
-    from raffle import duplicate_raffle_from_local
-    from scheduler import schedule_raffle_jobs_if_running
 
     source_raffle_date = data.get("source_raffle_date")
     starts_at_local = data.get("starts_at_local")
     title = data.get("title")
 
-    result = duplicate_raffle_from_local(source_raffle_date, starts_at_local, title)
+    result = await asyncio.to_thread(duplicate_raffle_from_local, source_raffle_date, starts_at_local, title)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error") or "Ошибка")
 
@@ -275,13 +348,11 @@ async def update_raffle_meta(
     username: str = Depends(get_current_user)
 ):
     """Обновить заголовок/время старта розыгрыша (meta) и пересоздать задачи планировщика."""
-    from raffle import set_raffle_meta_from_local
-    from scheduler import reschedule_raffle_jobs_if_running
 
     title = data.get("title")
     starts_at_local = data.get("starts_at_local")
 
-    result = set_raffle_meta_from_local(raffle_date, title, starts_at_local)
+    result = await asyncio.to_thread(set_raffle_meta_from_local, raffle_date, title, starts_at_local)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error") or "Ошибка")
 
@@ -292,7 +363,6 @@ async def update_raffle_meta(
 @router.delete("/{raffle_date}")
 async def delete_raffle_api(raffle_date: str, username: str = Depends(get_current_user)):
     """Удалить розыгрыш"""
-    from raffle import delete_raffle
     result = await delete_raffle(raffle_date)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error") or "Ошибка")
@@ -306,15 +376,14 @@ async def add_raffle_question(
     username: str = Depends(get_current_user)
 ):
     """Добавить вопрос к розыгрышу"""
-    from raffle import add_raffle_question
-    question_id = data.get("question_id")
-    title = data.get("title")
-    text = data.get("text")
-    
-    if not question_id or not title or not text:
+    try:
+        payload = RaffleQuestionAddIn.model_validate(data)
+    except ValidationError:
         raise HTTPException(status_code=400, detail="question_id, title и text обязательны")
-    
-    result = add_raffle_question(raffle_date, question_id, title, text)
+
+    result = await asyncio.to_thread(
+        add_question, raffle_date, payload.question_id, payload.title, payload.text
+    )
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error") or "Ошибка")
     return {"success": True, "message": "Вопрос добавлен"}
@@ -327,7 +396,6 @@ async def remove_raffle_question_api(
     username: str = Depends(get_current_user)
 ):
     """Удалить вопрос из розыгрыша"""
-    from raffle import remove_raffle_question
     result = await remove_raffle_question(raffle_date, question_id)
     if not result.get("success"):
         raise HTTPException(status_code=400, detail=result.get("error") or "Ошибка")
@@ -335,47 +403,25 @@ async def remove_raffle_question_api(
 
 
 @router.get("/disabled-dates")
-async def get_disabled_dates(username: str = Depends(get_current_user)):
+async def get_disabled_dates(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Получить список отключенных дат розыгрышей"""
-    from pathlib import Path
-    import json
-    
-    base_dir = Path(__file__).parent.parent.parent
-    disabled_file = base_dir / "data" / "raffle_disabled_dates.json"
-    
-    if disabled_file.exists():
-        with open(disabled_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return {"disabled_dates": data.get("dates", [])}
-    return {"disabled_dates": []}
+    cached = not_modified(request, response, file_etag(DISABLED_FILE_STR))
+    if cached is not None:
+        return cached
+    # Файл перечитывается только после изменения (кэш по mtime); stat/чтение — вне event loop
+    try:
+        data = await asyncio.to_thread(read_json_cached, DISABLED_FILE_STR)
+    except FileNotFoundError:
+        return {"disabled_dates": []}
+    return {"disabled_dates": data.get("dates", [])}
 
 
 @router.post("/{raffle_date}/toggle")
 async def toggle_raffle_date(raffle_date: str, username: str = Depends(get_current_user)):
     """Включить/отключить розыгрыш для даты"""
-    from pathlib import Path
-    import json
-    
-    base_dir = Path(__file__).parent.parent.parent
-    disabled_file = base_dir / "data" / "raffle_disabled_dates.json"
-    
-    if disabled_file.exists():
-        with open(disabled_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            disabled_dates = set(data.get("dates", []))
-    else:
-        disabled_dates = set()
-    
-    if raffle_date in disabled_dates:
-        disabled_dates.remove(raffle_date)
-        action = "включен"
-    else:
-        disabled_dates.add(raffle_date)
-        action = "отключен"
-    
-    disabled_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(disabled_file, "w", encoding="utf-8") as f:
-        json.dump({"dates": sorted(list(disabled_dates))}, f, ensure_ascii=False, indent=2)
+    # Чтение-изменение-запись под межпроцессной блокировкой, запись атомарная; flock и fsync — в пуле потоков
+    disabled = await asyncio.to_thread(toggle_disabled_date, DISABLED_FILE_STR, raffle_date)
+    action = "отключен" if disabled else "включен"
     
-    return {"success": True, "message": f"Розыгрыш для {raffle_date} {action}", "disabled": raffle_date not in disabled_dates}
+    return {"success": True, "message": f"Розыгрыш для {raffle_date} {action}", "disabled": not disabled}
 
@@ -2,6 +2,13 @@
 Роуты для операционки / контроля планировщика
 """
 from fastapi import APIRouter, Depends, HTTPException
+from scheduler import (
+    close_raffle_automatically, get_jobs_snapshot, is_scheduler_running,
+    mark_quiz_non_participants_for_date, reschedule_quiz_jobs_if_running,
+    reschedule_raffle_jobs_if_running, send_quiz_announcements_for_date,
+    send_quiz_reminders_for_date, send_raffle_announcements_for_date,
+    send_raffle_reminders_for_date,
+)
 from web.auth import get_current_user
 
 router = APIRouter()
@@ -11,7 +18,6 @@ router = APIRouter()
 async def list_jobs(username: str = Depends(get_current_user)):
     """Список задач APScheduler (id, next_run_time и пр.)."""
     try:
-        from scheduler import get_jobs_snapshot
         return get_jobs_snapshot()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -21,7 +27,6 @@ async def list_jobs(username: str = Depends(get_current_user)):
 async def reschedule_quiz(quiz_date: str, username: str = Depends(get_current_user)):
     """Пересоздать задачи конкретного квиза по данным из quiz.json."""
     try:
-        from scheduler import reschedule_quiz_jobs_if_running
         ok = reschedule_quiz_jobs_if_running(quiz_date)
         return {"success": True, "rescheduled": ok}
     except Exception as e:
@@ -39,18 +44,14 @@ async def run_quiz_action(quiz_date: str, action: str, username: str = Depends(g
     """
     action = (action or "").strip().lower()
     try:
-        from scheduler import scheduler
-        if not scheduler or not scheduler.running:
+        if not is_scheduler_running():
             raise HTTPException(status_code=409, detail="Scheduler не запущен")
 
         if action == "announce":
-            from scheduler import send_quiz_announcements_for_date
             await send_quiz_announcements_for_date(quiz_date)
         elif action == "remind":
-            from scheduler import send_quiz_reminders_for_date
             await send_quiz_reminders_for_date(quiz_date)
         elif action == "mark":
-            from scheduler import mark_quiz_non_participants_for_date
             await mark_quiz_non_participants_for_date(quiz_date)
         else:
             raise HTTPException(status_code=400, detail="Неизвестное действие")
@@ -66,7 +67,6 @@ async def run_quiz_action(quiz_date: str, action: str, username: str = Depends(g
 async def reschedule_raffle(raffle_date: str, username: str = Depends(get_current_user)):
     """Пересоздать задачи конкретного розыгрыша по данным из question.json."""
     try:
-        from scheduler import reschedule_raffle_jobs_if_running
         ok = reschedule_raffle_jobs_if_running(raffle_date)
         return {"success": True, "rescheduled": ok}
     except Exception as e:
@@ -84,18 +84,14 @@ async def run_raffle_action(raffle_date: str, action: str, username: str = Depen
     """
     action = (action or "").strip().lower()
     try:
-        from scheduler import scheduler
-        if not scheduler or not scheduler.running:
+        if not is_scheduler_running():
             raise HTTPException(status_code=409, detail="Scheduler не запущен")
 
         if action == "announce":
-            from scheduler import send_raffle_announcements_for_date
             await send_raffle_announcements_for_date(raffle_date)
         elif action == "remind":
-            from scheduler import send_raffle_reminders_for_date
             await send_raffle_reminders_for_date(raffle_date)
         elif action == "close":
-            from scheduler import close_raffle_automatically
             await close_raffle_automatically(raffle_date)
         else:
             raise HTTPException(status_code=400, detail="Неизвестное действие")
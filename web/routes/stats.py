@@ -1,246 +1,234 @@
 """
 Роуты для статистики
 """
-from fastapi import APIRouter, Depends
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy import select, func, and_
 from datetime import datetime, timedelta
-from database import AsyncSessionLocal, User, QuizResult, RaffleParticipant
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import User, QuizResult, RaffleParticipant, fetch_one, get_db
+from error_log import get_errors_count_since, get_recent_errors as get_error_entries, recent_errors
+from scheduler import is_scheduler_running
 from web.auth import get_current_user
+from web.etag import not_modified, payload_etag
+from web.memo import memoized
 
 router = APIRouter()
 
+# Сводки админка опрашивает по таймеру: 10 секунд браузер не повторяет запрос вовсе,
+# а после - получает 304, если цифры не изменились
+_STATS_CACHE_CONTROL = "private, max-age=10"
+
+def _conditional(request: Request, response: Response, payload: dict):
+    """Отдаёт payload с ETag по содержимому или 304, если у клиента те же данные"""
+    cached = not_modified(request, response, payload_etag(payload), _STATS_CACHE_CONTROL)
+    return payload if cached is None else cached
+
+
+async def _system_payload() -> dict:
+    """Сводка для /stats/system (считается не чаще раза в DEFAULT_TTL)"""
+    day_ago = datetime.now() - timedelta(days=1)
+    
+    # По одному запросу на таблицу; три запроса выполняются параллельно в отдельных сессиях
+    (total_users, subscribed, active_24h), (total_tickets_quiz,), (total_tickets_raffle,) = await asyncio.gather(
+        # Пользователи: всего, подписанные и активные за 24 часа - условные агрегаты
+        fetch_one(
+            select(
+                func.count(User.id),
+                func.count(User.id).filter(User.subscribed == True),
+                func.count(User.id).filter(User.created_at >= day_ago),
+            )
+        ),
+        # Билетики (COUNT по столбцу не считает NULL)
+        fetch_one(select(func.count(QuizResult.ticket_number))),
+        fetch_one(select(func.count(RaffleParticipant.ticket_number))),
+    )
+    
+    return {
+        "users": {
+            "total": total_users,
+            "subscribed": subscribed,
+            "active_24h": active_24h
+        },
+        "tickets": {
+            "total": (total_tickets_quiz or 0) + (total_tickets_raffle or 0),
+            "from_quiz": total_tickets_quiz or 0,
+            "from_raffle": total_tickets_raffle or 0
+        }
+    }
+
+
 @router.get("/system")
-async def get_system_stats(username: str = Depends(get_current_user)):
+async def get_system_stats(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Получить статистику системы"""
-    async with AsyncSessionLocal() as session:
-        # Пользователи
-        total_users = await session.scalar(select(func.count(User.id)))
-        subscribed = await session.scalar(
-            select(func.count(User.id)).where(User.subscribed == True)
-        )
-        
-        # Активные за 24 часа
-        day_ago = datetime.now() - timedelta(days=1)
-        active_24h = await session.scalar(
-            select(func.count(func.distinct(User.id))).where(
-                User.created_at >= day_ago
-            )
-        )
-        
-        # Билетики
-        total_tickets_quiz = await session.scalar(
-            select(func.count(QuizResult.ticket_number)).where(
-                QuizResult.ticket_number.isnot(None)
-            )
-        )
-        total_tickets_raffle = await session.scalar(
-            select(func.count(RaffleParticipant.ticket_number)).where(
-                RaffleParticipant.ticket_number.isnot(None)
-            )
-        )
-        
-        return {
-            "users": {
-                "total": total_users,
-                "subscribed": subscribed,
-                "active_24h": active_24h
-            },
-            "tickets": {
-                "total": (total_tickets_quiz or 0) + (total_tickets_raffle or 0),
-                "from_quiz": total_tickets_quiz or 0,
-                "from_raffle": total_tickets_raffle or 0
-            }
+    payload = await memoized("stats:system", _system_payload, response=response)
+    return _conditional(request, response, payload)
+
+
+def _in_period(column, since: datetime, until: Optional[datetime]):
+    # Диапазон по самому столбцу (а не func.date(column) == ...) - условие может использовать индекс
+    cond = column >= since
+    return and_(cond, column < until) if until is not None else cond
+
+
+async def _period_counts(since: datetime, until: Optional[datetime] = None) -> tuple:
+    """Новые пользователи, билетики и активность за период.
+
+    По одному запросу с условными агрегатами на таблицу, три запроса выполняются параллельно.
+    Возвращает (new_users, tickets_quiz, tickets_raffle, quiz_participants, raffle_participants).
+    """
+    (new_users,), (tickets_quiz, quiz_participants), (tickets_raffle, raffle_participants) = await asyncio.gather(
+        fetch_one(
+            select(func.count(User.id)).where(_in_period(User.created_at, since, until))
+        ),
+        fetch_one(
+            select(
+                func.count(QuizResult.ticket_number),  # COUNT(столбца) не считает NULL - только выданные билеты
+                func.count(QuizResult.id),
+            ).where(_in_period(QuizResult.completed_at, since, until))
+        ),
+        fetch_one(
+            select(
+                func.count(RaffleParticipant.ticket_number),
+                func.count(RaffleParticipant.id),
+            ).where(_in_period(RaffleParticipant.timestamp, since, until))
+        ),
+    )
+    return (
+        new_users or 0, tickets_quiz or 0, tickets_raffle or 0,
+        quiz_participants or 0, raffle_participants or 0,
+    )
+
+
+async def _daily_payload() -> dict:
+    """Сводка для /stats/daily (считается не чаще раза в DEFAULT_TTL)"""
+    today = datetime.now().date()
+    day_start = datetime.combine(today, datetime.min.time())
+    
+    new_users, tickets_quiz, tickets_raffle, quiz_participants, raffle_participants = await _period_counts(
+        day_start, day_start + timedelta(days=1)
+    )
+    
+    return {
+        "date": today.isoformat(),
+        "new_users": new_users,
+        "tickets": {
+            "total": tickets_quiz + tickets_raffle,
+            "from_quiz": tickets_quiz,
+            "from_raffle": tickets_raffle
+        },
+        "activity": {
+            "quiz_participants": quiz_participants,
+            "raffle_participants": raffle_participants
         }
+    }
+
 
 @router.get("/daily")
-async def get_daily_report(username: str = Depends(get_current_user)):
+async def get_daily_report(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Ежедневный отчет"""
-    async with AsyncSessionLocal() as session:
-        today = datetime.now().date()
-        
-        # Новые пользователи
-        new_users = await session.scalar(
-            select(func.count(User.id)).where(
-                func.date(User.created_at) == today
-            )
-        )
-        
-        # Билетики за сегодня
-        tickets_quiz = await session.scalar(
-            select(func.count(QuizResult.ticket_number)).where(
-                and_(
-                    QuizResult.ticket_number.isnot(None),
-                    func.date(QuizResult.completed_at) == today
-                )
-            )
-        )
-        
-        tickets_raffle = await session.scalar(
-            select(func.count(RaffleParticipant.ticket_number)).where(
-                and_(
-                    RaffleParticipant.ticket_number.isnot(None),
-                    func.date(RaffleParticipant.timestamp) == today
-                )
-            )
-        )
-        
-        # Активность
-        quiz_participants = await session.scalar(
-            select(func.count(QuizResult.id)).where(
-                func.date(QuizResult.completed_at) == today
-            )
-        )
-        
-        raffle_participants = await session.scalar(
-            select(func.count(RaffleParticipant.id)).where(
-                func.date(RaffleParticipant.timestamp) == today
-            )
-        )
-        
-        return {
-            "date": today.isoformat(),
-            "new_users": new_users or 0,
-            "tickets": {
-                "total": (tickets_quiz or 0) + (tickets_raffle or 0),
-                "from_quiz": tickets_quiz or 0,
-                "from_raffle": tickets_raffle or 0
-            },
-            "activity": {
-                "quiz_participants": quiz_participants or 0,
-                "raffle_participants": raffle_participants or 0
-            }
+    # Сводка за прошлый день не переживает полночь, даже если TTL ещё не истёк
+    payload = await memoized("stats:daily", _daily_payload, scope=datetime.now().date(), response=response)
+    return _conditional(request, response, payload)
+
+
+async def _weekly_payload() -> dict:
+    """Сводка для /stats/weekly (считается не чаще раза в DEFAULT_TTL)"""
+    today = datetime.now().date()
+    week_ago = today - timedelta(days=7)
+    
+    new_users, tickets_quiz, tickets_raffle, quiz_participants, raffle_participants = await _period_counts(
+        datetime.combine(week_ago, datetime.min.time())
+    )
+    
+    return {
+        "period": {
+            "from": week_ago.isoformat(),
+            "to": today.isoformat()
+        },
+        "new_users": {
+            "total": new_users,
+            "avg_per_day": new_users / 7
+        },
+        "tickets": {
+            "total": tickets_quiz + tickets_raffle,
+            "from_quiz": tickets_quiz,
+            "from_raffle": tickets_raffle,
+            "avg_per_day": (tickets_quiz + tickets_raffle) / 7
+        },
+        "activity": {
+            "quiz_participants": quiz_participants,
+            "raffle_participants": raffle_participants
         }
+    }
+
 
 @router.get("/weekly")
-async def get_weekly_report(username: str = Depends(get_current_user)):
+async def get_weekly_report(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Еженедельный отчет"""
-    async with AsyncSessionLocal() as session:
-        today = datetime.now().date()
-        week_ago = today - timedelta(days=7)
-        
-        # Новые пользователи
-        new_users = await session.scalar(
-            select(func.count(User.id)).where(
-                User.created_at >= datetime.combine(week_ago, datetime.min.time())
+    payload = await memoized("stats:weekly", _weekly_payload, response=response)
+    return _conditional(request, response, payload)
+
+@router.get("/health")
+async def get_system_health(
+    session: AsyncSession = Depends(get_db),
+    username: str = Depends(get_current_user)
+):
+    """Проверка состояния системы"""
+    try:
+        # Всего, подписанные и активные за 24 часа - один проход по users вместо трёх запросов
+        day_ago = datetime.now() - timedelta(days=1)
+        total_users, subscribed_users, active_users = (await session.execute(
+            select(
+                func.count(User.id),
+                func.count(User.id).filter(User.subscribed == True),
+                func.count(User.id).filter(User.created_at >= day_ago),
             )
-        )
+        )).one()
         
-        # Билетики
-        tickets_quiz = await session.scalar(
-            select(func.count(QuizResult.ticket_number)).where(
-                and_(
-                    QuizResult.ticket_number.isnot(None),
-                    QuizResult.completed_at >= datetime.combine(week_ago, datetime.min.time())
-                )
-            )
-        )
+        # Статус scheduler
+        scheduler_running = is_scheduler_running()
+        scheduler_status = "running" if scheduler_running else "stopped"
         
-        tickets_raffle = await session.scalar(
-            select(func.count(RaffleParticipant.ticket_number)).where(
-                and_(
-                    RaffleParticipant.ticket_number.isnot(None),
-                    RaffleParticipant.timestamp >= datetime.combine(week_ago, datetime.min.time())
-                )
-            )
-        )
+        # Последние ошибки
+        recent_errors_count = get_errors_count_since(1)  # За последний час
+        total_errors = len(recent_errors)
         
-        # Активность
-        quiz_participants = await session.scalar(
-            select(func.count(QuizResult.id)).where(
-                QuizResult.completed_at >= datetime.combine(week_ago, datetime.min.time())
-            )
-        )
+        # Проверка базы данных
+        try:
+            await session.execute(select(1))
+            db_status = "connected"
+        except Exception as e:
+            db_status = f"error: {str(e)[:50]}"
         
-        raffle_participants = await session.scalar(
-            select(func.count(RaffleParticipant.id)).where(
-                RaffleParticipant.timestamp >= datetime.combine(week_ago, datetime.min.time())
-            )
-        )
+        # Проверка критических компонентов
+        issues = []
+        if recent_errors_count > 10:
+            issues.append("Много ошибок за последний час")
+        if not scheduler_running:
+            issues.append("Scheduler не работает")
         
         return {
-            "period": {
-                "from": week_ago.isoformat(),
-                "to": today.isoformat()
+            "status": "ok" if not issues else "warning",
+            "users": {
+                "total": total_users or 0,
+                "subscribed": subscribed_users or 0,
+                "active_24h": active_users or 0
             },
-            "new_users": {
-                "total": new_users or 0,
-                "avg_per_day": (new_users or 0) / 7
+            "scheduler": {
+                "status": scheduler_status,
+                "running": scheduler_running
             },
-            "tickets": {
-                "total": (tickets_quiz or 0) + (tickets_raffle or 0),
-                "from_quiz": tickets_quiz or 0,
-                "from_raffle": tickets_raffle or 0,
-                "avg_per_day": ((tickets_quiz or 0) + (tickets_raffle or 0)) / 7
+            "database": {
+                "status": db_status
             },
-            "activity": {
-                "quiz_participants": quiz_participants or 0,
-                "raffle_participants": raffle_participants or 0
-            }
+            "errors": {
+                "last_hour": recent_errors_count,
+                "total": total_errors
+            },
+            "issues": issues
         }
-
-@router.get("/health")
-async def get_system_health(username: str = Depends(get_current_user)):
-    """Проверка состояния системы"""
-    from scheduler import scheduler
-    try:
-        from error_log import get_errors_count_since, recent_errors
-        
-        async with AsyncSessionLocal() as session:
-            # Активные пользователи (за последние 24 часа)
-            day_ago = datetime.now() - timedelta(days=1)
-            active_users = await session.scalar(
-                select(func.count(func.distinct(User.id))).where(
-                    User.created_at >= day_ago
-                )
-            )
-            
-            # Всего пользователей
-            total_users = await session.scalar(select(func.count(User.id)))
-            subscribed_users = await session.scalar(
-                select(func.count(User.id)).where(User.subscribed == True)
-            )
-            
-            # Статус scheduler
-            scheduler_status = "running" if scheduler and scheduler.running else "stopped"
-            
-            # Последние ошибки
-            recent_errors_count = get_errors_count_since(1)  # За последний час
-            total_errors = len(recent_errors)
-            
-            # Проверка базы данных
-            try:
-                await session.execute(select(1))
-                db_status = "connected"
-            except Exception as e:
-                db_status = f"error: {str(e)[:50]}"
-            
-            # Проверка критических компонентов
-            issues = []
-            if recent_errors_count > 10:
-                issues.append("Много ошибок за последний час")
-            if not scheduler or not scheduler.running:
-                issues.append("Scheduler не работает")
-            
-            return {
-                "status": "ok" if not issues else "warning",
-                "users": {
-                    "total": total_users or 0,
-                    "subscribed": subscribed_users or 0,
-                    "active_24h": active_users or 0
-                },
-                "scheduler": {
-                    "status": scheduler_status,
-                    "running": scheduler and scheduler.running
-                },
-                "database": {
-                    "status": db_status
-                },
-                "errors": {
-                    "last_hour": recent_errors_count,
-                    "total": total_errors
-                },
-                "issues": issues
-            }
     except Exception as e:
         return {
             "status": "error",
@@ -254,20 +242,14 @@ async def get_recent_errors(
 ):
     """Получить последние ошибки"""
     try:
-        from error_log import get_recent_errors, recent_errors
-        
-        if limit > 50:
-            limit = 50
-        
-        errors = get_recent_errors(limit)
+        # 0..50; при limit=0 срез [-0:] вернул бы все ошибки, поэтому выходим сразу
+        limit = min(max(limit, 0), 50)
+        errors = get_error_entries(limit) if limit else []
         
-        result = []
-        for error in errors:
-            result.append({
-                "time": error['time'].isoformat(),
-                "message": error['message'],
-                "traceback": error.get('traceback')
-            })
+        result = [
+            {"time": e['time'].isoformat(), "message": e['message'], "traceback": e.get('traceback')}
+            for e in errors
+        ]
         
         return {
             "total": len(recent_errors),
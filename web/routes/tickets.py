@@ -1,451 +1,402 @@
 """
 Роуты для управления билетиками
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, func, and_
-from database import AsyncSessionLocal, QuizResult, RaffleParticipant
+import asyncio
+from datetime import date, datetime, timezone
+from functools import lru_cache, partial
+from typing import Annotated, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from pydantic import BaseModel
+from sqlalchemy import select, update, func, and_, intersect, literal_column, tuple_, union, union_all
+from database import AsyncSessionLocal, QuizResult, RaffleParticipant, User, engine, fetch_all, fetch_one
+from quiz import MOSCOW_TZ
 from web.auth import get_current_user
+from web.memo import invalidate_memo, memoized
 
 router = APIRouter()
 
+def _duplicate_tickets(column):
+    """Номера билетов, которые встречаются в таблице больше одного раза, с числом повторов"""
+    return (
+        select(column, func.count(column).label('count'))
+        .where(column.isnot(None))
+        .group_by(column).having(func.count(column) > 1)
+    )
+
+
+def _cross_tickets():
+    """Номера билетов, выданные и в квизах, и в розыгрышах"""
+    return intersect(
+        select(QuizResult.ticket_number).where(QuizResult.ticket_number.isnot(None)),
+        select(RaffleParticipant.ticket_number).where(RaffleParticipant.ticket_number.isnot(None)),
+    )
+
+
+def _group_user_ids(rows) -> dict:
+    """[(ticket_number, user_id), ...] -> {ticket_number: [user_id, ...]}"""
+    users = {}
+    for ticket_num, user_id in rows:
+        users.setdefault(ticket_num, []).append(user_id)
+    return users
+
+
+def _ticket_aggregates(column):
+    """COUNT/MIN/MAX выданных билетов одной таблицы и число номеров-дублей - одной строкой"""
+    dups = _duplicate_tickets(column).subquery()
+    # WHERE IS NOT NULL не меняет агрегаты (они и так пропускают NULL), но совпадает с условием
+    # частичного индекса по ticket_number - PostgreSQL может читать только индекс
+    return select(
+        func.count(column), func.min(column), func.max(column),
+        select(func.count()).select_from(dups).scalar_subquery(),
+    ).where(column.isnot(None))
+
+
+async def _ticket_stats_payload() -> dict:
+    """Сводка для /tickets/stats"""
+    # По одному запросу на таблицу плюс пересечение - в своих сессиях, параллельно:
+    # время ответа определяется самым медленным запросом, а не их суммой
+    (
+        (total_quiz, min_quiz, max_quiz, quiz_duplicates),
+        (total_raffle, min_raffle, max_raffle, raffle_duplicates),
+        (cross_duplicates,),
+    ) = await asyncio.gather(
+        fetch_one(_ticket_aggregates(QuizResult.ticket_number)),
+        fetch_one(_ticket_aggregates(RaffleParticipant.ticket_number)),
+        # Дубли между таблицами: INTERSECT уже убирает повторы внутри каждой таблицы
+        fetch_one(select(func.count()).select_from(_cross_tickets().subquery())),
+    )
+
+    mins = [v for v in (min_quiz, min_raffle) if v is not None]
+    maxs = [v for v in (max_quiz, max_raffle) if v is not None]
+
+    return {
+        "total": (total_quiz or 0) + (total_raffle or 0),
+        "from_quiz": total_quiz or 0,
+        "from_raffle": total_raffle or 0,
+        "min": min(mins) if mins else None,
+        "max": max(maxs) if maxs else None,
+        "duplicates": {
+            "in_quiz": quiz_duplicates or 0,
+            "in_raffle": raffle_duplicates or 0,
+            "cross_table": cross_duplicates or 0
+        }
+    }
+
+
 @router.get("/stats")
-async def get_ticket_stats(username: str = Depends(get_current_user)):
+async def get_ticket_stats(response: Response, username: str = Depends(get_current_user)):
     """Получить статистику по билетикам"""
-    async with AsyncSessionLocal() as session:
-        # Общее количество
-        total_quiz = await session.scalar(
-            select(func.count(QuizResult.ticket_number)).where(
-                QuizResult.ticket_number.isnot(None)
-            )
-        )
-        total_raffle = await session.scalar(
-            select(func.count(RaffleParticipant.ticket_number)).where(
-                RaffleParticipant.ticket_number.isnot(None)
-            )
-        )
-        
-        # Минимум и максимум
-        min_quiz = await session.scalar(
-            select(func.min(QuizResult.ticket_number)).where(
-                QuizResult.ticket_number.isnot(None)
-            )
-        )
-        max_quiz = await session.scalar(
-            select(func.max(QuizResult.ticket_number)).where(
-                QuizResult.ticket_number.isnot(None)
-            )
-        )
-        min_raffle = await session.scalar(
-            select(func.min(RaffleParticipant.ticket_number)).where(
-                RaffleParticipant.ticket_number.isnot(None)
-            )
-        )
-        max_raffle = await session.scalar(
-            select(func.max(RaffleParticipant.ticket_number)).where(
-                RaffleParticipant.ticket_number.isnot(None)
-            )
-        )
-        
-        min_ticket = None
-        max_ticket = None
-        if min_quiz is not None:
-            min_ticket = min_quiz
-        if min_raffle is not None:
-            if min_ticket is None or min_raffle < min_ticket:
-                min_ticket = min_raffle
-        
-        if max_quiz is not None:
-            max_ticket = max_quiz
-        if max_raffle is not None:
-            if max_ticket is None or max_raffle > max_ticket:
-                max_ticket = max_raffle
-        
-        # Дубли
-        quiz_duplicates = await session.execute(
-            select(
-                QuizResult.ticket_number,
-                func.count(QuizResult.ticket_number).label('count')
-            ).where(
-                QuizResult.ticket_number.isnot(None)
-            ).group_by(QuizResult.ticket_number).having(func.count(QuizResult.ticket_number) > 1)
-        )
-        
-        raffle_duplicates = await session.execute(
-            select(
-                RaffleParticipant.ticket_number,
-                func.count(RaffleParticipant.ticket_number).label('count')
-            ).where(
-                RaffleParticipant.ticket_number.isnot(None)
-            ).group_by(RaffleParticipant.ticket_number).having(func.count(RaffleParticipant.ticket_number) > 1)
-        )
-        
-        # Дубли между таблицами
-        quiz_tickets = await session.execute(
-            select(QuizResult.ticket_number).where(QuizResult.ticket_number.isnot(None)).distinct()
-        )
-        quiz_set = {t[0] for t in quiz_tickets.all()}
-        
-        raffle_tickets = await session.execute(
-            select(RaffleParticipant.ticket_number).where(RaffleParticipant.ticket_number.isnot(None)).distinct()
-        )
-        raffle_set = {t[0] for t in raffle_tickets.all()}
-        
-        cross_duplicates = list(quiz_set & raffle_set)
-        
-        return {
-            "total": (total_quiz or 0) + (total_raffle or 0),
-            "from_quiz": total_quiz or 0,
-            "from_raffle": total_raffle or 0,
-            "min": min_ticket,
-            "max": max_ticket,
-            "duplicates": {
-                "in_quiz": len(quiz_duplicates.all()),
-                "in_raffle": len(raffle_duplicates.all()),
-                "cross_table": len(cross_duplicates)
+    return await memoized("tickets:stats", _ticket_stats_payload, response=response)
+
+
+def _page_numbers(stmt, column, skip: int, limit: Optional[int]):
+    """Страница номеров билетов (по возрастанию); без skip/limit - все номера"""
+    if not skip and limit is None:
+        return stmt
+    return stmt.order_by(column).offset(skip).limit(limit)
+
+
+def _duplicate_holders(model, skip: int = 0, limit: Optional[int] = None):
+    """(номер, пользователь, число строк) для билетов, выданных в таблице больше одного раза.
+
+    Один сгруппированный запрос даёт и число повторов номера (сумма по пользователям),
+    и список пользователей - без GROUP_CONCAT/array_agg, которые различаются в SQLite и PostgreSQL.
+    skip/limit ограничивают сами номера-дубли до выборки пользователей.
+    """
+    dup_numbers = _page_numbers(
+        _duplicate_tickets(model.ticket_number), model.ticket_number, skip, limit
+    ).subquery()
+    return (
+        select(model.ticket_number, model.user_id, func.count())
+        .where(model.ticket_number.in_(select(dup_numbers.c.ticket_number)))
+        .group_by(model.ticket_number, model.user_id)
+        .order_by(model.ticket_number)
+    )
+
+
+def _collect_duplicates(rows, source: str) -> list:
+    """Строки _duplicate_holders -> записи ответа /duplicates (по возрастанию номера)"""
+    by_ticket = {}
+    for ticket_num, user_id, count in rows:
+        entry = by_ticket.get(ticket_num)
+        if entry is None:
+            entry = by_ticket[ticket_num] = {
+                "ticket_number": ticket_num, "count": 0, "user_ids": [], "source": source
             }
-        }
+        entry["count"] += count
+        entry["user_ids"].append(user_id)
+    return list(by_ticket.values())
+
+
+async def _duplicates_payload(skip: int = 0, limit: Optional[int] = None) -> dict:
+    """Список дублей для /tickets/duplicates (страница skip/limit - отдельно по каждому источнику)"""
+    # Три запроса при любом числе дублей: по одному сгруппированному на таблицу и пересечение;
+    # отбор и подсчёт делает БД, в Python приходят только строки дублей. Запросы независимы -
+    # выполняются параллельно на отдельных соединениях
+    cross_all = _cross_tickets().subquery()
+    cross_numbers = _page_numbers(
+        select(cross_all.c.ticket_number), cross_all.c.ticket_number, skip, limit
+    ).subquery()
+    quiz_rows, raffle_rows, cross_rows = await asyncio.gather(
+        fetch_all(_duplicate_holders(QuizResult, skip, limit)),
+        fetch_all(_duplicate_holders(RaffleParticipant, skip, limit)),
+        # Дубли между таблицами: UNION убирает пользователя, получившего номер в обеих таблицах
+        fetch_all(union(
+            select(QuizResult.ticket_number, QuizResult.user_id)
+            .where(QuizResult.ticket_number.in_(select(cross_numbers.c.ticket_number))),
+            select(RaffleParticipant.ticket_number, RaffleParticipant.user_id)
+            .where(RaffleParticipant.ticket_number.in_(select(cross_numbers.c.ticket_number))),
+        )),
+    )
+    cross_users = _group_user_ids(cross_rows)
+
+    duplicates = _collect_duplicates(quiz_rows, "quiz") + _collect_duplicates(raffle_rows, "raffle")
+    for ticket_num in sorted(cross_users):
+        user_ids = cross_users[ticket_num]
+        duplicates.append({
+            "ticket_number": ticket_num,
+            "count": len(user_ids),
+            "user_ids": user_ids,
+            "source": "cross_table"
+        })
+
+    return {"duplicates": duplicates}
+
 
 @router.get("/duplicates")
-async def get_duplicates(username: str = Depends(get_current_user)):
-    """Получить список всех дублей"""
+async def get_duplicates(
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    username: str = Depends(get_current_user)
+):
+    """Получить список дублей.
+
+    Без limit - все дубли (так их показывает админка); с skip/limit - страница номеров
+    в каждом источнике (квизы, розыгрыши, между таблицами) по возрастанию номера.
+    """
+    return await memoized(
+        "tickets:duplicates", partial(_duplicates_payload, skip, limit),
+        scope=(skip, limit), ttl=15.0, response=response,
+    )
+
+class TicketRefIn(BaseModel):
+    user_id: int
+    ticket_number: int
+
+
+async def _clear_tickets(pairs: list[tuple[int, int]]) -> int:
+    """Снимает билеты по парам (user_id, ticket_number) в обеих таблицах одной транзакцией.
+
+    По одному UPDATE на таблицу при любом числе пар (без предварительных SELECT); снимаются
+    и повторные записи одного билета. Возвращает число затронутых строк.
+    """
     async with AsyncSessionLocal() as session:
-        # Дубли в квизах
-        quiz_dups = await session.execute(
-            select(
-                QuizResult.ticket_number,
-                func.count(QuizResult.ticket_number).label('count')
-            ).where(
-                QuizResult.ticket_number.isnot(None)
-            ).group_by(QuizResult.ticket_number).having(func.count(QuizResult.ticket_number) > 1)
-        )
-        
-        # Дубли в розыгрышах
-        raffle_dups = await session.execute(
-            select(
-                RaffleParticipant.ticket_number,
-                func.count(RaffleParticipant.ticket_number).label('count')
-            ).where(
-                RaffleParticipant.ticket_number.isnot(None)
-            ).group_by(RaffleParticipant.ticket_number).having(func.count(RaffleParticipant.ticket_number) > 1)
-        )
-        
-        # Дубли между таблицами
-        quiz_tickets = await session.execute(
-            select(QuizResult.ticket_number).where(QuizResult.ticket_number.isnot(None)).distinct()
+        quiz_result = await session.execute(
+            update(QuizResult)
+            .where(tuple_(QuizResult.user_id, QuizResult.ticket_number).in_(pairs))
+            .values(ticket_number=None)
         )
-        quiz_set = {t[0] for t in quiz_tickets.all()}
-        
-        raffle_tickets = await session.execute(
-            select(RaffleParticipant.ticket_number).where(RaffleParticipant.ticket_number.isnot(None)).distinct()
+        raffle_result = await session.execute(
+            update(RaffleParticipant)
+            .where(tuple_(RaffleParticipant.user_id, RaffleParticipant.ticket_number).in_(pairs))
+            .values(ticket_number=None)
         )
-        raffle_set = {t[0] for t in raffle_tickets.all()}
-        
-        cross_duplicates = list(quiz_set & raffle_set)
-        
-        duplicates = []
-        
-        # Обрабатываем дубли из квизов
-        for ticket_num, count in quiz_dups.all():
-            users_query = await session.execute(
-                select(QuizResult.user_id).where(QuizResult.ticket_number == ticket_num).distinct()
-            )
-            user_ids = [u[0] for u in users_query.all()]
-            duplicates.append({
-                "ticket_number": ticket_num,
-                "count": count,
-                "user_ids": user_ids,
-                "source": "quiz"
-            })
-        
-        # Обрабатываем дубли из розыгрышей
-        for ticket_num, count in raffle_dups.all():
-            users_query = await session.execute(
-                select(RaffleParticipant.user_id).where(RaffleParticipant.ticket_number == ticket_num).distinct()
-            )
-            user_ids = [u[0] for u in users_query.all()]
-            duplicates.append({
-                "ticket_number": ticket_num,
-                "count": count,
-                "user_ids": user_ids,
-                "source": "raffle"
-            })
-        
-        # Обрабатываем дубли между таблицами
-        for ticket_num in cross_duplicates:
-            quiz_users = await session.execute(
-                select(QuizResult.user_id).where(QuizResult.ticket_number == ticket_num).distinct()
-            )
-            raffle_users = await session.execute(
-                select(RaffleParticipant.user_id).where(RaffleParticipant.ticket_number == ticket_num).distinct()
-            )
-            user_ids = list(set([u[0] for u in quiz_users.all()] + [u[0] for u in raffle_users.all()]))
-            duplicates.append({
-                "ticket_number": ticket_num,
-                "count": len(user_ids),
-                "user_ids": user_ids,
-                "source": "cross_table"
-            })
-        
-        return {"duplicates": duplicates}
+        removed = (quiz_result.rowcount or 0) + (raffle_result.rowcount or 0)
+        if removed:
+            await session.commit()
+            invalidate_memo()
+        return removed
+
 
 @router.delete("/{user_id}/{ticket_number}")
 async def remove_ticket(user_id: int, ticket_number: int, username: str = Depends(get_current_user)):
     """Удалить билетик у пользователя"""
-    async with AsyncSessionLocal() as session:
-        # Ищем в квизах
-        quiz_result = await session.execute(
-            select(QuizResult).where(
-                and_(
-                    QuizResult.user_id == user_id,
-                    QuizResult.ticket_number == ticket_number
-                )
-            )
-        )
-        quiz_ticket = quiz_result.scalar_one_or_none()
-        
-        # Ищем в розыгрышах
-        raffle_result = await session.execute(
-            select(RaffleParticipant).where(
-                and_(
-                    RaffleParticipant.user_id == user_id,
-                    RaffleParticipant.ticket_number == ticket_number
-                )
-            )
-        )
-        raffle_ticket = raffle_result.scalar_one_or_none()
-        
-        if not quiz_ticket and not raffle_ticket:
-            raise HTTPException(status_code=404, detail="Билетик не найден")
-        
-        if quiz_ticket:
-            quiz_ticket.ticket_number = None
-        if raffle_ticket:
-            raffle_ticket.ticket_number = None
-        
-        await session.commit()
-        
-        return {"success": True, "message": f"Билетик №{ticket_number} удален у пользователя {user_id}"}
+    if not await _clear_tickets([(user_id, ticket_number)]):
+        raise HTTPException(status_code=404, detail="Билетик не найден")
+    return {"success": True, "message": f"Билетик №{ticket_number} удален у пользователя {user_id}"}
+
+
+@router.post("/bulk_remove")
+async def bulk_remove_tickets(
+    tickets: Annotated[list[TicketRefIn], Body(min_length=1, max_length=500)],
+    username: str = Depends(get_current_user)
+):
+    """Удалить несколько билетиков: [{"user_id": ..., "ticket_number": ...}, ...]"""
+    pairs = list({(t.user_id, t.ticket_number) for t in tickets})
+    removed = await _clear_tickets(pairs)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Билетики не найдены")
+    return {"success": True, "removed": removed, "message": f"Снято билетиков: {removed}"}
 
 @router.get("/user/{user_id}")
 async def get_user_tickets(user_id: int, username: str = Depends(get_current_user)):
     """Получить все билетики пользователя"""
-    async with AsyncSessionLocal() as session:
-        quiz_tickets = await session.execute(
-            select(QuizResult).where(
-                and_(
-                    QuizResult.user_id == user_id,
-                    QuizResult.ticket_number.isnot(None)
-                )
-            ).order_by(QuizResult.ticket_number.asc())
-        )
-        
-        raffle_tickets = await session.execute(
-            select(RaffleParticipant).where(
-                and_(
-                    RaffleParticipant.user_id == user_id,
-                    RaffleParticipant.ticket_number.isnot(None)
-                )
-            ).order_by(RaffleParticipant.ticket_number.asc())
+    # Один запрос: только нужные столбцы обеих таблиц, сортировка по номеру - в БД.
+    # Источник - константа в тексте SQL, а не параметр: asyncpg не выводит тип параметра в UNION
+    stmt = union_all(
+        select(
+            QuizResult.ticket_number, literal_column("'quiz'").label("source"),
+            QuizResult.quiz_date.label("date"), QuizResult.completed_at.label("at"),
+        ).where(and_(QuizResult.user_id == user_id, QuizResult.ticket_number.isnot(None))),
+        select(
+            RaffleParticipant.ticket_number, literal_column("'raffle'").label("source"),
+            RaffleParticipant.raffle_date.label("date"), RaffleParticipant.timestamp.label("at"),
+        ).where(and_(RaffleParticipant.user_id == user_id, RaffleParticipant.ticket_number.isnot(None))),
+    ).order_by("ticket_number")
+
+    async with engine.connect() as conn:
+        rows = (await conn.execute(stmt)).all()
+
+    tickets = []
+    for ticket_number, source, ticket_date, at in rows:
+        # У квиза время завершения (completed_at), у розыгрыша - время получения вопроса (timestamp);
+        # datetime отдаём как есть: orjson сам кодирует его в ISO 8601 (None -> null)
+        time_key = "completed_at" if source == "quiz" else "timestamp"
+        tickets.append({
+            "ticket_number": ticket_number,
+            "source": source,
+            "date": ticket_date,
+            time_key: at
+        })
+
+    return {"user_id": user_id, "tickets": tickets}
+
+# Человекочитаемые статусы регистрации (включая старый формат "current"/"former")
+_STATUS_DISPLAY = {
+    "current_employee": "Действующий сотрудник",
+    "current": "Действующий сотрудник",
+    "former_employee": "Бывший сотрудник",
+    "former": "Бывший сотрудник",
+    "other": "Другое"
+}
+
+# Столбцы users для карточки билета (через outer join - пользователя может не быть в таблице)
+_USER_COLUMNS = (
+    User.id.label("u_id"), User.username, User.first_name, User.registration_completed,
+    User.registration_status, User.registration_first_name, User.registration_last_name,
+    User.registration_position, User.registration_department, User.registration_city,
+    User.registration_source, User.created_at,
+)
+
+
+def _build_user_info(row) -> Optional[dict]:
+    """Информация о пользователе из строки запроса check_time (None, если пользователя нет)"""
+    if row.u_id is None:
+        return None
+    status_display = None
+    if row.registration_status:
+        # Сначала точное совпадение, потом без пробелов и регистра; иначе - исходное значение
+        status_display = (
+            _STATUS_DISPLAY.get(row.registration_status)
+            or _STATUS_DISPLAY.get(row.registration_status.strip().lower())
+            or row.registration_status
         )
-        
-        tickets = []
-        for ticket in quiz_tickets.scalars().all():
-            tickets.append({
-                "ticket_number": ticket.ticket_number,
-                "source": "quiz",
-                "date": ticket.quiz_date,
-                "completed_at": ticket.completed_at.isoformat() if ticket.completed_at else None
-            })
-        
-        for ticket in raffle_tickets.scalars().all():
-            tickets.append({
-                "ticket_number": ticket.ticket_number,
-                "source": "raffle",
-                "date": ticket.raffle_date,
-                "timestamp": ticket.timestamp.isoformat() if ticket.timestamp else None
-            })
-        
-        tickets.sort(key=lambda x: x["ticket_number"])
-        
-        return {"user_id": user_id, "tickets": tickets}
+    return {
+        "id": row.u_id,
+        "username": row.username,
+        "first_name": row.first_name,
+        "registration_completed": row.registration_completed,
+        "registration_status": row.registration_status,
+        "registration_status_display": status_display,
+        "registration_first_name": row.registration_first_name,
+        "registration_last_name": row.registration_last_name,
+        "registration_position": row.registration_position,
+        "registration_department": row.registration_department,
+        "registration_city": row.registration_city,
+        "registration_source": row.registration_source,
+        "created_at": row.created_at
+    }
+
+
+@lru_cache(maxsize=256)
+def _format_date(value: str) -> str:
+    """YYYY-MM-DD -> DD.MM.YYYY; дат квизов/розыгрышей немного, поэтому результат кэшируется"""
+    try:
+        return date.fromisoformat(value).strftime("%d.%m.%Y")
+    except (TypeError, ValueError):
+        return value
+
+
+def _format_moscow(at: Optional[datetime]) -> str:
+    """Время выдачи в МСК для показа (naive-время в БД - UTC)"""
+    if not at:
+        return "неизвестно"
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return at.astimezone(MOSCOW_TZ).strftime("%d.%m.%Y %H:%M:%S МСК")
+
 
 @router.get("/check_time/{ticket_number}")
-async def check_ticket_time(ticket_number: int, username: str = Depends(get_current_user)):
-    """Проверить время выдачи билетика с информацией о пользователе"""
-    from datetime import datetime, timezone, timedelta
-    from database import User
-    
-    async with AsyncSessionLocal() as session:
-        # Ищем билетики в квизах с информацией о пользователе
-        quiz_result = await session.execute(
-            select(QuizResult, User).outerjoin(
-                User, QuizResult.user_id == User.id
-            ).where(
-                QuizResult.ticket_number == ticket_number
-            ).order_by(QuizResult.completed_at.asc())
-        )
-        quiz_tickets = quiz_result.all()
-        
-        # Ищем билетики в розыгрышах с информацией о пользователе
-        raffle_result = await session.execute(
-            select(RaffleParticipant, User).outerjoin(
-                User, RaffleParticipant.user_id == User.id
-            ).where(
-                RaffleParticipant.ticket_number == ticket_number
-            ).order_by(RaffleParticipant.timestamp.asc())
-        )
-        raffle_tickets = raffle_result.all()
-        
-        if not quiz_tickets and not raffle_tickets:
-            raise HTTPException(status_code=404, detail=f"Билетик №{ticket_number} не найден")
-        
-        moscow_tz = timezone(timedelta(hours=3))
-        all_tickets = []
-        
-        # Обрабатываем квизы
-        for ticket, user in quiz_tickets:
-            try:
-                date_obj = datetime.strptime(ticket.quiz_date, "%Y-%m-%d")
-                date_display = date_obj.strftime("%d.%m.%Y")
-            except:
-                date_display = ticket.quiz_date
-            
-            if ticket.completed_at:
-                if ticket.completed_at.tzinfo is None:
-                    utc_time = ticket.completed_at.replace(tzinfo=timezone.utc)
-                    moscow_time = utc_time.astimezone(moscow_tz)
-                else:
-                    moscow_time = ticket.completed_at.astimezone(moscow_tz)
-                time_display = moscow_time.strftime("%d.%m.%Y %H:%M:%S МСК")
-            else:
-                time_display = "неизвестно"
-            
-            # Формируем информацию о пользователе
-            user_info = None
-            if user:
-                status_map = {
-                    "current_employee": "Действующий сотрудник",
-                    "current": "Действующий сотрудник",  # Поддержка старого формата
-                    "former_employee": "Бывший сотрудник",
-                    "former": "Бывший сотрудник",  # Поддержка старого формата
-                    "other": "Другое"
-                }
-                # Нормализуем статус (убираем пробелы, приводим к нижнему регистру для сравнения)
-                normalized_status = user.registration_status.strip().lower() if user.registration_status else None
-                # Ищем в маппинге (сначала точное совпадение, потом нормализованное)
-                status_display = None
-                if user.registration_status:
-                    status_display = status_map.get(user.registration_status) or status_map.get(normalized_status)
-                    # Если не нашли в маппинге, используем оригинальное значение
-                    if not status_display:
-                        status_display = user.registration_status
-                
-                user_info = {
-                    "id": user.id,
-                    "username": user.username,
-                    "first_name": user.first_name,
-                    "registration_completed": user.registration_completed,
-                    "registration_status": user.registration_status,
-                    "registration_status_display": status_display,
-                    "registration_first_name": user.registration_first_name,
-                    "registration_last_name": user.registration_last_name,
-                    "registration_position": user.registration_position,
-                    "registration_department": user.registration_department,
-                    "registration_city": user.registration_city,
-                    "registration_source": user.registration_source,
-                    "created_at": user.created_at.isoformat() if user.created_at else None
-                }
-            
-            all_tickets.append({
-                'user_id': ticket.user_id,
-                'source': 'квиз',
-                'date': date_display,
-                'time': ticket.completed_at.isoformat() if ticket.completed_at else None,
-                'time_display': time_display,
-                'db_id': ticket.id,
-                'user': user_info
-            })
-        
-        # Обрабатываем розыгрыши
-        for ticket, user in raffle_tickets:
-            try:
-                date_obj = datetime.strptime(ticket.raffle_date, "%Y-%m-%d")
-                date_display = date_obj.strftime("%d.%m.%Y")
-            except:
-                date_display = ticket.raffle_date
-            
-            if ticket.timestamp:
-                if ticket.timestamp.tzinfo is None:
-                    utc_time = ticket.timestamp.replace(tzinfo=timezone.utc)
-                    moscow_time = utc_time.astimezone(moscow_tz)
-                else:
-                    moscow_time = ticket.timestamp.astimezone(moscow_tz)
-                time_display = moscow_time.strftime("%d.%m.%Y %H:%M:%S МСК") + " (время вопроса, билетик выдан позже)"
-            else:
-                time_display = "неизвестно"
-            
-            # Формируем информацию о пользователе
-            user_info = None
-            if user:
-                status_map = {
-                    "current_employee": "Действующий сотрудник",
-                    "current": "Действующий сотрудник",  # Поддержка старого формата
-                    "former_employee": "Бывший сотрудник",
-                    "former": "Бывший сотрудник",  # Поддержка старого формата
-                    "other": "Другое"
-                }
-                # Нормализуем статус (убираем пробелы, приводим к нижнему регистру для сравнения)
-                normalized_status = user.registration_status.strip().lower() if user.registration_status else None
-                # Ищем в маппинге (сначала точное совпадение, потом нормализованное)
-                status_display = None
-                if user.registration_status:
-                    status_display = status_map.get(user.registration_status) or status_map.get(normalized_status)
-                    # Если не нашли в маппинге, используем оригинальное значение
-                    if not status_display:
-                        status_display = user.registration_status
-                
-                user_info = {
-                    "id": user.id,
-                    "username": user.username,
-                    "first_name": user.first_name,
-                    "registration_completed": user.registration_completed,
-                    "registration_status": user.registration_status,
-                    "registration_status_display": status_display,
-                    "registration_first_name": user.registration_first_name,
-                    "registration_last_name": user.registration_last_name,
-                    "registration_position": user.registration_position,
-                    "registration_department": user.registration_department,
-                    "registration_city": user.registration_city,
-                    "registration_source": user.registration_source,
-                    "created_at": user.created_at.isoformat() if user.created_at else None
-                }
-            
-            all_tickets.append({
-                'user_id': ticket.user_id,
-                'source': 'розыгрыш',
-                'date': date_display,
-                'time': ticket.timestamp.isoformat() if ticket.timestamp else None,
-                'time_display': time_display,
-                'db_id': ticket.id,
-                'user': user_info
-            })
-        
-        # Сортируем по времени
-        all_tickets.sort(key=lambda x: (
-            x['time'] if x['time'] else datetime.min.isoformat(),
-            x.get('db_id', 0)
-        ))
-        
-        same_time = len(all_tickets) > 1 and all_tickets[0]['time'] == all_tickets[1]['time']
-        first_user = all_tickets[0] if all_tickets else None
-        
+async def check_ticket_time(
+    ticket_number: int,
+    summary: bool = False,
+    username: str = Depends(get_current_user)
+):
+    """Проверить время выдачи билетика с информацией о пользователе.
+
+    summary=true - только первый получивший и флаг одинакового времени: читаются 2 строки, а не все.
+    """
+    # Квизы и розыгрыши одним запросом, с пользователем и сортировкой по времени в БД
+    stmt = union_all(
+        select(
+            QuizResult.user_id, literal_column("'quiz'").label("source"),
+            QuizResult.quiz_date.label("date"), QuizResult.completed_at.label("at"),
+            QuizResult.id.label("db_id"), *_USER_COLUMNS,
+        ).outerjoin(User, QuizResult.user_id == User.id).where(QuizResult.ticket_number == ticket_number),
+        select(
+            RaffleParticipant.user_id, literal_column("'raffle'").label("source"),
+            RaffleParticipant.raffle_date.label("date"), RaffleParticipant.timestamp.label("at"),
+            RaffleParticipant.id.label("db_id"), *_USER_COLUMNS,
+        ).outerjoin(User, RaffleParticipant.user_id == User.id).where(RaffleParticipant.ticket_number == ticket_number),
+    ).order_by("at", "db_id")
+    if summary:
+        stmt = stmt.limit(2)
+
+    async with engine.connect() as conn:
+        rows = (await conn.execute(stmt)).all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Билетик №{ticket_number} не найден")
+
+    if summary:
+        first = rows[0]
         return {
             "ticket_number": ticket_number,
-            "tickets": all_tickets,
             "first_user": {
-                "user_id": first_user['user_id'],
-                "source": first_user['source']
-            } if first_user else None,
-            "same_time": same_time
+                "user_id": first.user_id,
+                "source": 'квиз' if first.source == "quiz" else 'розыгрыш'
+            },
+            "same_time": len(rows) > 1 and rows[0].at == rows[1].at
         }
 
+    all_tickets = []
+    for row in rows:
+        date_display = _format_date(row.date)
+
+        time_display = _format_moscow(row.at)
+        if row.source == "raffle" and row.at:
+            time_display += " (время вопроса, билетик выдан позже)"
+
+        all_tickets.append({
+            'user_id': row.user_id,
+            'source': 'квиз' if row.source == "quiz" else 'розыгрыш',
+            'date': date_display,
+            'time': row.at,  # orjson кодирует datetime в ISO 8601
+            'time_display': time_display,
+            'db_id': row.db_id,
+            'user': _build_user_info(row)
+        })
+
+    same_time = len(all_tickets) > 1 and all_tickets[0]['time'] == all_tickets[1]['time']
+    first_user = all_tickets[0]
+
+    return {
+        "ticket_number": ticket_number,
+        "tickets": all_tickets,
+        "first_user": {
+            "user_id": first_user['user_id'],
+            "source": first_user['source']
+        },
+        "same_time": same_time
+    }
@@ -1,176 +1,271 @@
 """
 Роуты для управления пользователями
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from sqlalchemy import select, func
-from database import AsyncSessionLocal, User
+import asyncio
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, func, lambda_stmt, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import User, fetch_all, fetch_one, get_db
 from web.auth import get_current_user
+from web.etag import not_modified, payload_etag
+from web.memo import memoized
 from config import ZODIAC_NAMES
 
 router = APIRouter()
 
+
+def _conditional(request: Request, response: Response, payload: dict):
+    """Отдаёт payload с ETag по содержимому или 304, если у админки уже те же данные"""
+    cached = not_modified(request, response, payload_etag(payload))
+    return payload if cached is None else cached
+
+
+# Колонки для списков: строки без ORM-объектов и без лишних полей регистрации
+_LIST_COLUMNS = (
+    User.id,
+    User.username,
+    User.first_name,
+    User.zodiac,
+    User.subscribed,
+    User.registration_completed,
+    User.created_at,
+)
+_USERS_LIST_SELECT = select(*_LIST_COLUMNS)
+
+
+def _users_page_stmt(
+    skip: int,
+    limit: int,
+    before_created_at: Optional[datetime],
+    before_id: Optional[int],
+    registered_only: bool = False,
+):
+    """Страница списка пользователей: keyset по (created_at, id) либо OFFSET (устаревший skip).
+
+    Выбирает limit + 1 строку: лишняя показывает, что есть следующая страница (см. _split_page).
+    """
+    if (before_created_at is None) != (before_id is None):
+        raise HTTPException(status_code=400, detail="Курсор задаётся парой before_created_at и before_id")
+    # lambda_stmt: дерево запроса строится и кэшируется один раз (ключ - код лямбд),
+    # значения из замыканий уходят в bind-параметры.
+    # id - тай-брейкер для одинаковых created_at, чтобы курсор был однозначным
+    stmt = lambda_stmt(lambda: _USERS_LIST_SELECT.order_by(User.created_at.desc(), User.id.desc()))
+    if registered_only:
+        stmt += lambda s: s.where(User.registration_completed == True)
+    if before_id is not None:
+        # Продолжаем строго после курсора по индексу ix_users_created_id, без OFFSET
+        stmt += lambda s: s.where(
+            tuple_(User.created_at, User.id) < tuple_(before_created_at, before_id)
+        )
+    else:
+        stmt += lambda s: s.offset(skip)
+    stmt += lambda s: s.limit(limit + 1)
+    return stmt
+
+
+def _user_item(user) -> dict:
+    """Строка списка пользователей (колонки _LIST_COLUMNS) в элемент ответа"""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "zodiac": user.zodiac,
+        "zodiac_name": ZODIAC_NAMES.get(user.zodiac, f"Знак #{user.zodiac}") if user.zodiac else None,
+        "subscribed": user.subscribed,
+        "registration_completed": user.registration_completed,
+        "created_at": user.created_at
+    }
+
+
+def _split_page(rows, limit: int) -> tuple[list, Optional[dict]]:
+    """Отрезает строку-заглядывание; курсор следующей страницы - None, если страница последняя"""
+    if len(rows) <= limit:
+        return rows, None
+    users = rows[:limit]
+    last = users[-1]
+    return users, {"before_created_at": last.created_at, "before_id": last.id}
+
+
 # ВАЖНО: Специфичные роуты должны быть ПЕРЕД общими роутами с параметрами
 # Иначе FastAPI будет пытаться обработать "/new" как "/{user_id}"
 
+async def _users_overview_payload() -> dict:
+    """Сводка для /users/stats/overview"""
+    # Один проход по users: условные агрегаты вместо трёх отдельных COUNT
+    total, subscribed, registered = await fetch_one(
+        select(
+            func.count(User.id),
+            func.count(User.id).filter(User.subscribed == True),
+            func.count(User.id).filter(User.registration_completed == True),
+        )
+    )
+    
+    return {
+        "total": total,
+        "subscribed": subscribed,
+        "not_subscribed": total - subscribed,
+        "registered": registered,
+        "not_registered": total - registered
+    }
+
+
 @router.get("/stats/overview")
-async def get_users_stats(username: str = Depends(get_current_user)):
+async def get_users_stats(request: Request, response: Response, username: str = Depends(get_current_user)):
     """Получить общую статистику по пользователям"""
-    async with AsyncSessionLocal() as session:
-        total = await session.scalar(select(func.count(User.id)))
-        subscribed = await session.scalar(
-            select(func.count(User.id)).where(User.subscribed == True)
-        )
-        registered = await session.scalar(
-            select(func.count(User.id)).where(User.registration_completed == True)
-        )
-        
-        return {
-            "total": total,
-            "subscribed": subscribed,
-            "not_subscribed": total - subscribed,
-            "registered": registered,
-            "not_registered": total - registered
-        }
+    payload = await memoized("users:overview", _users_overview_payload, response=response)
+    return _conditional(request, response, payload)
 
 @router.get("/new")
 async def get_new_users(
+    request: Request,
+    response: Response,
     days: int = Query(1, ge=1, le=30),
     limit: int = Query(100, ge=1, le=500),
     username: str = Depends(get_current_user)
 ):
-    """Получить список новых пользователей"""
-    from datetime import datetime, timedelta
-    async with AsyncSessionLocal() as session:
-        cutoff_date = datetime.now() - timedelta(days=days)
-        
-        users_query = await session.execute(
-            select(User).where(
-                User.created_at >= cutoff_date
-            ).order_by(User.created_at.desc()).limit(limit)
-        )
-        users = users_query.scalars().all()
-        
-        result = []
-        for user in users:
-            zodiac_name = None
-            if user.zodiac:
-                zodiac_name = ZODIAC_NAMES.get(user.zodiac, f"Знак #{user.zodiac}")
-            
-            result.append({
-                "id": user.id,
-                "username": user.username,
-                "first_name": user.first_name,
-                "zodiac": user.zodiac,
-                "zodiac_name": zodiac_name,
-                "subscribed": user.subscribed,
-                "registration_completed": user.registration_completed,
-                "created_at": user.created_at.isoformat() if user.created_at else None
-            })
-        
-        return {"users": result, "count": len(result)}
+    """Получить список новых пользователей (кэшируется на минуту - админка обновляет его по таймеру)"""
+    # created_at пишется как datetime.utcnow() (наивное UTC) - граница считается так же,
+    # иначе на сервере не в UTC окно "за N дней" сдвигается на разницу поясов
+    cutoff_date = datetime.utcnow() - timedelta(days=days)
+    
+    # lambda_stmt, как в _users_page_stmt: cutoff_date и limit уходят в bind-параметры
+    stmt = lambda_stmt(
+        lambda: _USERS_LIST_SELECT.where(
+            User.created_at >= cutoff_date
+        ).order_by(User.created_at.desc()).limit(limit)
+    )
+    users = await memoized(
+        f"users:new:{days}", partial(fetch_all, stmt), scope=limit, ttl=60.0, response=response
+    )
+    
+    result = [_user_item(user) for user in users]
+    
+    return _conditional(request, response, {"users": result, "count": len(result)})
 
 @router.get("/registered")
 async def get_registered_users(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    before_created_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    include_total: bool = True,
     username: str = Depends(get_current_user)
 ):
-    """Получить список авторизованных пользователей"""
-    async with AsyncSessionLocal() as session:
-        total = await session.scalar(
-            select(func.count(User.id)).where(User.registration_completed == True)
+    """Получить список авторизованных пользователей
+    
+    Для глубокой пагинации передавайте курсор before_created_at + before_id
+    (значение next_cursor из предыдущего ответа) вместо skip.
+    include_total=false - без подсчёта total: для кнопки "Дальше" достаточно has_more.
+    """
+    stmt = _users_page_stmt(skip, limit, before_created_at, before_id, registered_only=True)
+    if include_total:
+        # Счётчик (из кэша на TTL) и страница независимы - параллельно, каждый на своём соединении
+        total, rows = await asyncio.gather(
+            memoized("users:registered_total", _registered_total), fetch_all(stmt)
         )
-        
-        users_query = await session.execute(
-            select(User).where(
-                User.registration_completed == True
-            ).offset(skip).limit(limit).order_by(User.created_at.desc())
-        )
-        users = users_query.scalars().all()
-        
-        result = []
-        for user in users:
-            zodiac_name = None
-            if user.zodiac:
-                zodiac_name = ZODIAC_NAMES.get(user.zodiac, f"Знак #{user.zodiac}")
-            
-            result.append({
-                "id": user.id,
-                "username": user.username,
-                "first_name": user.first_name,
-                "zodiac": user.zodiac,
-                "zodiac_name": zodiac_name,
-                "subscribed": user.subscribed,
-                "created_at": user.created_at.isoformat() if user.created_at else None
-            })
-        
-        return {
-            "total": total,
-            "skip": skip,
-            "limit": limit,
-            "users": result
-        }
+    else:
+        total, rows = None, await fetch_all(stmt)
+    users, next_cursor = _split_page(rows, limit)
+    
+    result = [_user_item(user) for user in users]
+    
+    return _conditional(request, response, {
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "users": result,
+        "has_more": next_cursor is not None,
+        "next_cursor": next_cursor
+    })
+
+# Запросы без параметров - собираются один раз при импорте
+_USERS_TOTAL_STMT = select(func.count(User.id))
+_REGISTERED_TOTAL_STMT = select(func.count(User.id)).where(User.registration_completed == True)
+
+
+async def _users_total() -> int:
+    """Общее число пользователей для пагинации (меняется медленно - кэшируется на TTL)"""
+    (total,) = await fetch_one(_USERS_TOTAL_STMT)
+    return total
+
+
+async def _registered_total() -> int:
+    """Число авторизованных пользователей для пагинации /registered (кэшируется на TTL)"""
+    (total,) = await fetch_one(_REGISTERED_TOTAL_STMT)
+    return total
+
 
 @router.get("/")
 async def get_users(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    include_total: bool = True,
+    before_created_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     username: str = Depends(get_current_user)
 ):
-    """Получить список пользователей"""
-    async with AsyncSessionLocal() as session:
-        total = await session.scalar(select(func.count(User.id)))
-        
-        users_query = await session.execute(
-            select(User).offset(skip).limit(limit).order_by(User.created_at.desc())
-        )
-        users = users_query.scalars().all()
-        
-        result = []
-        for user in users:
-            zodiac_name = None
-            if user.zodiac:
-                zodiac_name = ZODIAC_NAMES.get(user.zodiac, f"Знак #{user.zodiac}")
-            
-            result.append({
-                "id": user.id,
-                "username": user.username,
-                "first_name": user.first_name,
-                "zodiac": user.zodiac,
-                "zodiac_name": zodiac_name,
-                "subscribed": user.subscribed,
-                "registration_completed": user.registration_completed,
-                "created_at": user.created_at.isoformat() if user.created_at else None
-            })
-        
-        return {
-            "total": total,
-            "skip": skip,
-            "limit": limit,
-            "users": result
-        }
+    """Получить список пользователей.
+
+    include_total=false - без подсчёта total (для бесконечной прокрутки, хватает has_more);
+    иначе total берётся из кэша на DEFAULT_TTL, а не считается COUNT(*) на каждую страницу.
+    Для глубокой пагинации передавайте курсор before_created_at + before_id
+    (значение next_cursor из предыдущего ответа) вместо skip.
+    Первая страница кэшируется на 15 секунд: её запрашивает каждое обновление админки.
+    """
+    stmt = _users_page_stmt(skip, limit, before_created_at, before_id)
+    if skip == 0 and before_id is None:
+        page = memoized("users:first_page", partial(fetch_all, stmt), scope=limit, ttl=15.0, response=response)
+    else:
+        page = fetch_all(stmt)
+    if include_total:
+        # total из кэша обычно готов сразу; при промахе COUNT идёт параллельно со страницей
+        total, rows = await asyncio.gather(memoized("users:total", _users_total), page)
+    else:
+        total, rows = None, await page
+    users, next_cursor = _split_page(rows, limit)
+    
+    result = [_user_item(user) for user in users]
+    
+    return _conditional(request, response, {
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "users": result,
+        "has_more": next_cursor is not None,
+        "next_cursor": next_cursor
+    })
 
 @router.get("/{user_id}")
-async def get_user(user_id: int, username: str = Depends(get_current_user)):
+async def get_user(
+    user_id: int,
+    session: AsyncSession = Depends(get_db),
+    username: str = Depends(get_current_user)
+):
     """Получить информацию о пользователе"""
-    async with AsyncSessionLocal() as session:
-        user = await session.get(User, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="Пользователь не найден")
-        
-        zodiac_name = None
-        if user.zodiac:
-            zodiac_name = ZODIAC_NAMES.get(user.zodiac, f"Знак #{user.zodiac}")
-        
-        return {
-            "id": user.id,
-            "username": user.username,
-            "first_name": user.first_name,
-            "zodiac": user.zodiac,
-            "zodiac_name": zodiac_name,
-            "subscribed": user.subscribed,
-            "registration_completed": user.registration_completed,
-            "registration_status": user.registration_status,
-            "created_at": user.created_at.isoformat() if user.created_at else None
-        }
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    
+    zodiac_name = None
+    if user.zodiac:
+        zodiac_name = ZODIAC_NAMES.get(user.zodiac, f"Знак #{user.zodiac}")
+    
+    return {
+        "id": user.id,
+        "username": user.username,
+        "first_name": user.first_name,
+        "zodiac": user.zodiac,
+        "zodiac_name": zodiac_name,
+        "subscribed": user.subscribed,
+        "registration_completed": user.registration_completed,
+        "registration_status": user.registration_status,
+        "created_at": user.created_at
+    }
 